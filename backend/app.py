@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from pathlib import Path
-import json
+import atexit
 
 from .routes.quest_routes import router as quest_router
 from .routes.timer_routes import router as timer_router
@@ -9,15 +9,43 @@ from .routes.ai_routes import router as ai_router
 from .routes.ai_problem_routes import router as ai_problem_router
 from .routes.stats_routes import router as stats_router
 from .routes.admin_routes import router as admin_router
-from .database import init_db, SessionLocal
-from .models.db_models import User, Quest
+from .database import engine, init_db, SessionLocal
+from .metrics import MetricsMiddleware, instrument_engine
+from .profiler import ProfilerMiddleware
+from .config import settings
+from .background import start_periodic, stop_all
+from .services.ai_problem_service import refill_problem_pool
+from .services.openai_pool import close_pool
+from .services.planner_batch import scheduled_precompute
+from .services.question_log_writer import question_log_writer
+from .services.quest_reaper import reap_finished_quests
+from .services.quest_service import bulk_create_quests, seed_schema
+from .services.quest_sync import prune_tombstones
+from .services.timer_accumulator import timer_accumulator
+from .services.timer_sessions import reconcile_sessions, sweep_sessions
+from .models.db_models import User
 from .constants import (
-    SUBJECT_KO_KOREAN,
     DEFAULT_SUBJECT_RATIO_JSON,
 )
 from .seed_loader import load_seed_quests
 
 
+def _flush_timer_buffer() -> None:
+    timer_accumulator.flush(SessionLocal)
+
+
+def _checkpoint_timer_sessions() -> None:
+    sweep_sessions(SessionLocal)
+
+
+def _prune_quest_tombstones() -> None:
+    prune_tombstones(SessionLocal)
+
+
+def _reap_finished_quests() -> None:
+    reap_finished_quests(SessionLocal)
+
+
 def create_app() -> FastAPI:
     app = FastAPI(title="Personalized Learning Quest Planner", version="0.1.0")
 
@@ -27,7 +55,13 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # read by the quest delta sync (If-None-Match on the next refresh)
+        expose_headers=["ETag"],
     )
+    app.add_middleware(ProfilerMiddleware)
+    # outermost, so latency covers CORS handling and the whole streamed body
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
 
     @app.on_event("startup")
     async def startup_event():
@@ -51,34 +85,42 @@ def create_app() -> FastAPI:
 
             seed_path = Path(__file__).resolve().parents[1] / "data" / "seed_quests.json"
             quests, _meta = load_seed_quests(seed_path)
-            for q in quests:
-                if db.get(Quest, q["id"]):
-                    continue
-                db.add(
-                    Quest(
-                        id=q["id"],
-                        user_id=q.get("user_id", "u1"),
-                        type=q.get("type", "time"),
-                        title=q.get("title", "Unnamed Quest"),
-                        subject=q.get("subject", SUBJECT_KO_KOREAN),
-                        goal_value=int(q.get("goal_value", 0)),
-                        progress_minutes=int(q.get("progress_value", 0)),
-                        status=q.get("status", "pending"),
-                        source=q.get("source", "ai_generated"),
-                        tags_json=json.dumps(q.get("tags") or []),
-                        tags_ko_json=json.dumps(q.get("tags_ko") or []),
-                        meta_json=json.dumps(q.get("meta") or {}),
-                    )
-                )
-            if quests:
-                db.commit()
-
-            # Any lingering in-progress time quests should start as paused when server boots
-            db.query(Quest).filter(Quest.type == "time", Quest.status == "in_progress").update({"status": "paused"})
+            # seeds already present (or replaced by an equivalent active quest) come back as existing/conflict
+            bulk_create_quests(db, [seed_schema(q) for q in quests])
             db.commit()
+
+            # Close out timer sessions left by the previous process; quests without a live session start paused
+            reconcile_sessions(
+                db,
+                checkpoint_interval=settings.TIMER_CHECKPOINT_INTERVAL_SECONDS,
+                resume_grace=settings.TIMER_SESSION_RESUME_GRACE_SECONDS,
+            )
         finally:
             db.close()
 
+        if settings.QUESTION_LOG_ASYNC:
+            question_log_writer.start()
+            # queued logs are written even if the process exits without a shutdown event
+            atexit.register(question_log_writer.stop)
+        start_periodic("timer_checkpoint", settings.TIMER_CHECKPOINT_INTERVAL_SECONDS, _checkpoint_timer_sessions)
+        if settings.AI_PROBLEM_POOL_WATERMARK > 0:
+            start_periodic("ai_problem_refill", settings.AI_PROBLEM_POOL_REFILL_SECONDS, refill_problem_pool)
+        start_periodic("quest_tombstone_prune", 3600, _prune_quest_tombstones)
+        start_periodic("quest_reaper", settings.QUEST_REAPER_INTERVAL_SECONDS, _reap_finished_quests)
+        start_periodic("planner_precompute", settings.PLANNER_PRECOMPUTE_INTERVAL_SECONDS, scheduled_precompute)
+        if settings.TIMER_WRITE_BEHIND:
+            start_periodic("timer_flush", settings.TIMER_FLUSH_INTERVAL_SECONDS, _flush_timer_buffer)
+            # last-resort flush if the process exits without a clean shutdown event
+            atexit.register(_flush_timer_buffer)
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        await stop_all()
+        question_log_writer.stop()
+        _flush_timer_buffer()
+        _checkpoint_timer_sessions()
+        await close_pool()
+
     app.include_router(quest_router)
     app.include_router(timer_router)
     app.include_router(ai_router)
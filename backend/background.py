@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict
+
+from starlette.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+async def _run_periodic(name: str, interval: float, fn: Callable[[], Any]) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                await fn()
+            else:
+                # DB work is synchronous; keep it off the event loop
+                await run_in_threadpool(fn)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("background task %s failed", name)
+
+
+def start_periodic(name: str, interval: float, fn: Callable[[], Any]) -> None:
+    """Run fn (sync or async) every interval seconds until stop_all(). Must be called from the event loop."""
+    if interval <= 0 or name in _tasks:
+        return
+    _tasks[name] = asyncio.get_running_loop().create_task(_run_periodic(name, interval, fn))
+
+
+async def stop_all() -> None:
+    tasks = list(_tasks.values())
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,92 @@
+"""Maintenance commands: python -m backend.cli <command>"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+
+from .database import SessionLocal, init_db
+from .services.local_classifier import local_classifier
+from .services.openai_pool import close_pool
+from .services.planner_batch import precompute_planner
+from .services.rollup_service import backfill_rollup
+from .services.tagging_service import rebuild_keyword_counts
+
+
+def _backfill_rollup(_args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        rows = backfill_rollup(db)
+    finally:
+        db.close()
+    print(f"daily_subject_minutes rebuilt from timer_logs: {rows} rows")
+
+
+def _backfill_keyword_counts(_args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        rows = rebuild_keyword_counts(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"question_keyword_counts rebuilt from question_logs: {rows} rows")
+
+
+def _train_classifier(_args: argparse.Namespace) -> None:
+    db = SessionLocal()
+    try:
+        status = local_classifier.train(db)
+    finally:
+        db.close()
+    state = "active" if status["active"] else f"inactive (needs {status['min_samples']} samples)"
+    print(f"local classifier trained on {status.get('samples', 0)} question_logs -> {status['path']} [{state}]")
+    print("running servers pick it up via POST /admin/classifier/reload")
+
+
+async def _run_precompute(args: argparse.Namespace) -> dict:
+    try:
+        return await precompute_planner(
+            days=args.days,
+            use_model=False if args.baseline_only else None,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            force=args.force,
+        )
+    finally:
+        await close_pool()
+
+
+def _precompute_planner(args: argparse.Namespace) -> None:
+    report = asyncio.run(_run_precompute(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"{report['users']} users in {report['seconds']}s -> {report['users_per_second']} users/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill-rollup", help="rebuild the daily study rollup from timer_logs").set_defaults(
+        handler=_backfill_rollup
+    )
+    commands.add_parser(
+        "backfill-keyword-counts", help="rebuild per-user keyword counts from question_logs (run after editing KEYWORDS)"
+    ).set_defaults(handler=_backfill_keyword_counts)
+    commands.add_parser(
+        "train-classifier", help="train the local subject/difficulty classifier from question_logs"
+    ).set_defaults(handler=_train_classifier)
+    precompute = commands.add_parser(
+        "precompute-planner", help="fill planner_cache for all users (baseline, plus the model when a key is set)"
+    )
+    precompute.add_argument("--days", type=int, default=7)
+    precompute.add_argument("--workers", type=int, default=None, help="concurrent model calls")
+    precompute.add_argument("--chunk-size", type=int, default=200, help="users per bulk-query round")
+    precompute.add_argument("--baseline-only", action="store_true", help="store baseline suggestions without calling the model")
+    precompute.add_argument("--force", action="store_true", help="recompute even fresh cache rows")
+    precompute.set_defaults(handler=_precompute_planner)
+    args = parser.parse_args()
+    init_db()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from pathlib import Path
 
 try:
     from dotenv import load_dotenv  # type: ignore
@@ -11,6 +12,10 @@ except Exception:
     pass
 
 
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
 @dataclass
 class Settings:
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
@@ -21,6 +26,77 @@ class Settings:
     # Backward-compat default
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-5-mini")
     OPENAI_TIMEOUT: int = int(os.getenv("OPENAI_TIMEOUT", "30"))
+    # Shared async client: optional OpenAI-compatible endpoint (e.g. a local fake server) and HTTP pool size
+    OPENAI_BASE_URL: str | None = os.getenv("OPENAI_BASE_URL") or None
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+    # Concurrent calls per model ("model=limit,..."; others use the default) and waiters allowed beyond that
+    OPENAI_MODEL_CONCURRENCY: str = os.getenv("OPENAI_MODEL_CONCURRENCY", "")
+    OPENAI_DEFAULT_CONCURRENCY: int = int(os.getenv("OPENAI_DEFAULT_CONCURRENCY", "4"))
+    OPENAI_MAX_QUEUE: int = int(os.getenv("OPENAI_MAX_QUEUE", "16"))
+    # Per-model latency budget in seconds ("model=seconds,..."; others use the default) and circuit breaker
+    OPENAI_LATENCY_BUDGETS: str = os.getenv("OPENAI_LATENCY_BUDGETS", "gpt-5-nano=5,gpt-5-mini=15")
+    OPENAI_DEFAULT_LATENCY_BUDGET: float = float(os.getenv("OPENAI_DEFAULT_LATENCY_BUDGET", "25"))
+    BREAKER_ENABLED: bool = _env_flag("BREAKER_ENABLED", "1")
+    BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_OPEN_SECONDS: int = int(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    BREAKER_SLOW_RATIO: float = float(os.getenv("BREAKER_SLOW_RATIO", "0.8"))
+    # Chat answer cache: in-memory LRU+TTL, optionally backed by the chat_cache table to survive restarts
+    CHAT_CACHE_ENABLED: bool = _env_flag("CHAT_CACHE_ENABLED", "1")
+    CHAT_CACHE_MAX_ENTRIES: int = int(os.getenv("CHAT_CACHE_MAX_ENTRIES", "2000"))
+    CHAT_CACHE_TTL_SECONDS: int = int(os.getenv("CHAT_CACHE_TTL_SECONDS", "86400"))
+    CHAT_CACHE_PERSIST: bool = _env_flag("CHAT_CACHE_PERSIST")
+    # Local subject/difficulty classifier trained from question_logs; the remote classifier only runs below the threshold
+    LOCAL_CLASSIFIER_ENABLED: bool = _env_flag("LOCAL_CLASSIFIER_ENABLED", "1")
+    LOCAL_CLASSIFIER_PATH: str = os.getenv(
+        "LOCAL_CLASSIFIER_PATH", str(Path(__file__).resolve().parent / "local_classifier.json")
+    )
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = float(os.getenv("LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.85"))
+    LOCAL_CLASSIFIER_MIN_SAMPLES: int = int(os.getenv("LOCAL_CLASSIFIER_MIN_SAMPLES", "30"))
+    # Pre-generated AI problems per subject x difficulty; 0 disables the background refill
+    AI_PROBLEM_POOL_WATERMARK: int = int(os.getenv("AI_PROBLEM_POOL_WATERMARK", "5"))
+    AI_PROBLEM_POOL_BATCH: int = int(os.getenv("AI_PROBLEM_POOL_BATCH", "5"))
+    AI_PROBLEM_POOL_REFILL_SECONDS: int = int(os.getenv("AI_PROBLEM_POOL_REFILL_SECONDS", "60"))
+    AI_PROBLEM_POOL_MAX_CALLS: int = int(os.getenv("AI_PROBLEM_POOL_MAX_CALLS", "3"))
+    # Planner suggestions are reused until a relevant write invalidates them or this many seconds pass
+    PLANNER_CACHE_TTL_SECONDS: int = int(os.getenv("PLANNER_CACHE_TTL_SECONDS", "3600"))
+    # Planner prompt size: recent questions and catalog tags are trimmed to fit this many tokens
+    PLANNER_PROMPT_TOKEN_BUDGET: int = int(os.getenv("PLANNER_PROMPT_TOKEN_BUDGET", "1200"))
+    PLANNER_QUESTION_MAX_CHARS: int = int(os.getenv("PLANNER_QUESTION_MAX_CHARS", "120"))
+    # Batch precompute of planner suggestions (CLI: precompute-planner); interval 0 = no scheduled run
+    PLANNER_PRECOMPUTE_INTERVAL_SECONDS: int = int(os.getenv("PLANNER_PRECOMPUTE_INTERVAL_SECONDS", "0"))
+    PLANNER_PRECOMPUTE_WORKERS: int = int(os.getenv("PLANNER_PRECOMPUTE_WORKERS", "4"))
+    PLANNER_PRECOMPUTE_DAYS: int = int(os.getenv("PLANNER_PRECOMPUTE_DAYS", "7"))
+    # Chat question logs go through a bounded queue drained in batches by a background thread
+    QUESTION_LOG_ASYNC: bool = _env_flag("QUESTION_LOG_ASYNC", "1")
+    QUESTION_LOG_QUEUE_SIZE: int = int(os.getenv("QUESTION_LOG_QUEUE_SIZE", "1000"))
+    QUESTION_LOG_BATCH_SIZE: int = int(os.getenv("QUESTION_LOG_BATCH_SIZE", "100"))
+    QUESTION_LOG_LINGER_SECONDS: float = float(os.getenv("QUESTION_LOG_LINGER_SECONDS", "0.5"))
+    # Timer write-behind: buffer heartbeat deltas in memory and flush periodically
+    TIMER_WRITE_BEHIND: bool = _env_flag("TIMER_WRITE_BEHIND")
+    TIMER_FLUSH_INTERVAL_SECONDS: int = int(os.getenv("TIMER_FLUSH_INTERVAL_SECONDS", "60"))
+    # Server-clock sessions: checkpoint sweep interval, and how long a session survives a server restart
+    TIMER_CHECKPOINT_INTERVAL_SECONDS: int = int(os.getenv("TIMER_CHECKPOINT_INTERVAL_SECONDS", "60"))
+    TIMER_SESSION_RESUME_GRACE_SECONDS: int = int(os.getenv("TIMER_SESSION_RESUME_GRACE_SECONDS", "300"))
+    # A session is credited at most this long past the client's last /timer/state poll (the page polls every 30 s)
+    TIMER_SESSION_LIVENESS_SECONDS: int = int(os.getenv("TIMER_SESSION_LIVENESS_SECONDS", "90"))
+    # Quest delta sync: re-read window before the client's cursor, and how long deletions are remembered
+    QUEST_SYNC_OVERLAP_SECONDS: int = int(os.getenv("QUEST_SYNC_OVERLAP_SECONDS", "5"))
+    QUEST_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("QUEST_TOMBSTONE_RETENTION_DAYS", "7"))
+    # Background reaper: archives finished quests untouched for the grace period, chunk by chunk
+    QUEST_REAPER_INTERVAL_SECONDS: int = int(os.getenv("QUEST_REAPER_INTERVAL_SECONDS", "300"))
+    QUEST_REAPER_CHUNK_SIZE: int = int(os.getenv("QUEST_REAPER_CHUNK_SIZE", "500"))
+    QUEST_REAPER_GRACE_SECONDS: int = int(os.getenv("QUEST_REAPER_GRACE_SECONDS", "60"))
+    # Request/SQL/AI latency histograms at GET /admin/metrics; requests slower than this are logged with their SQL (0 = off)
+    METRICS_ENABLED: bool = _env_flag("METRICS_ENABLED", "1")
+    SLOW_REQUEST_MS: int = int(os.getenv("SLOW_REQUEST_MS", "500"))
+    # Request profiler: requests with header X-Profile-Token=<token> (empty = header off) or a sampled
+    # fraction of requests under PROFILE_PATHS (comma-separated prefixes) are stack-sampled into PROFILE_DIR
+    PROFILE_TOKEN: str = os.getenv("PROFILE_TOKEN", "")
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_PATHS: str = os.getenv("PROFILE_PATHS", "")
+    PROFILE_INTERVAL_MS: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", str(Path(__file__).resolve().parent / "profiles"))
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
 
 
 settings = Settings()
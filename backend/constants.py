@@ -11,6 +11,12 @@ SUBJECTS = [
     SUBJECT_KO_ENGLISH,
 ]
 
+# Day boundaries follow the frontend day-reset (main.js / timer.js)
+DAY_RESET_TIMEZONE = "Asia/Seoul"
+
+# Quests in these states stay in `quests` (hidden from lists) until the reaper archives them
+FINISHED_QUEST_STATUSES = ("completed", "failed")
+
 STUDY_TAG = "study"
 STUDY_TAG_KO = "\ud559\uc2b5"
 
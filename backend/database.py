@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Generator
 from sqlalchemy import create_engine
@@ -7,11 +8,12 @@ from sqlalchemy.orm import declarative_base, sessionmaker, Session
 
 
 DB_PATH = Path(__file__).resolve().parent / "app.db"
-DATABASE_URL = f"sqlite:///{DB_PATH.as_posix()}"
+# Override to run against another SQLite file (e.g. the throwaway database of a load test)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{DB_PATH.as_posix()}"
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -28,23 +30,7 @@ def get_db() -> Generator[Session, None, None]:
 
 def init_db():
     from .models import db_models  # noqa: F401 ensure models are imported
-    Base.metadata.create_all(bind=engine)
-    # Lightweight migration for new columns introduced after initial creation
-    try:
-        with engine.connect() as conn:
-            rows = conn.exec_driver_sql("PRAGMA table_info(quests)").fetchall()
-            cols = [row[1] for row in rows]
-            if "tags_json" not in cols:
-                conn.exec_driver_sql("ALTER TABLE quests ADD COLUMN tags_json TEXT")
-            if "tags_ko_json" not in cols:
-                conn.exec_driver_sql("ALTER TABLE quests ADD COLUMN tags_ko_json TEXT")
-            if "meta_json" not in cols:
-                conn.exec_driver_sql("ALTER TABLE quests ADD COLUMN meta_json TEXT")
-            rows = conn.exec_driver_sql("PRAGMA table_info(timer_logs)").fetchall()
-            timer_cols = [row[1] for row in rows]
-            if "subject" not in timer_cols:
-                conn.exec_driver_sql("ALTER TABLE timer_logs ADD COLUMN subject TEXT")
-    except Exception:
-        # Ignore migration errors in MVP
-        pass
+    from .migrations import run_migrations
 
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
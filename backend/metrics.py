@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+# statements kept per request for the slow-request log
+MAX_TRACED_STATEMENTS = 50
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram keyed by label set."""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # one slot per bucket, then +Inf, sum
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(key, le=_number(bound))} {_number(count)}")
+            lines.append(f"{self.name}_bucket{_labels(key, le='+Inf')} {_number(series[-2])}")
+            lines.append(f"{self.name}_sum{_labels(key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(key)} {_number(series[-2])}")
+        return lines
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key: Labels, **extra: str) -> str:
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency by route template (streams: until the last byte).", LATENCY_BUCKETS
+)
+REQUEST_STATEMENTS = Histogram("http_request_sql_statements", "SQL statements executed per request.", STATEMENT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram("http_request_sql_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS)
+AI_SECONDS = Histogram(
+    "ai_upstream_duration_seconds", "Upstream model call latency (streams: time to first token).", LATENCY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_SECONDS, REQUEST_STATEMENTS, REQUEST_SQL_SECONDS, AI_SECONDS)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    sql_seconds: float = 0.0
+    trace: List[Tuple[float, str]] = field(default_factory=list)
+
+
+# Set per request by MetricsMiddleware; sync routes see it too because the threadpool copies the context
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def _before_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn: Any, cursor: Any, statement: str, parameters: Any, context: Any, executemany: bool) -> None:
+    started = conn.info["metrics_started"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    elapsed = time.perf_counter() - started
+    stats.statements += 1
+    stats.sql_seconds += elapsed
+    if len(stats.trace) < MAX_TRACED_STATEMENTS:
+        stats.trace.append((elapsed, " ".join(statement.split())[:300]))
+
+
+def _handle_error(context: Any) -> None:
+    # a failed statement never reaches after_cursor_execute
+    started = context.connection.info.get("metrics_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+def observe_ai_call(model: str, seconds: float, outcome: str) -> None:
+    if settings.METRICS_ENABLED:
+        AI_SECONDS.observe(seconds, model=model, outcome=outcome)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (streaming responses pass through untouched).
+
+    Records latency, SQL statement count and SQL time per route template and
+    logs requests slower than SLOW_REQUEST_MS with the statements they ran.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._record(scope, status, time.perf_counter() - started, stats)
+
+    def _record(self, scope: Dict[str, Any], status: int, elapsed: float, stats: RequestStats) -> None:
+        route = scope.get("route")
+        # the template, not the raw path, so quest ids do not explode the label set
+        path = getattr(route, "path", None) or "unmatched"
+        method = scope.get("method", "")
+        REQUEST_SECONDS.observe(elapsed, method=method, route=path, status=str(status))
+        REQUEST_STATEMENTS.observe(stats.statements, method=method, route=path)
+        REQUEST_SQL_SECONDS.observe(stats.sql_seconds, method=method, route=path)
+        if settings.SLOW_REQUEST_MS > 0 and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            statements = "".join(f"\n  {seconds * 1000:7.1f} ms  {sql}" for seconds, sql in stats.trace)
+            if stats.statements > len(stats.trace):
+                statements += f"\n  ... {stats.statements - len(stats.trace)} more"
+            logger.warning(
+                "slow request %s %s -> %d in %.0f ms (%d SQL statements, %.0f ms SQL)%s",
+                method,
+                scope.get("path", path),
+                status,
+                elapsed * 1000,
+                stats.statements,
+                stats.sql_seconds * 1000,
+                statements,
+            )
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset_metrics() -> None:
+    for histogram in HISTOGRAMS:
+        histogram.reset()
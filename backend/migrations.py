@@ -0,0 +1,122 @@
+"""Versioned schema migrations for the SQLite database.
+
+create_all() still creates missing tables (with their declared indexes) on
+every boot; migrations cover what it cannot do on an existing database:
+new columns, new indexes on old tables and data backfills. Each step is
+idempotent and recorded in schema_version, so an up-to-date database costs
+a single SELECT at startup.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from .models.db_models import (
+    DailySubjectMinutes,
+    Quest,
+    QuestionLog,
+    QuestResultLog,
+    QuestTag,
+    QuestionKeywordCount,
+    TimerLog,
+    TimerSession,
+    quest_tag_rows,
+)
+from .services.rollup_service import rebuild_rollup
+from .services.tagging_service import rebuild_keyword_counts
+
+
+def _columns(conn: Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})").fetchall()}
+
+
+def _legacy_columns(conn: Connection) -> None:
+    # columns introduced after the first MVP schema
+    quest_cols = _columns(conn, "quests")
+    for name in ("tags_json", "tags_ko_json", "meta_json"):
+        if name not in quest_cols:
+            conn.exec_driver_sql(f"ALTER TABLE quests ADD COLUMN {name} TEXT")
+    if "subject" not in _columns(conn, "timer_logs"):
+        conn.exec_driver_sql("ALTER TABLE timer_logs ADD COLUMN subject TEXT")
+
+
+def _hot_path_indexes(conn: Connection) -> None:
+    for model in (Quest, TimerLog, TimerSession, QuestionLog, QuestResultLog):
+        for index in model.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _backfill_daily_rollup(conn: Connection) -> None:
+    has_rollup = conn.execute(DailySubjectMinutes.__table__.select().limit(1)).first()
+    has_logs = conn.execute(TimerLog.__table__.select().limit(1)).first()
+    if has_logs and not has_rollup:
+        rebuild_rollup(conn)
+
+
+def _backfill_quest_tags(conn: Connection) -> None:
+    # quests written before quest_tags existed only carry the JSON columns
+    rows = []
+    for quest_id, tags_json, tags_ko_json in conn.execute(
+        Quest.__table__.select().with_only_columns(Quest.id, Quest.tags_json, Quest.tags_ko_json)
+    ):
+        rows += [{"quest_id": quest_id, **item} for item in quest_tag_rows(tags_json, tags_ko_json)]
+    if rows:
+        conn.execute(QuestTag.__table__.insert().prefix_with("OR IGNORE"), rows)
+
+
+def _backfill_keyword_counts(conn: Connection) -> None:
+    has_counts = conn.execute(QuestionKeywordCount.__table__.select().limit(1)).first()
+    has_logs = conn.execute(QuestionLog.__table__.select().limit(1)).first()
+    if has_logs and not has_counts:
+        rebuild_keyword_counts(conn)
+
+
+def _session_last_seen(conn: Connection) -> None:
+    if "last_seen_at" not in _columns(conn, "timer_sessions"):
+        conn.exec_driver_sql("ALTER TABLE timer_sessions ADD COLUMN last_seen_at DATETIME")
+    # open sessions count as seen at their last checkpoint
+    conn.exec_driver_sql("UPDATE timer_sessions SET last_seen_at = checkpoint_at WHERE last_seen_at IS NULL")
+
+
+def _planner_cache_version(conn: Connection) -> None:
+    if "version" not in _columns(conn, "planner_cache"):
+        conn.exec_driver_sql("ALTER TABLE planner_cache ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "legacy quest/timer_logs columns", _legacy_columns),
+    (2, "composite indexes for hot queries", _hot_path_indexes),
+    (3, "backfill daily_subject_minutes", _backfill_daily_rollup),
+    (4, "backfill quest_tags from tag JSON", _backfill_quest_tags),
+    (5, "backfill question_keyword_counts", _backfill_keyword_counts),
+    # re-run: creates the (user_id, updated_at) quest index added for delta sync
+    (6, "quest delta-sync index", _hot_path_indexes),
+    (7, "timer_sessions.last_seen_at", _session_last_seen),
+    (8, "planner_cache.version", _planner_cache_version),
+]
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """Apply pending migrations in order and return the versions applied."""
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_version ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        )
+        applied = {row[0] for row in conn.exec_driver_sql("SELECT version FROM schema_version").fetchall()}
+
+    done: List[int] = []
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        # one transaction per step: a failure leaves earlier steps recorded and aborts startup
+        with engine.begin() as conn:
+            step(conn)
+            conn.exec_driver_sql(
+                "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.utcnow().isoformat()),
+            )
+        done.append(version)
+    return done
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey
-from sqlalchemy.orm import relationship
+import json
+from sqlalchemy import Column, String, Integer, DateTime, Text, ForeignKey, Index, event, inspect
+from sqlalchemy.orm import Session, relationship
 
 from ..database import Base
 
@@ -36,6 +37,27 @@ class Quest(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # normalized copy of tags_json / tags_ko_json, kept in sync by _sync_quest_tags
+    tag_rows = relationship("QuestTag", cascade="all, delete-orphan", order_by="QuestTag.position")
+
+    __table_args__ = (
+        # active-quest lookups: user + type + status IN (...) [+ subject]
+        Index("ix_quests_user_type_status_subject", "user_id", "type", "status", "subject"),
+        # delta sync: GET /quests?since=
+        Index("ix_quests_user_updated", "user_id", "updated_at"),
+    )
+
+
+class QuestTag(Base):
+    """One row per quest tag; the JSON tag columns on quests remain as a compatibility view."""
+    __tablename__ = "quest_tags"
+    quest_id = Column(String, ForeignKey("quests.id"), primary_key=True)
+    lang = Column(String, primary_key=True)  # 'en' | 'ko'
+    tag = Column(String, primary_key=True)
+    position = Column(Integer, default=0)  # order within the JSON list
+
+    __table_args__ = (Index("ix_quest_tags_lang_tag", "lang", "tag", "quest_id"),)
+
 
 class TimerLog(Base):
     __tablename__ = "timer_logs"
@@ -46,6 +68,34 @@ class TimerLog(Base):
     delta_seconds = Column(Integer, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_timer_logs_user_created", "user_id", "created_at"),)
+
+
+class DailySubjectMinutes(Base):
+    """Per-day study rollup maintained alongside timer_logs (day = DAY_RESET_TIMEZONE calendar date)."""
+    __tablename__ = "daily_subject_minutes"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    date = Column(String, primary_key=True)  # YYYY-MM-DD
+    subject = Column(String, primary_key=True)
+    # stored in seconds so minute rounding matches the raw-log aggregation
+    seconds = Column(Integer, nullable=False, default=0)
+
+
+class TimerSession(Base):
+    __tablename__ = "timer_sessions"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    kind = Column(String, nullable=False)  # 'global' (subject timer) | 'quest' (quest card timer)
+    quest_id = Column(String, ForeignKey("quests.id"), nullable=False)
+    subject = Column(String, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    # elapsed time up to checkpoint_at has already been credited to the quest
+    checkpoint_at = Column(DateTime, default=datetime.utcnow)
+    # last /timer/start or /timer/state from the client; time past this + TIMER_SESSION_LIVENESS_SECONDS is not credited
+    last_seen_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_timer_sessions_user_kind", "user_id", "kind"),)
+
 
 class QuestionLog(Base):
     __tablename__ = "question_logs"
@@ -56,6 +106,54 @@ class QuestionLog(Base):
     difficulty = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_question_logs_user_created", "user_id", "created_at"),)
+
+
+class QuestionKeywordCount(Base):
+    """Per-user daily keyword hits by subject and tag (tag '*' = log counts), maintained on every question_logs insert."""
+    __tablename__ = "question_keyword_counts"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    day = Column(String, primary_key=True)  # YYYY-MM-DD (UTC, like question_logs.created_at)
+    subject = Column(String, primary_key=True)
+    tag = Column(String, primary_key=True)
+    hits = Column(Integer, nullable=False, default=0)
+    hard_hits = Column(Integer, nullable=False, default=0)
+
+
+class QuestTombstone(Base):
+    """Deleted quest ids, so delta sync can tell clients what to drop; written by _track_quest_changes."""
+    __tablename__ = "quest_tombstones"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    quest_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_quest_tombstones_user_deleted", "user_id", "deleted_at"),)
+
+
+class QuestArchive(Base):
+    """Finished quests moved out of `quests` by the reaper (services/quest_reaper.py); same columns plus archived_at."""
+    __tablename__ = "quest_archive"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    quest_id = Column(String, nullable=False)  # ids can repeat (e.g. re-seeded quests finished again)
+    user_id = Column(String, nullable=False)
+    type = Column(String)
+    title = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    goal_value = Column(Integer, nullable=False)
+    progress_minutes = Column(Integer)
+    progress_seconds_remainder = Column(Integer)
+    status = Column(String)
+    source = Column(String)
+    tags_json = Column(Text, nullable=True)
+    tags_ko_json = Column(Text, nullable=True)
+    meta_json = Column(Text, nullable=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_quest_archive_user_archived", "user_id", "archived_at"),)
+
 
 class QuestResultLog(Base):
     __tablename__ = "quest_result_logs"
@@ -66,3 +164,85 @@ class QuestResultLog(Base):
     result = Column(String, nullable=False)  # 'success' | 'failure'
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_quest_result_logs_user_created", "user_id", "created_at"),)
+
+
+class AIProblemPoolItem(Base):
+    """Pre-generated AI problem waiting to become a quest (refilled in the background)."""
+    __tablename__ = "ai_problem_pool"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    subject = Column(String, nullable=False)
+    difficulty = Column(String, nullable=False)  # easy | medium | hard
+    payload_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_ai_problem_pool_subject_difficulty", "subject", "difficulty", "id"),)
+
+
+class PlannerCache(Base):
+    """Last planner suggestion per user, keyed by a fingerprint of the planner payload."""
+    __tablename__ = "planner_cache"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    quests_json = Column(Text, nullable=False)
+    notes_json = Column(Text, nullable=False)
+    source = Column(String, nullable=False)  # 'baseline' | 'model'
+    stale = Column(Integer, nullable=False, default=0)  # set by writes that can change the context
+    version = Column(Integer, nullable=False, default=0)  # bumped by every invalidation; stores compare-and-set on it
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChatCacheEntry(Base):
+    """Persistent tier of the chat answer cache (see services/chat_cache.py)."""
+    __tablename__ = "chat_cache"
+    key = Column(String, primary_key=True)  # sha1 of kind/subject/tier/normalized text
+    kind = Column(String, nullable=False)  # 'answer' | 'route'
+    value_json = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+
+
+def parse_tag_list(raw: str | None) -> list[str]:
+    try:
+        values = json.loads(raw) if raw else []
+    except Exception:
+        return []
+    if not isinstance(values, list):
+        return []
+    seen: list[str] = []
+    for value in values:
+        tag = str(value)
+        if tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def quest_tag_rows(tags_json: str | None, tags_ko_json: str | None) -> list[dict]:
+    rows = [{"lang": "en", "tag": tag, "position": i} for i, tag in enumerate(parse_tag_list(tags_json))]
+    rows += [{"lang": "ko", "tag": tag, "position": i} for i, tag in enumerate(parse_tag_list(tags_ko_json))]
+    return rows
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_quest_tags(session, _flush_context, _instances):
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Quest) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not state.pending:
+            changed = state.attrs.tags_json.history.has_changes() or state.attrs.tags_ko_json.history.has_changes()
+            if not changed:
+                continue
+        obj.tag_rows = [QuestTag(**row) for row in quest_tag_rows(obj.tags_json, obj.tags_ko_json)]
+
+
+@event.listens_for(Session, "before_flush")
+def _track_quest_changes(session, _flush_context, _instances):
+    now = datetime.utcnow()
+    for obj in session.deleted:
+        if isinstance(obj, Quest):
+            session.add(QuestTombstone(quest_id=obj.id, user_id=obj.user_id, deleted_at=now))
+    for obj in session.dirty:
+        # delta sync reads updated_at as "changed at": it must be the write time, never an earlier explicit value
+        if isinstance(obj, Quest) and obj not in session.deleted and session.is_modified(obj, include_collections=False):
+            obj.updated_at = now
@@ -25,6 +25,14 @@ class Quest(BaseModel):
     updated_at: Optional[datetime] = None
 
 
+class QuestSyncResponse(BaseModel):
+    # GET /quests?since=<cursor>: upsert `quests`, drop `deleted`, send `cursor` next time
+    cursor: str
+    full: bool = False  # replace the local list instead of patching it
+    quests: List[Quest] = []
+    deleted: List[str] = []
+
+
 class TimerUpdateRequest(BaseModel):
     user_id: str
     delta_seconds: int
@@ -32,6 +40,50 @@ class TimerUpdateRequest(BaseModel):
     subject: Optional[str] = None  # "국어" | "수학" | "영어"
 
 
+class TimerBatchRequest(BaseModel):
+    # Heartbeats coalesced upstream (edge proxy / gateway), possibly for many users
+    entries: List[TimerUpdateRequest] = []
+
+
+class TimerBatchResult(BaseModel):
+    index: int
+    ok: bool
+    quest: Optional[Quest] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+class TimerBatchResponse(BaseModel):
+    results: List[TimerBatchResult] = []
+
+
+class TimerStartRequest(BaseModel):
+    user_id: str
+    quest_id: Optional[str] = None  # quest card timer
+    subject: Optional[str] = None  # global subject timer
+
+
+class TimerStopRequest(BaseModel):
+    user_id: str
+    quest_id: Optional[str] = None
+    kind: Optional[str] = None  # 'global' | 'quest'; omit both to stop every session
+
+
+class TimerSessionOut(BaseModel):
+    id: int
+    kind: str
+    quest_id: str
+    subject: Optional[str] = None
+    started_at: datetime
+    elapsed_seconds: int
+    quest: Optional[Quest] = None
+
+
+class TimerStateResponse(BaseModel):
+    server_time: datetime
+    sessions: List[TimerSessionOut] = []
+
+
 class QuestionLogIn(BaseModel):
     user_id: str
     subject: str
@@ -44,9 +96,27 @@ class QuestionLogOut(QuestionLogIn):
     created_at: datetime
 
 
+class QuestionLogBatchRequest(BaseModel):
+    # questions buffered client-side (e.g. while offline) and sent together
+    entries: List[QuestionLogIn] = []
+
+
+class QuestionLogBatchResult(BaseModel):
+    index: int
+    ok: bool
+    log: Optional[QuestionLogOut] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+class QuestionLogBatchResponse(BaseModel):
+    results: List[QuestionLogBatchResult] = []
+
+
 class SuggestionResponse(BaseModel):
     quests: List[dict] = []
     notes: List[str] = []
+    source: str = "baseline"  # 'cache' | 'baseline' | 'model'
 
 
 class ChatRequest(BaseModel):
@@ -74,6 +144,32 @@ class PatchQuestRequest(BaseModel):
     progress_value: Optional[int] = None
 
 
+class QuestBulkCreateRequest(BaseModel):
+    # e.g. accepted planner suggestions or a teacher's assignment set
+    entries: List[Quest] = []
+
+
+class QuestBulkPatchEntry(PatchQuestRequest):
+    id: str
+
+
+class QuestBulkPatchRequest(BaseModel):
+    entries: List[QuestBulkPatchEntry] = []
+
+
+class QuestBulkResult(BaseModel):
+    index: int
+    ok: bool
+    outcome: Optional[str] = None  # 'created' | 'existing' | 'conflict' | 'updated'
+    quest: Optional[Quest] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+class QuestBulkResponse(BaseModel):
+    results: List[QuestBulkResult] = []
+
+
 class QuestAnswerRequest(BaseModel):
     user_id: str
     answer: str
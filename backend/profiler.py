@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import contextvars
+import hmac
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile-token"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f-]+$")
+# worker threads hold the request's copied Context in one of their outermost frames (anyio's WorkerThread.run)
+_CONTEXT_SEARCH_DEPTH = 8
+
+# The profile a request is being sampled for; copied into threadpool workers with the rest of the context
+_active: ContextVar[Optional["_Sampler"]] = ContextVar("active_profile", default=None)
+
+
+def _label(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class _Sampler(threading.Thread):
+    """Samples the stacks belonging to one request every `interval` seconds.
+
+    On the event loop thread a stack belongs to the request while it contains
+    the middleware's own frame (i.e. the request's task is the one running);
+    on worker threads while an outer frame holds a Context carrying this
+    sampler, which is how run_in_threadpool hands the request to a worker.
+    """
+
+    def __init__(self, marker: FrameType, interval: float) -> None:
+        super().__init__(name="request-profiler", daemon=True)
+        self.marker = marker
+        self.loop_thread = threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    def _request_frames(self, thread_id: int, leaf: FrameType) -> Optional[List[FrameType]]:
+        frames: List[FrameType] = []
+        frame: Optional[FrameType] = leaf
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        if thread_id == self.loop_thread:
+            for index, frame in enumerate(frames):
+                if frame is self.marker:
+                    return frames[index + 1 :]
+            return None
+        for index, frame in enumerate(frames[:_CONTEXT_SEARCH_DEPTH]):
+            for value in list(frame.f_locals.values()):
+                if isinstance(value, contextvars.Context) and value.get(_active) is self:
+                    return frames[index + 1 :]
+        return None
+
+    def run(self) -> None:
+        own = threading.get_ident()
+        while not self._done.wait(self.interval):
+            for thread_id, leaf in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                frames = self._request_frames(thread_id, leaf)
+                if frames:
+                    self.stacks[";".join(_label(frame) for frame in frames)] += 1
+                    self.samples += 1
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+
+
+def _profile_dir() -> Path:
+    return Path(settings.PROFILE_DIR)
+
+
+def _should_profile(scope: Dict[str, Any]) -> bool:
+    headers = dict(scope.get("headers") or [])
+    token = headers.get(PROFILE_HEADER.encode("latin-1"))
+    if token is not None and settings.PROFILE_TOKEN:
+        return hmac.compare_digest(token.decode("latin-1"), settings.PROFILE_TOKEN)
+    if settings.PROFILE_SAMPLE_RATE <= 0:
+        return False
+    prefixes = [p.strip() for p in settings.PROFILE_PATHS.split(",") if p.strip()]
+    if prefixes and not any(scope.get("path", "").startswith(prefix) for prefix in prefixes):
+        return False
+    return random.random() < settings.PROFILE_SAMPLE_RATE
+
+
+def _store(profile: Dict[str, Any]) -> None:
+    """Write one profile and drop the oldest beyond PROFILE_MAX_FILES."""
+    directory = _profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / f"{profile['id']}.json").write_text(json.dumps(profile, ensure_ascii=False), encoding="utf-8")
+    # ids start with a millisecond timestamp, so name order is age order
+    files = sorted(directory.glob("*.json"))
+    for old in files[: max(0, len(files) - settings.PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    directory = _profile_dir()
+    if not directory.is_dir():
+        return []
+    items = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            profile = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        profile.pop("collapsed", None)
+        items.append(profile)
+    return items
+
+
+def load_profile(profile_id: str) -> Optional[Dict[str, Any]]:
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = _profile_dir() / f"{profile_id}.json"
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+class ProfilerMiddleware:
+    """Sample the call stacks of selected requests into collapsed-stack profiles.
+
+    A request is profiled when it carries `X-Profile-Token: <PROFILE_TOKEN>`
+    or is picked at PROFILE_SAMPLE_RATE (optionally only under PROFILE_PATHS).
+    The response gets an `X-Profile-Id` header naming the stored profile.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        profile_id = f"{int(time.time() * 1000):013x}-{uuid.uuid4().hex[:6]}"
+        sampler = _Sampler(sys._getframe(), settings.PROFILE_INTERVAL_MS / 1000)
+        token = _active.set(sampler)
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]}
+            await send(message)
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            _active.reset(token)
+            root = f"{scope.get('method', '')} {scope.get('path', '')}"
+            profile = {
+                "id": profile_id,
+                "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "query": (scope.get("query_string") or b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "interval_ms": settings.PROFILE_INTERVAL_MS,
+                "samples": sampler.samples,
+                # flamegraph.pl / speedscope input: "frame;frame;frame count" per line
+                "collapsed": "\n".join(f"{root};{stack} {count}" for stack, count in sampler.stacks.most_common()),
+            }
+            try:
+                await run_in_threadpool(_store, profile)
+            except OSError:
+                logger.exception("could not store profile %s", profile_id)
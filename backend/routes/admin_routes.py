@@ -1,15 +1,43 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import PlainTextResponse
+from typing import Optional
 from pathlib import Path
-import json
+from datetime import datetime
 
+from sqlalchemy import insert, literal, select
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..models.db_models import User, Quest, TimerLog, QuestionLog
-from ..constants import SUBJECT_KO_KOREAN, DEFAULT_SUBJECT_RATIO_JSON
+from ..config import settings
+from ..database import SessionLocal, get_db
+from ..metrics import render_metrics
+from ..profiler import list_profiles, load_profile
+from ..models.db_models import (
+    DailySubjectMinutes,
+    PlannerCache,
+    Quest,
+    QuestArchive,
+    QuestTag,
+    QuestTombstone,
+    QuestionKeywordCount,
+    QuestionLog,
+    TimerLog,
+    TimerSession,
+    User,
+)
+from ..constants import DEFAULT_SUBJECT_RATIO_JSON
 from ..seed_loader import load_seed_quests
+from ..services.ai_problem_service import pool_levels
+from ..services.chat_cache import chat_cache
+from ..services.local_classifier import local_classifier
+from ..services.openai_pool import pool_stats
+from ..services.resilience import breaker_stats, reset_breakers
+from ..services.question_log_writer import question_log_writer
+from ..services.quest_reaper import reap_finished_quests, reaper_stats
+from ..services.quest_service import CREATED, bulk_create_quests, seed_schema
+from ..services.singleflight import flight_stats
+from ..services.timer_accumulator import timer_accumulator
 
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -17,9 +45,24 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.post("/reset_all")
 def reset_all(seed: bool = Query(False), db: Session = Depends(get_db)):
+    # buffered heartbeats belong to the data being wiped
+    timer_accumulator.clear()
+    db.query(TimerSession).delete(synchronize_session=False)
     timer_deleted = db.query(TimerLog).delete(synchronize_session=False)
+    db.query(DailySubjectMinutes).delete(synchronize_session=False)
+    db.query(QuestionKeywordCount).delete(synchronize_session=False)
     question_deleted = db.query(QuestionLog).delete(synchronize_session=False)
+    db.query(QuestTag).delete(synchronize_session=False)
+    # bulk delete skips the ORM flush hook; record tombstones so synced clients drop the quests
+    db.execute(
+        insert(QuestTombstone).from_select(
+            ["quest_id", "user_id", "deleted_at"],
+            select(Quest.id, Quest.user_id, literal(datetime.utcnow())),
+        )
+    )
     quest_deleted = db.query(Quest).delete(synchronize_session=False)
+    db.query(QuestArchive).delete(synchronize_session=False)
+    db.query(PlannerCache).delete(synchronize_session=False)
     user_deleted = db.query(User).delete(synchronize_session=False)
     db.commit()
 
@@ -36,26 +79,9 @@ def reset_all(seed: bool = Query(False), db: Session = Depends(get_db)):
     if seed:
         seed_path = Path(__file__).resolve().parents[2] / "data" / "seed_quests.json"
         quests, _meta = load_seed_quests(seed_path)
-        for q in quests:
-            db.add(
-                Quest(
-                    id=q["id"],
-                    user_id=q.get("user_id", "u1"),
-                    type=q.get("type", "time"),
-                    title=q.get("title", "Unnamed Quest"),
-                    subject=q.get("subject", SUBJECT_KO_KOREAN),
-                    goal_value=int(q.get("goal_value", 0)),
-                    progress_minutes=int(q.get("progress_value", 0)),
-                    status=q.get("status", "pending"),
-                    source=q.get("source", "ai_generated"),
-                    tags_json=json.dumps(q.get("tags") or []),
-                    tags_ko_json=json.dumps(q.get("tags_ko") or []),
-                    meta_json=json.dumps(q.get("meta") or {}),
-                )
-            )
-            created += 1
-        if quests:
-            db.commit()
+        outcomes = bulk_create_quests(db, [seed_schema(q) for q in quests])
+        created = sum(1 for outcome in outcomes if outcome.outcome == CREATED)
+        db.commit()
 
     return {
         "ok": True,
@@ -68,3 +94,87 @@ def reset_all(seed: bool = Query(False), db: Session = Depends(get_db)):
         "seeded_quests": created,
         "user": "u1",
     }
+
+
+@router.get("/chat_cache")
+def chat_cache_stats():
+    return chat_cache.stats()
+
+
+@router.post("/chat_cache/purge")
+def chat_cache_purge(expired_only: bool = Query(False)):
+    removed = chat_cache.purge(expired_only=expired_only)
+    return {"ok": True, "removed": removed, "stats": chat_cache.stats()}
+
+
+@router.get("/classifier")
+def classifier_status():
+    return local_classifier.status()
+
+
+@router.post("/classifier/reload")
+def classifier_reload(retrain: bool = Query(False), db: Session = Depends(get_db)):
+    # retrain=true rebuilds from question_logs; otherwise the model file is re-read (e.g. after the CLI trained it)
+    if retrain:
+        return local_classifier.train(db)
+    local_classifier.load()
+    return local_classifier.status()
+
+
+@router.get("/ai_problem_pool")
+def ai_problem_pool(db: Session = Depends(get_db)):
+    return {"watermark": settings.AI_PROBLEM_POOL_WATERMARK, "levels": pool_levels(db)}
+
+
+@router.get("/ai_breakers")
+def ai_breakers():
+    return {"breakers": breaker_stats(), "pool": pool_stats()}
+
+
+@router.post("/ai_breakers/reset")
+def ai_breakers_reset(model: Optional[str] = Query(None)):
+    reset_breakers(model)
+    return {"ok": True, "breakers": breaker_stats()}
+
+
+@router.get("/singleflight")
+def singleflight_stats():
+    return flight_stats()
+
+
+@router.get("/question_log_writer")
+def question_log_writer_stats():
+    return question_log_writer.stats()
+
+
+@router.get("/quest_reaper")
+def quest_reaper_stats():
+    return reaper_stats()
+
+
+@router.post("/quest_reaper/run")
+def quest_reaper_run(grace_seconds: Optional[int] = Query(None, ge=0)):
+    archived = reap_finished_quests(SessionLocal, grace_seconds=grace_seconds)
+    return {"ok": True, "archived": archived, "stats": reaper_stats()}
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/profiles")
+def profiles():
+    return {"profiles": list_profiles(), "max_files": settings.PROFILE_MAX_FILES}
+
+
+@router.get("/profiles/{profile_id}")
+def profile(profile_id: str, format: str = Query("collapsed", pattern="^(collapsed|json)$")):
+    stored = load_profile(profile_id)
+    if stored is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "json":
+        return stored
+    # collapsed stacks, ready for flamegraph.pl or speedscope
+    return PlainTextResponse(stored["collapsed"] + "\n")
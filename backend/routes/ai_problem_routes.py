@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 import json
@@ -7,17 +9,24 @@ import json
 from ..database import get_db
 from ..models.schemas import Quest as QuestSchema
 from ..models.db_models import Quest
-from ..services.ai_problem_service import generate_ai_problem_quest
+from ..services.ai_problem_service import POOL_DIFFICULTIES, generate_ai_problem_quest
 
 
 router = APIRouter(prefix="/ai/quests", tags=["ai-quests"])
 
 
 @router.post("/ai_problem", response_model=QuestSchema)
-def create_ai_problem(user_id: str = Query(...), subject: str = Query(...), db: Session = Depends(get_db)):
+async def create_ai_problem(
+    user_id: str = Query(...),
+    subject: str = Query(...),
+    difficulty: Optional[str] = Query(None),
+    db: Session = Depends(get_db),
+):
     if subject not in ["국어", "수학", "영어"]:
         raise HTTPException(status_code=400, detail="subject must be one of 국어/수학/영어")
-    q = generate_ai_problem_quest(db, user_id, subject)
+    if difficulty is not None and difficulty not in POOL_DIFFICULTIES:
+        raise HTTPException(status_code=400, detail="difficulty must be one of easy/medium/hard")
+    q = await generate_ai_problem_quest(db, user_id, subject, difficulty)
     return QuestSchema(
         id=q.id,
         user_id=q.user_id,
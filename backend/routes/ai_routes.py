@@ -1,38 +1,105 @@
+from typing import Any, Dict, Optional
+
 from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 
-from ..models.schemas import QuestionLogIn, QuestionLogOut, SuggestionResponse, ChatRequest, ChatResponse
-from ..models.db_models import QuestionLog, User
+from ..models.schemas import (
+    ChatRequest,
+    ChatResponse,
+    QuestionLogBatchRequest,
+    QuestionLogBatchResponse,
+    QuestionLogBatchResult,
+    QuestionLogIn,
+    QuestionLogOut,
+    SuggestionResponse,
+)
+from ..models.db_models import User
 from ..database import get_db
-from ..services.ai_service import handle_chat
-from ..services.planner_service import generate_planner_response
+from ..services.ai_service import chat_events, handle_chat, log_routed_question
+from ..services.planner_service import coalesced_planner_response
+from ..services.question_log_service import record_question_log, record_question_logs
 
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
+MAX_QUESTION_BATCH = 500
+
+
+def _log_out(row) -> QuestionLogOut:
+    return QuestionLogOut(id=str(row.id), user_id=row.user_id, subject=row.subject, text=row.text, difficulty=row.difficulty, created_at=row.created_at)
+
 
 @router.post("/logs/questions", response_model=QuestionLogOut)
 def add_question_log(payload: QuestionLogIn, db: Session = Depends(get_db)):
     user = db.get(User, payload.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    row = QuestionLog(user_id=payload.user_id, subject=payload.subject, text=payload.text, difficulty=payload.difficulty)
-    db.add(row)
+    row = record_question_log(db, payload.user_id, payload.subject, payload.text, payload.difficulty)
     db.commit()
-    return QuestionLogOut(id=str(row.id), user_id=row.user_id, subject=row.subject, text=row.text, difficulty=row.difficulty, created_at=row.created_at)
+    return _log_out(row)
+
+
+@router.post("/logs/questions/batch", response_model=QuestionLogBatchResponse)
+def add_question_logs(payload: QuestionLogBatchRequest, db: Session = Depends(get_db)):
+    """Write many question logs in one transaction; unknown users are reported per entry."""
+    if len(payload.entries) > MAX_QUESTION_BATCH:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_QUESTION_BATCH} entries per batch")
+    user_ids = {entry.user_id for entry in payload.entries}
+    known = {uid for (uid,) in db.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+    accepted = [(index, entry) for index, entry in enumerate(payload.entries) if entry.user_id in known]
+    rows = record_question_logs(db, [entry.model_dump() for _index, entry in accepted])
+    db.commit()
+    results = [
+        QuestionLogBatchResult(index=index, ok=False, error="User not found", status_code=404)
+        for index, entry in enumerate(payload.entries)
+        if entry.user_id not in known
+    ]
+    results += [QuestionLogBatchResult(index=index, ok=True, log=_log_out(row)) for (index, _entry), row in zip(accepted, rows)]
+    return QuestionLogBatchResponse(results=sorted(results, key=lambda result: result.index))
 
 
 @router.get("/planner/suggest", response_model=SuggestionResponse)
-def suggest(user_id: str = Query(...), db: Session = Depends(get_db)):
-    user = db.get(User, user_id)
-    if not user:
+async def suggest(user_id: str = Query(...)):
+    # double clicks and retries of one user share a single planner run
+    result = await coalesced_planner_response(user_id, days=7)
+    if result is None:
         raise HTTPException(status_code=404, detail="User not found")
-    quests, notes = generate_planner_response(db, user, days=7)
-    return SuggestionResponse(quests=quests, notes=notes)
+    quests, notes, source = result
+    return SuggestionResponse(quests=quests, notes=notes, source=source)
 
 
 @router.post("/chat", response_model=ChatResponse)
-def chat(payload: ChatRequest):
+async def chat(payload: ChatRequest):
     # All key handling on server side; frontend only sends question
-    answer = handle_chat(payload.user_id, payload.text, subject=payload.subject, difficulty=payload.difficulty)
+    answer = await handle_chat(payload.user_id, payload.text, subject=payload.subject, difficulty=payload.difficulty)
     return ChatResponse(answer=answer)
+
+
+def _chat_stream_response(user_id: str, text: str, subject: Optional[str], difficulty: Optional[str]) -> StreamingResponse:
+    route: Dict[str, Any] = {}
+    return StreamingResponse(
+        chat_events(text, subject, difficulty, route),
+        media_type="text/event-stream",
+        # no proxy buffering/caching: tokens must reach the browser as they arrive
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # question log is written after the stream, off the response path
+        background=BackgroundTask(log_routed_question, user_id, text, route),
+    )
+
+
+@router.post("/chat/stream")
+async def chat_stream(payload: ChatRequest):
+    return _chat_stream_response(payload.user_id, payload.text, payload.subject, payload.difficulty)
+
+
+@router.get("/chat/stream")
+async def chat_stream_get(
+    user_id: str = Query(...),
+    text: str = Query(...),
+    subject: Optional[str] = Query(None),
+    difficulty: Optional[str] = Query(None),
+):
+    # EventSource can only issue GET requests
+    return _chat_stream_response(user_id, text, subject, difficulty)
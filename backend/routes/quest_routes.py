@@ -1,5 +1,7 @@
-from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import List
+from fastapi import APIRouter, Header, HTTPException, Query, Depends, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Union
 from datetime import datetime
 import json
 import re
@@ -12,11 +14,23 @@ from ..models.schemas import (
     QuestResultResponse,
     PatchQuestRequest,
     QuestAnswerRequest,
+    QuestBulkCreateRequest,
+    QuestBulkPatchRequest,
+    QuestBulkResponse,
+    QuestBulkResult,
     QuestAnswerResponse,
+    QuestSyncResponse,
 )
 from ..models.db_models import Quest as QuestModel, QuestResultLog
 from ..database import get_db
-from ..constants import SUBJECTS, SUBJECT_KO_KOREAN
+from ..config import settings
+from ..constants import FINISHED_QUEST_STATUSES, SUBJECTS
+from ..services.timer_accumulator import timer_accumulator
+from ..services.tagging_service import find_active_tagged_quest
+from ..services.planner_cache import invalidate_planner_cache
+from ..services.quest_reaper import release_quest_id
+from ..services.quest_service import BulkOutcome, bulk_create_quests, bulk_patch_quests, quest_row
+from ..services.quest_sync import is_hidden, parse_cursor, quest_delta, sync_etag
 
 STUDY_TAG = "study"
 STUDY_TAG_KO = "\ud559\uc2b5"  # "학습"
@@ -45,22 +59,6 @@ def _schema_from_row(row: QuestModel) -> QuestSchema:
     )
 
 
-def _parse_tags(row: QuestModel) -> tuple[set[str], set[str]]:
-    tags = set()
-    tags_ko = set()
-    if row.tags_json:
-        try:
-            tags = set(json.loads(row.tags_json))
-        except Exception:
-            tags = set()
-    if row.tags_ko_json:
-        try:
-            tags_ko = set(json.loads(row.tags_ko_json))
-        except Exception:
-            tags_ko = set()
-    return tags, tags_ko
-
-
 def _normalized(text: str) -> str:
     return re.sub(r"\s+", "", (text or "")).lower()
 
@@ -74,74 +72,121 @@ def _extract_answers(meta: dict) -> list[str]:
     return []
 
 
-@router.get("", response_model=List[QuestSchema])
-def list_quests(user_id: str = Query(..., description="User ID"), db: Session = Depends(get_db)):
+def _list_item(row: QuestModel) -> QuestSchema:
+    item = _schema_from_row(row)
+    if settings.TIMER_WRITE_BEHIND and row.type == "time":
+        # include heartbeat seconds still sitting in the write-behind buffer
+        minutes, remainder, status = timer_accumulator.project(row)
+        item.progress_value = minutes
+        item.progress_seconds = minutes * 60 + remainder
+        item.status = status
+    return item
+
+
+def _quest_delta(db: Session, user_id: str, since: str, if_none_match: Optional[str]) -> Response:
+    try:
+        cursor = parse_cursor(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be 0 or a cursor returned by this endpoint")
+    etag = sync_etag(db, user_id)
+    if etag in [tag.strip() for tag in (if_none_match or "").split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    rows, deleted, next_cursor, full = quest_delta(db, user_id, cursor)
+    quests: List[QuestSchema] = []
+    for row in rows:
+        item = _list_item(row)
+        if is_hidden(row, item.status):
+            if not full:
+                deleted.append(row.id)
+            continue
+        quests.append(item)
+    payload = QuestSyncResponse(cursor=next_cursor, full=full, quests=quests, deleted=deleted)
+    return JSONResponse(jsonable_encoder(payload), headers={"ETag": etag})
+
+
+@router.get("", response_model=Union[List[QuestSchema], QuestSyncResponse])
+def list_quests(
+    user_id: str = Query(..., description="User ID"),
+    since: Optional[str] = Query(None, description="Delta sync: 0 for everything, then the cursor of the previous response"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+):
+    if since is not None:
+        return _quest_delta(db, user_id, since, if_none_match)
+    # pure read: finished quests are filtered here and archived by the background reaper
     rows = db.query(QuestModel).filter(QuestModel.user_id == user_id).all()
-    response: List[QuestSchema] = []
-    dirty = False
+    response_items: List[QuestSchema] = []
     for row in rows:
-        if row.type == "time" and row.goal_value and row.goal_value > 0:
-            if row.status == "completed" or row.progress_minutes >= row.goal_value:
-                db.delete(row)
-                dirty = True
-                continue
-        response.append(_schema_from_row(row))
-    if dirty:
-        db.commit()
-    return response
+        item = _list_item(row)
+        if not is_hidden(row, item.status):
+            response_items.append(item)
+    return response_items
 
 
 @router.post("", response_model=QuestSchema)
 def create_quest(q: QuestSchema, db: Session = Depends(get_db)):
     if q.type == "time" and q.subject in SUBJECTS:
-        active = (
-            db.query(QuestModel)
-            .filter(
-                QuestModel.user_id == q.user_id,
-                QuestModel.type == "time",
-                QuestModel.subject == q.subject,
-                QuestModel.status.in_(["pending", "in_progress", "paused"]),
-            )
-            .all()
-        )
         incoming_tags = set(q.tags or [])
         incoming_tags_ko = set(q.tags_ko or [])
         is_study = (STUDY_TAG in incoming_tags) or (STUDY_TAG_KO in incoming_tags_ko)
-
-        for row in active:
-            tags, tags_ko = _parse_tags(row)
-            if is_study:
-                if STUDY_TAG in tags or STUDY_TAG_KO in tags_ko:
-                    return _schema_from_row(row)
-            else:
-                if (incoming_tags and (incoming_tags & tags)) or (incoming_tags_ko and (incoming_tags_ko & tags_ko)):
-                    return _schema_from_row(row)
-
-    if db.get(QuestModel, q.id):
+        if is_study:
+            existing = find_active_tagged_quest(db, q.user_id, q.subject, en_tags=[STUDY_TAG], ko_tags=[STUDY_TAG_KO])
+        else:
+            existing = find_active_tagged_quest(db, q.user_id, q.subject, en_tags=incoming_tags, ko_tags=incoming_tags_ko)
+        if existing:
+            return _schema_from_row(existing)
+
+    # a finished quest the reaper has not archived yet must not block re-creating its id
+    if not release_quest_id(db, q.id):
         raise HTTPException(status_code=409, detail="Quest already exists")
 
-    now = datetime.utcnow()
-    row = QuestModel(
-        id=q.id,
-        user_id=q.user_id,
-        type=q.type,
-        title=q.title,
-        subject=q.subject or SUBJECT_KO_KOREAN,
-        goal_value=q.goal_value,
-        progress_minutes=q.progress_value or 0,
-        status=q.status,
-        source=q.source,
-        tags_json=json.dumps(q.tags or []),
-        tags_ko_json=json.dumps(q.tags_ko or []),
-        meta_json=json.dumps(q.meta or {}),
-        created_at=q.created_at or now,
-        updated_at=q.updated_at or now,
-    )
+    row = quest_row(q, datetime.utcnow())
     db.add(row)
+    # active quests feed the planner context
+    invalidate_planner_cache(db, [q.user_id])
     db.commit()
     return _schema_from_row(row)
 
 
+MAX_BULK_QUESTS = 500
+
+
+def _bulk_response(outcomes: List[BulkOutcome]) -> QuestBulkResponse:
+    return QuestBulkResponse(
+        results=[
+            QuestBulkResult(
+                index=index,
+                ok=outcome.ok,
+                outcome=outcome.outcome,
+                quest=_schema_from_row(outcome.row) if outcome.row is not None else None,
+                error=outcome.error,
+                status_code=outcome.status_code,
+            )
+            for index, outcome in enumerate(outcomes)
+        ]
+    )
+
+
+@router.post("/bulk", response_model=QuestBulkResponse)
+def create_quests_bulk(payload: QuestBulkCreateRequest, db: Session = Depends(get_db)):
+    """POST /quests for many quests in one transaction; outcomes are reported per entry."""
+    if len(payload.entries) > MAX_BULK_QUESTS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BULK_QUESTS} entries per batch")
+    outcomes = bulk_create_quests(db, payload.entries)
+    db.commit()
+    return _bulk_response(outcomes)
+
+
+# registered before /{quest_id} so "bulk" is not taken for a quest id
+@router.patch("/bulk", response_model=QuestBulkResponse)
+def patch_quests_bulk(payload: QuestBulkPatchRequest, db: Session = Depends(get_db)):
+    if len(payload.entries) > MAX_BULK_QUESTS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BULK_QUESTS} entries per batch")
+    outcomes = bulk_patch_quests(db, [(entry.id, entry) for entry in payload.entries])
+    db.commit()
+    return _bulk_response(outcomes)
+
+
 @router.patch("/{quest_id}", response_model=QuestSchema)
 def patch_quest(quest_id: str, payload: PatchQuestRequest, db: Session = Depends(get_db)):
     row = db.get(QuestModel, quest_id)
@@ -153,6 +198,7 @@ def patch_quest(quest_id: str, payload: PatchQuestRequest, db: Session = Depends
         row.progress_minutes = max(0, int(payload.progress_value))
     row.updated_at = datetime.utcnow()
     db.add(row)
+    invalidate_planner_cache(db, [row.user_id])
     db.commit()
     return _schema_from_row(row)
 
@@ -160,12 +206,13 @@ def patch_quest(quest_id: str, payload: PatchQuestRequest, db: Session = Depends
 @router.post("/{quest_id}/result", response_model=QuestResultResponse)
 def submit_quest_result(quest_id: str, payload: QuestResultRequest, db: Session = Depends(get_db)):
     row = db.get(QuestModel, quest_id)
-    if not row or row.user_id != payload.user_id:
+    if not row or row.user_id != payload.user_id or row.status in FINISHED_QUEST_STATUSES:
         raise HTTPException(status_code=404, detail="Quest not found")
     if payload.result not in ("success", "failure"):
         raise HTTPException(status_code=400, detail="result must be 'success' or 'failure'")
     db.add(QuestResultLog(user_id=payload.user_id, quest_id=quest_id, subject=row.subject, result=payload.result))
-    db.delete(row)
+    invalidate_planner_cache(db, [payload.user_id])
+    row.status = "completed" if payload.result == "success" else "failed"
     db.commit()
     return QuestResultResponse(ok=True)
 
@@ -173,7 +220,7 @@ def submit_quest_result(quest_id: str, payload: QuestResultRequest, db: Session
 @router.post("/{quest_id}/answer", response_model=QuestAnswerResponse)
 def submit_quest_answer(quest_id: str, payload: QuestAnswerRequest, db: Session = Depends(get_db)):
     row = db.get(QuestModel, quest_id)
-    if not row or row.user_id != payload.user_id:
+    if not row or row.user_id != payload.user_id or row.status in FINISHED_QUEST_STATUSES:
         raise HTTPException(status_code=404, detail="Quest not found")
     try:
         meta = json.loads(row.meta_json) if row.meta_json else {}
@@ -189,9 +236,10 @@ def submit_quest_answer(quest_id: str, payload: QuestAnswerRequest, db: Session
     explanation = meta.get("explanation")
     expected_display = normalized_expected.get(normalized_input) or answers[0]
 
+    invalidate_planner_cache(db, [payload.user_id])
     if correct:
         db.add(QuestResultLog(user_id=payload.user_id, quest_id=quest_id, subject=row.subject, result="success"))
-        db.delete(row)
+        row.status = "completed"
         db.commit()
     else:
         db.add(QuestResultLog(user_id=payload.user_id, quest_id=quest_id, subject=row.subject, result="failure"))
@@ -1,59 +1,87 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Query, Depends
-from typing import Dict, List
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Query, Depends
+from typing import Dict, List, Tuple
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
 from ..database import get_db
 from ..models.db_models import TimerLog, Quest
+from ..constants import DAY_RESET_TIMEZONE
+from ..services.rollup_service import daily_seconds
 
 
 router = APIRouter(prefix="/stats", tags=["stats"])
 
 
-@router.get("/summary")
-def summary(user_id: str = Query(...), days: int = Query(7, ge=1, le=30), db: Session = Depends(get_db)):
-    cutoff = datetime.utcnow() - timedelta(days=days)
+def _resolve_tz(tz_name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Unknown time zone: {tz_name}")
 
-    # 과목별 총합(분)
+
+def _local_window(zone: ZoneInfo, days: int) -> Tuple[List[date], datetime, int]:
+    """Local calendar days of the window, its start as naive UTC, and the UTC offset in minutes.
+
+    The zone's current offset is applied to the whole window (exact for zones
+    without DST such as Asia/Seoul).
+    """
+    now_local = datetime.now(timezone.utc).astimezone(zone)
+    today = now_local.date()
+    dates = [today - timedelta(days=(days - 1 - i)) for i in range(days)]
+    offset = now_local.utcoffset() or timedelta(0)
+    start_utc = datetime.combine(dates[0], datetime.min.time()) - offset
+    return dates, start_utc, int(offset.total_seconds() // 60)
+
+
+def daily_subject_seconds(
+    db: Session, user_id: str, start_utc: datetime, offset_minutes: int
+) -> Dict[Tuple[str, str], int]:
+    """Seconds per (local date ISO string, subject) since start_utc, in one grouped query."""
     subject_expr = func.coalesce(TimerLog.subject, Quest.subject)
+    day_expr = func.date(TimerLog.created_at, f"{offset_minutes:+d} minutes")
     rows = (
-        db.query(subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
+        db.query(day_expr.label("day"), subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
         .outerjoin(Quest, Quest.id == TimerLog.quest_id)
-        .filter(TimerLog.user_id == user_id, TimerLog.created_at >= cutoff)
-        .group_by(subject_expr)
+        .filter(TimerLog.user_id == user_id, TimerLog.created_at >= start_utc)
+        .group_by(day_expr, subject_expr)
         .all()
     )
-    totals_by_subject: Dict[str, int] = {"국어": 0, "수학": 0, "영어": 0}
-    for subj, sec_sum in rows:
-        if subj in totals_by_subject:
-            totals_by_subject[subj] = int((sec_sum or 0) // 60)
+    return {(day, subj): int(sec_sum or 0) for day, subj, sec_sum in rows}
+
+
+@router.get("/summary")
+def summary(
+    user_id: str = Query(...),
+    days: int = Query(7, ge=1, le=30),
+    tz: str = Query(DAY_RESET_TIMEZONE, description="IANA time zone for day boundaries"),
+    db: Session = Depends(get_db),
+):
+    zone = _resolve_tz(tz)
+    dates, start_utc, offset_minutes = _local_window(zone, days)
+    if tz == DAY_RESET_TIMEZONE:
+        # the rollup is keyed by day-reset dates, so it answers the default zone in O(days)
+        seconds = daily_seconds(db, user_id, dates[0])
+    else:
+        seconds = daily_subject_seconds(db, user_id, start_utc, offset_minutes)
+
+    # 과목별 총합(분)
+    totals_seconds: Dict[str, int] = {"국어": 0, "수학": 0, "영어": 0}
+    for (_day, subj), sec_sum in seconds.items():
+        if subj in totals_seconds:
+            totals_seconds[subj] += sec_sum
+    totals_by_subject = {subj: value // 60 for subj, value in totals_seconds.items()}
 
     # 일별 합계(분)
     daily: List[Dict] = []
-    for i in range(days):
-        d = (datetime.utcnow() - timedelta(days=(days - 1 - i))).date()
-        day_start = datetime.combine(d, datetime.min.time())
-        day_end = day_start + timedelta(days=1)
-        day_rows = (
-            db.query(subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
-            .outerjoin(Quest, Quest.id == TimerLog.quest_id)
-            .filter(
-                TimerLog.user_id == user_id,
-                TimerLog.created_at >= day_start,
-                TimerLog.created_at < day_end,
-            )
-            .group_by(subject_expr)
-            .all()
-        )
-        mb = {"국어": 0, "수학": 0, "영어": 0}
-        for subj, sec_sum in day_rows:
-            if subj in mb:
-                mb[subj] = int((sec_sum or 0) // 60)
-        daily.append({"date": d.isoformat(), "minutes_by_subject": mb, "total_minutes": sum(mb.values())})
+    for d in dates:
+        key = d.isoformat()
+        mb = {subj: seconds.get((key, subj), 0) // 60 for subj in ("국어", "수학", "영어")}
+        daily.append({"date": key, "minutes_by_subject": mb, "total_minutes": sum(mb.values())})
 
     # 연속 학습일 수(최근부터 역순): 하루 총합 > 0 인 날 연속 카운트
     streak = 0
@@ -65,6 +93,7 @@ def summary(user_id: str = Query(...), days: int = Query(7, ge=1, le=30), db: Se
 
     return {
         "range_days": days,
+        "tz": tz,
         "totals_by_subject": totals_by_subject,
         "total_minutes": sum(totals_by_subject.values()),
         "daily": daily,
@@ -1,13 +1,38 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from typing import List
 from datetime import datetime
 import json
 
 from sqlalchemy.orm import Session
 
-from ..models.schemas import TimerUpdateRequest, Quest as QuestSchema
-from ..models.db_models import Quest as QuestModel, TimerLog, User
+from ..models.schemas import (
+    TimerUpdateRequest,
+    TimerBatchRequest,
+    TimerBatchResult,
+    TimerBatchResponse,
+    TimerStartRequest,
+    TimerStopRequest,
+    TimerSessionOut,
+    TimerStateResponse,
+    Quest as QuestSchema,
+)
+from ..models.db_models import Quest as QuestModel, TimerSession, User
 from ..database import get_db
-from ..services.tagging_service import has_active_subject_tag
+from ..config import settings
+from ..services.timer_service import apply_delta, write_timer_logs
+from ..services.timer_accumulator import timer_accumulator
+from ..services.timer_sessions import (
+    start_session,
+    end_session,
+    checkpoint_session,
+    live_progress,
+    is_due_for_completion,
+    is_stale,
+)
+from ..services.quest_reaper import release_quest_id
+from ..services.tagging_service import find_active_tagged_quest
 from ..services.goal_policy import resolve_goal_minutes, DEFAULT_ALLOWED_MINUTES
 from ..constants import SUBJECTS, STUDY_TAG, STUDY_TAG_KO, SUBJECT_KO_KOREAN
 
@@ -34,119 +59,225 @@ def _quest_schema(row: QuestModel) -> QuestSchema:
     )
 
 
-def _parse_tags(row: QuestModel) -> tuple[list[str], list[str]]:
-    tags = []
-    tags_ko = []
-    if row.tags_json:
-        try:
-            tags = json.loads(row.tags_json)
-        except Exception:
-            tags = []
-    if row.tags_ko_json:
-        try:
-            tags_ko = json.loads(row.tags_ko_json)
-        except Exception:
-            tags_ko = []
-    return tags, tags_ko
-
+MAX_BATCH_ENTRIES = 1000
 
-@router.post("/update", response_model=QuestSchema)
-def timer_update(payload: TimerUpdateRequest, db: Session = Depends(get_db)):
-    row = None
 
+def _resolve_quest(db: Session, payload: TimerUpdateRequest) -> QuestModel:
+    """Find (or auto-create) the quest a timer delta applies to. Does not commit."""
     if payload.quest_id:
         row = db.get(QuestModel, payload.quest_id)
         if not row or row.user_id != payload.user_id:
             raise HTTPException(status_code=404, detail="Quest not found")
-    else:
-        if not payload.subject:
-            raise HTTPException(status_code=400, detail="subject or quest_id required")
-
-        rows = (
-            db.query(QuestModel)
-            .filter(
-                QuestModel.user_id == payload.user_id,
-                QuestModel.subject == payload.subject,
-                QuestModel.type == "time",
-                QuestModel.status.in_(["pending", "in_progress", "paused"]),
-            )
-            .order_by(QuestModel.created_at.asc())
-            .all()
-        )
+        return row
+
+    if not payload.subject:
+        raise HTTPException(status_code=400, detail="subject or quest_id required")
+
+    row = find_active_tagged_quest(
+        db, payload.user_id, payload.subject, en_tags=[STUDY_TAG], ko_tags=[STUDY_TAG_KO]
+    )
+    if row is not None:
+        return row
+
+    user = db.get(User, payload.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    if payload.subject not in SUBJECTS:
+        raise HTTPException(status_code=400, detail="Unsupported subject")
+
+    try:
+        ratio = json.loads(user.subject_ratio_json)
+    except Exception:
+        ratio = {}
+    daily = int(user.daily_minutes_goal or 90)
+    want = max(1, int(daily * float(ratio.get(payload.subject, 0))))
+    goal = resolve_goal_minutes(
+        {"preferred": want, "mode": "nearest"},
+        {"allowed_minutes": DEFAULT_ALLOWED_MINUTES},
+    )
+
+    # user_id in the id keeps auto quests of different users apart within the same second
+    quest_id = f"auto_{payload.user_id}_{payload.subject}_{int(datetime.utcnow().timestamp())}"
+    # an auto quest completed within the same second still holds the id until the reaper archives it
+    if not release_quest_id(db, quest_id):
+        return db.get(QuestModel, quest_id)
+
+    tags_en = [STUDY_TAG]
+    tags_ko = [STUDY_TAG_KO]
+    row = QuestModel(
+        id=quest_id,
+        user_id=payload.user_id,
+        type="time",
+        title=f"{payload.subject} 학습 {goal}분",
+        subject=payload.subject or SUBJECT_KO_KOREAN,
+        goal_value=goal,
+        status="pending",
+        source="ai_generated",
+        tags_json=json.dumps(tags_en),
+        tags_ko_json=json.dumps(tags_ko),
+    )
+    db.add(row)
+    # flush so later lookups in the same transaction (batch entries) see the new quest
+    db.flush()
+    return row
 
-        for candidate in rows:
-            tags, tags_ko = _parse_tags(candidate)
-            if STUDY_TAG in tags or STUDY_TAG_KO in tags_ko:
-                row = candidate
-                break
-
-        if row is None:
-            user = db.get(User, payload.user_id)
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-            if payload.subject not in SUBJECTS:
-                raise HTTPException(status_code=400, detail="Unsupported subject")
-
-            try:
-                ratio = json.loads(user.subject_ratio_json)
-            except Exception:
-                ratio = {}
-            daily = int(user.daily_minutes_goal or 90)
-            want = max(1, int(daily * float(ratio.get(payload.subject, 0))))
-            goal = resolve_goal_minutes(
-                {"preferred": want, "mode": "nearest"},
-                {"allowed_minutes": DEFAULT_ALLOWED_MINUTES},
-            )
-
-            tags_en = [STUDY_TAG]
-            tags_ko = [STUDY_TAG_KO]
-            existing_study = has_active_subject_tag(db, payload.user_id, payload.subject, STUDY_TAG_KO)
-            if existing_study:
-                row = existing_study
-            else:
-                row = QuestModel(
-                    id=f"auto_{payload.subject}_{int(datetime.utcnow().timestamp())}",
-                    user_id=payload.user_id,
-                    type="time",
-                    title=f"{payload.subject} 학습 {goal}분",
-                    subject=payload.subject or SUBJECT_KO_KOREAN,
-                    goal_value=goal,
-                    status="pending",
-                    source="ai_generated",
-                    tags_json=json.dumps(tags_en),
-                    tags_ko_json=json.dumps(tags_ko),
-                )
-                db.add(row)
-                db.commit()
 
+def _apply_entry(db: Session, row: QuestModel, delta_seconds: int, logs: List[dict]) -> QuestSchema:
+    """Apply (or buffer, in write-behind mode) one delta; timer_logs rows to write are appended to logs."""
     if row.status == "completed":
-        completed = _quest_schema(row)
-        db.delete(row)
-        db.commit()
-        return completed
-
-    delta_seconds = max(0, int(payload.delta_seconds))
-    total_seconds = (row.progress_seconds_remainder or 0) + delta_seconds
-    inc_minutes = total_seconds // 60
-    row.progress_seconds_remainder = total_seconds % 60
-    row.progress_minutes = int(row.progress_minutes or 0) + int(inc_minutes)
-    row.status = "completed" if row.progress_minutes >= int(row.goal_value or 0) else "in_progress"
-    row.updated_at = datetime.utcnow()
-
-    if delta_seconds > 0:
-        db.add(
-            TimerLog(
-                user_id=payload.user_id,
-                quest_id=row.id,
-                subject=row.subject,
-                delta_seconds=delta_seconds,
-            )
+        return _quest_schema(row)
+    if settings.TIMER_WRITE_BEHIND:
+        timer_accumulator.add(row, delta_seconds)
+        minutes, remainder, status = timer_accumulator.project(row)
+        if status != "completed":
+            result = _quest_schema(row)
+            result.progress_value = minutes
+            result.progress_seconds = minutes * 60 + remainder
+            result.status = status
+            return result
+        # completion is written through immediately so the reaper and synced clients see it
+        delta_seconds = timer_accumulator.take(row.user_id, row.id)
+    applied = apply_delta(db, row, delta_seconds)
+    if settings.TIMER_WRITE_BEHIND:
+        # buffered time is logged even if a flush completed the quest meanwhile, as the flush itself does
+        applied = delta_seconds
+    if applied > 0:
+        logs.append(
+            {
+                "user_id": row.user_id,
+                "quest_id": row.id,
+                "subject": row.subject,
+                "delta_seconds": applied,
+            }
         )
-    db.add(row)
+    return _quest_schema(row)
+
+
+@router.post("/update", response_model=QuestSchema)
+def timer_update(payload: TimerUpdateRequest, db: Session = Depends(get_db)):
+    row = _resolve_quest(db, payload)
+    logs: List[dict] = []
+    result = _apply_entry(db, row, payload.delta_seconds, logs)
+    write_timer_logs(db, logs)
+    # a completed quest stays until the background reaper archives it
+    db.commit()
+    return result
+
+
+@router.post("/update_batch", response_model=TimerBatchResponse)
+def timer_update_batch(payload: TimerBatchRequest, db: Session = Depends(get_db)):
+    """Apply many heartbeats in one transaction; errors are reported per entry."""
+    if len(payload.entries) > MAX_BATCH_ENTRIES:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_ENTRIES} entries per batch")
+
+    results: List[TimerBatchResult] = []
+    logs: List[dict] = []
+    for index, entry in enumerate(payload.entries):
+        try:
+            row = _resolve_quest(db, entry)
+        except HTTPException as exc:
+            results.append(TimerBatchResult(index=index, ok=False, error=str(exc.detail), status_code=exc.status_code))
+            continue
+        was_completed = row.status == "completed"
+        result = _apply_entry(db, row, entry.delta_seconds, logs)
+        if row.status == "completed" and not was_completed:
+            # autoflush is off: later entries for this subject must not resolve to the quest just completed
+            db.flush()
+        results.append(TimerBatchResult(index=index, ok=True, quest=result))
+
+    write_timer_logs(db, logs)
     db.commit()
+    return TimerBatchResponse(results=results)
 
-    result = _quest_schema(row)
-    if result.status == "completed":
-        db.delete(row)
-        db.commit()
+
+def _session_out(session: TimerSession, row: QuestModel | None, now: datetime) -> TimerSessionOut:
+    quest = None
+    if row is not None:
+        quest = _quest_schema(row)
+        minutes, remainder, status = live_progress(row, session, now)
+        quest.progress_value = minutes
+        quest.progress_seconds = minutes * 60 + remainder
+        quest.status = status
+    return TimerSessionOut(
+        id=session.id,
+        kind=session.kind,
+        quest_id=session.quest_id,
+        subject=session.subject,
+        started_at=session.started_at,
+        elapsed_seconds=max(0, int((now - session.started_at).total_seconds())),
+        quest=quest,
+    )
+
+
+@router.post("/start", response_model=TimerSessionOut)
+def timer_start(payload: TimerStartRequest, db: Session = Depends(get_db)):
+    """Start a server-clock session; elapsed time is computed from the stored start instead of pushed deltas."""
+    row = _resolve_quest(
+        db,
+        TimerUpdateRequest(user_id=payload.user_id, quest_id=payload.quest_id, subject=payload.subject, delta_seconds=0),
+    )
+    if row.status == "completed":
+        raise HTTPException(status_code=409, detail="Quest already completed")
+    now = datetime.utcnow()
+    session = start_session(db, row, "quest" if payload.quest_id else "global", now)
+    result = _session_out(session, row, now)
+    db.commit()
     return result
+
+
+async def _stop_request(request: Request) -> TimerStopRequest:
+    # navigator.sendBeacon (page hide) can only send CORS-safelisted types, so the JSON may arrive as text/plain
+    try:
+        return TimerStopRequest.model_validate_json(await request.body())
+    except ValidationError as exc:
+        raise RequestValidationError(exc.errors())
+
+
+@router.post(
+    "/stop",
+    response_model=TimerStateResponse,
+    # the body is parsed by _stop_request, so document it here
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": TimerStopRequest.model_json_schema()}},
+            "required": True,
+        }
+    },
+)
+def timer_stop(payload: TimerStopRequest = Depends(_stop_request), db: Session = Depends(get_db)):
+    query = db.query(TimerSession).filter(TimerSession.user_id == payload.user_id)
+    if payload.quest_id:
+        query = query.filter(TimerSession.quest_id == payload.quest_id)
+    if payload.kind:
+        query = query.filter(TimerSession.kind == payload.kind)
+    now = datetime.utcnow()
+    logs: List[dict] = []
+    stopped: List[TimerSessionOut] = []
+    for session in query.all():
+        row = end_session(db, session, now, logs)
+        stopped.append(_session_out(session, row, now))
+    write_timer_logs(db, logs)
+    db.commit()
+    return TimerStateResponse(server_time=now, sessions=stopped)
+
+
+@router.get("/state", response_model=TimerStateResponse)
+def timer_state(user_id: str = Query(...), db: Session = Depends(get_db)):
+    """Progress of the user's open sessions; each poll also marks them as still watched (see credit_limit)."""
+    now = datetime.utcnow()
+    logs: List[dict] = []
+    sessions: List[TimerSessionOut] = []
+    for session in db.query(TimerSession).filter(TimerSession.user_id == user_id).all():
+        if is_stale(session, now):
+            # the page was gone past the liveness window: close at the limit instead of crediting the gap
+            end_session(db, session, now, logs)
+            continue
+        session.last_seen_at = now
+        row = db.get(QuestModel, session.quest_id)
+        if row is not None and is_due_for_completion(row, session, now):
+            # completion is persisted as soon as it is observed, not at the next sweep
+            row = checkpoint_session(db, session, now, logs)
+        sessions.append(_session_out(session, row, now))
+    write_timer_logs(db, logs)
+    db.commit()
+    return TimerStateResponse(server_time=now, sessions=sessions)
@@ -1,18 +1,29 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 import json
+import logging
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from ..config import settings
-from ..constants import SUBJECT_KO_ENGLISH
-from ..models.db_models import Quest
+from ..constants import SUBJECT_KO_ENGLISH, SUBJECTS
+from ..database import SessionLocal
+from ..models.db_models import AIProblemPoolItem, Quest
+from .openai_pool import PoolBusy, create_chat_completion
+from .quest_reaper import release_quest_id
+from .resilience import BudgetExceeded, CircuitOpen
+from .singleflight import problem_flights
 
 
+logger = logging.getLogger(__name__)
+
 AI_TAG_KO = "AI문제"
 AI_TAG_EN = "ai-problem"
+POOL_DIFFICULTIES = ("easy", "medium", "hard")
 
 
 def _fallback_vocab_problem() -> Dict[str, Any]:
@@ -41,36 +52,71 @@ def _fallback_math_problem() -> Dict[str, Any]:
     }
 
 
-def _call_openai_problem(subject: str) -> Dict[str, Any]:
+def _fallback_problem(subject: str) -> Dict[str, Any]:
+    return _fallback_vocab_problem() if subject == SUBJECT_KO_ENGLISH else _fallback_math_problem()
+
+
+def _problem_prompt(subject: str, difficulty: Optional[str], count: int) -> List[Dict[str, str]]:
+    level = f" 난이도는 {difficulty}." if difficulty else ""
+    if subject == SUBJECT_KO_ENGLISH:
+        sys = (
+            "너는 영어 단어 테스트를 만드는 튜터다. 한 단어를 제시하고 학생이 한국어 뜻을 직접 입력하도록 하라."
+            "JSON으로만 답하고 키는 title_suffix, difficulty, question, correct_answers(배열), explanation 이다."
+        )
+        user = "영어 단어 테스트 1개 생성"
+    else:
+        sys = (
+            "너는 수학 계산 문제를 내는 튜터다. 학생이 숫자를 직접 입력하도록 하라."
+            "JSON으로만 답하고 키는 title_suffix, difficulty, question, correct_answers(배열), explanation 이다."
+        )
+        user = "고등 수학 계산 문제 1개 생성"
+    if count > 1:
+        # batch refill: same item schema, wrapped in {"problems": [...]}
+        sys += f' 문제 {count}개를 서로 겹치지 않게 만들고 {{"problems": [...]}} 형태로 답하라.'
+        user = user.replace("1개", f"{count}개")
+    return [{"role": "system", "content": sys + level}, {"role": "user", "content": user}]
+
+
+def _finish_payload(data: Dict[str, Any], difficulty: Optional[str]) -> Dict[str, Any]:
+    data.setdefault("correct_answers", [data.get("answer")] if data.get("answer") else [])
+    data.setdefault("input_type", "text")
+    if difficulty:
+        data["difficulty"] = difficulty
+    data["model"] = settings.OPENAI_MODEL_FULL
+    return data
+
+
+async def _call_openai_problem(subject: str, difficulty: Optional[str] = None) -> Dict[str, Any]:
     if not settings.OPENAI_API_KEY:
-        return _fallback_vocab_problem() if subject == SUBJECT_KO_ENGLISH else _fallback_math_problem()
+        return _fallback_problem(subject)
     try:
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        if subject == SUBJECT_KO_ENGLISH:
-            sys = (
-                "너는 영어 단어 테스트를 만드는 튜터다. 한 단어를 제시하고 학생이 한국어 뜻을 직접 입력하도록 하라."
-                "JSON으로만 답하고 키는 title_suffix, difficulty, question, correct_answers(배열), explanation 이다."
-            )
-            user = "영어 단어 테스트 1개 생성"
-        else:
-            sys = (
-                "너는 수학 계산 문제를 내는 튜터다. 학생이 숫자를 직접 입력하도록 하라."
-                "JSON으로만 답하고 키는 title_suffix, difficulty, question, correct_answers(배열), explanation 이다."
-            )
-            user = "고등 수학 계산 문제 1개 생성"
-        resp = client.chat.completions.create(
+        resp = await create_chat_completion(
             model=settings.OPENAI_MODEL_FULL,
             temperature=0.4,
-            messages=[{"role": "system", "content": sys}, {"role": "user", "content": user}],
+            messages=_problem_prompt(subject, difficulty, 1),
         )
         data = json.loads(resp.choices[0].message.content or "{}")
-        data.setdefault("correct_answers", [data.get("answer")] if data.get("answer") else [])
-        data.setdefault("input_type", "text")
-        data["model"] = settings.OPENAI_MODEL_FULL
-        return data
+        return _finish_payload(data, difficulty)
     except Exception:
-        return _fallback_vocab_problem() if subject == SUBJECT_KO_ENGLISH else _fallback_math_problem()
+        return _fallback_problem(subject)
+
+
+async def _generate_problem_batch(subject: str, difficulty: str, count: int) -> List[Dict[str, Any]]:
+    """Several problems from one model call; malformed items are dropped."""
+    resp = await create_chat_completion(
+        model=settings.OPENAI_MODEL_FULL,
+        temperature=0.7,
+        messages=_problem_prompt(subject, difficulty, count),
+    )
+    data = json.loads(resp.choices[0].message.content or "{}")
+    items = data.get("problems") if isinstance(data, dict) else data
+    if isinstance(data, dict) and items is None and data.get("question"):
+        items = [data]
+    problems = []
+    for item in items or []:
+        if isinstance(item, dict) and item.get("question") and _ensure_answer_list(item):
+            problems.append(_finish_payload(item, difficulty))
+    return problems[:count]
 
 
 def _ensure_answer_list(payload: Dict[str, Any]) -> List[str]:
@@ -82,9 +128,8 @@ def _ensure_answer_list(payload: Dict[str, Any]) -> List[str]:
     return []
 
 
-def generate_ai_problem_quest(db: Session, user_id: str, subject: str) -> Quest:
-    # Enforce one active AI-problem quest per subject
-    existing = (
+def _active_problem_quest(db: Session, user_id: str, subject: str) -> Quest | None:
+    return (
         db.query(Quest)
         .filter(
             Quest.user_id == user_id,
@@ -94,16 +139,26 @@ def generate_ai_problem_quest(db: Session, user_id: str, subject: str) -> Quest:
         )
         .first()
     )
+
+
+def _save_problem_quest(db: Session, user_id: str, subject: str, payload: Dict[str, Any]) -> Quest:
+    # the model call may have raced another request for the same subject
+    existing = _active_problem_quest(db, user_id, subject)
     if existing:
         return existing
 
-    payload = _call_openai_problem(subject)
     title_suffix = payload.get("title_suffix") or "AI 문제"
     title = f"{subject} {title_suffix}"
     answers = _ensure_answer_list(payload)
 
+    # per user: coalesced requests for one subject all save their quests in the same second
+    quest_id = f"ai_{subject}_{user_id}_{int(datetime.utcnow().timestamp())}"
+    # a problem answered within the same second still holds the id until the reaper archives it
+    if not release_quest_id(db, quest_id):
+        return db.get(Quest, quest_id)
+
     q = Quest(
-        id=f"ai_{subject}_{int(datetime.utcnow().timestamp())}",
+        id=quest_id,
         user_id=user_id,
         type="problem",
         title=title,
@@ -126,4 +181,110 @@ def generate_ai_problem_quest(db: Session, user_id: str, subject: str) -> Quest:
     )
     db.add(q)
     db.commit()
+    # load the committed row here so the async route does no lazy I/O on the event loop
+    db.refresh(q)
     return q
+
+
+def pop_pooled_problem(db: Session, subject: str, difficulty: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Take the oldest ready problem for subject (and difficulty), or None when the pool is empty."""
+    for _attempt in range(3):
+        query = db.query(AIProblemPoolItem.id, AIProblemPoolItem.payload_json).filter(
+            AIProblemPoolItem.subject == subject
+        )
+        if difficulty:
+            query = query.filter(AIProblemPoolItem.difficulty == difficulty)
+        row = query.order_by(AIProblemPoolItem.id).first()
+        if row is None:
+            return None
+        # the id-guarded delete makes concurrent pops of the same row lose cleanly
+        taken = db.query(AIProblemPoolItem).filter(AIProblemPoolItem.id == row.id).delete(synchronize_session=False)
+        db.commit()
+        if taken:
+            return json.loads(row.payload_json)
+    return None
+
+
+def pool_levels(db: Session) -> Dict[str, Dict[str, int]]:
+    levels = {subject: {difficulty: 0 for difficulty in POOL_DIFFICULTIES} for subject in SUBJECTS}
+    rows = (
+        db.query(AIProblemPoolItem.subject, AIProblemPoolItem.difficulty, func.count(AIProblemPoolItem.id))
+        .group_by(AIProblemPoolItem.subject, AIProblemPoolItem.difficulty)
+        .all()
+    )
+    for subject, difficulty, count in rows:
+        levels.setdefault(subject, {})[difficulty] = count
+    return levels
+
+
+def _store_problems(subject: str, difficulty: str, problems: List[Dict[str, Any]]) -> None:
+    db = SessionLocal()
+    try:
+        db.add_all(
+            AIProblemPoolItem(subject=subject, difficulty=difficulty, payload_json=json.dumps(p, ensure_ascii=False))
+            for p in problems
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _read_pool_levels() -> Dict[str, Dict[str, int]]:
+    db = SessionLocal()
+    try:
+        return pool_levels(db)
+    finally:
+        db.close()
+
+
+async def refill_problem_pool() -> int:
+    """Top every subject/difficulty up to AI_PROBLEM_POOL_WATERMARK; returns problems added.
+
+    At most AI_PROBLEM_POOL_MAX_CALLS model calls per run, emptiest slots first,
+    so a cold start fills gradually instead of bursting the model quota. An
+    open breaker, budget or full model queue ends the run; any other failure
+    skips just that slot.
+    """
+    watermark = settings.AI_PROBLEM_POOL_WATERMARK
+    if watermark <= 0 or not settings.OPENAI_API_KEY:
+        # without a key live calls are the instant demo problems; nothing to pre-generate
+        return 0
+    levels = await run_in_threadpool(_read_pool_levels)
+    deficits = sorted(
+        (
+            (count, subject, difficulty)
+            for subject, by_difficulty in levels.items()
+            for difficulty, count in by_difficulty.items()
+            if count < watermark
+        ),
+    )
+    added = 0
+    for count, subject, difficulty in deficits[: settings.AI_PROBLEM_POOL_MAX_CALLS]:
+        batch = min(settings.AI_PROBLEM_POOL_BATCH, watermark - count)
+        try:
+            problems = await _generate_problem_batch(subject, difficulty, batch)
+        except (CircuitOpen, BudgetExceeded, PoolBusy):
+            # upstream is unhealthy or saturated by live requests; the next run tries again
+            break
+        except Exception:
+            # a timeout or an unusable payload only costs this slot
+            logger.warning("problem pool refill failed for %s/%s", subject, difficulty, exc_info=True)
+            continue
+        if problems:
+            await run_in_threadpool(_store_problems, subject, difficulty, problems)
+            added += len(problems)
+    return added
+
+
+async def generate_ai_problem_quest(db: Session, user_id: str, subject: str, difficulty: Optional[str] = None) -> Quest:
+    # Enforce one active AI-problem quest per subject
+    existing = await run_in_threadpool(_active_problem_quest, db, user_id, subject)
+    if existing:
+        return existing
+
+    # Pre-generated problem first; live call (or the demo fallback) only when the pool is dry
+    payload = await run_in_threadpool(pop_pooled_problem, db, subject, difficulty)
+    if payload is None:
+        # a class pressing the button together shares one live call per subject/difficulty
+        payload = await problem_flights.do((subject, difficulty), lambda: _call_openai_problem(subject, difficulty))
+    return await run_in_threadpool(_save_problem_quest, db, user_id, subject, payload)
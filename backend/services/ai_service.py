@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from typing import Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 from textwrap import shorten
 import json
 
-from ..models.db_models import QuestionLog
+from starlette.concurrency import run_in_threadpool
+
 from ..config import settings
 from ..database import SessionLocal
+from .chat_cache import cache_key, chat_cache
+from .local_classifier import local_classifier
+from .question_log_service import record_question_log
+from .question_log_writer import question_log_writer
+from .openai_pool import PoolBusy, create_chat_completion, stream_chat_completion
+from .resilience import BudgetExceeded, CircuitOpen
 
 
 SYSTEM_PROMPT = (
@@ -16,20 +23,25 @@ SYSTEM_PROMPT = (
 )
 
 
-def _call_openai(messages: list[dict], *, model: Optional[str] = None) -> str:
+# breaker open or latency budget exceeded; [BUSY] keeps it out of the answer cache
+UPSTREAM_SLOW_MESSAGE = "[BUSY] AI 응답이 지연되고 있어 잠시 후 다시 시도해 주세요."
+
+
+async def _call_openai(messages: list[dict], *, model: Optional[str] = None) -> str:
     if not settings.OPENAI_API_KEY:
         return "[DEMO] OpenAI API 키가 설정되지 않았습니다. .env의 OPENAI_API_KEY를 설정하세요."
     try:
-        # Lazy import to avoid dependency issues if not installed
-        from openai import OpenAI  # type: ignore
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        resp = client.chat.completions.create(
+        resp = await create_chat_completion(
             model=model or settings.OPENAI_MODEL,
             messages=messages,
             temperature=0.3,
             timeout=settings.OPENAI_TIMEOUT,
         )
         return resp.choices[0].message.content or ""
+    except PoolBusy:
+        return "[BUSY] 요청이 많아 잠시 후 다시 시도해 주세요."
+    except (CircuitOpen, BudgetExceeded):
+        return UPSTREAM_SLOW_MESSAGE
     except Exception as e:
         return f"[ERROR] AI 호출 실패: {e}"
 
@@ -46,11 +58,23 @@ def _heuristic_subject_and_difficulty(text: str) -> Tuple[str, str, str]:
     return subj, difficulty, tier
 
 
-def _classify_subject_and_difficulty(text: str) -> Tuple[str, str, str]:
+async def _classify_subject_and_difficulty(
+    text: str,
+    *,
+    need_subject: bool = True,
+    need_difficulty: bool = True,
+    allow_remote: bool = True,
+) -> Tuple[str, str, str]:
     """Return (subject, difficulty, tier) where tier in {mini, full}.
-    If API key missing or error, fallback to heuristic.
+    The local classifier answers when confident about the needed parts; otherwise
+    the remote classifier runs. If API key missing or error, fallback to heuristic.
     """
-    if not settings.OPENAI_API_KEY:
+    local = local_classifier.predict(text)
+    if local is not None and local.confident(
+        settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE, need_subject=need_subject, need_difficulty=need_difficulty
+    ):
+        return local.subject or "국어", local.difficulty or "medium", local.tier
+    if not settings.OPENAI_API_KEY or not allow_remote:
         return _heuristic_subject_and_difficulty(text)
 
     sys = (
@@ -58,9 +82,13 @@ def _classify_subject_and_difficulty(text: str) -> Tuple[str, str, str]:
         "사용할 모델 티어(mini/full)를 추천하세요. JSON으로만 답하세요. "
         '예: {"subject":"수학","difficulty":"hard","tier":"full"}'
     )
+    key = cache_key("route", text)
+    cached = await chat_cache.get(key)
+    if cached:
+        return cached[0], cached[1], cached[2]
     user = text[:4000]
     msg = [{"role": "system", "content": sys}, {"role": "user", "content": user}]
-    out = _call_openai(msg, model=settings.OPENAI_MODEL_CLASSIFY)
+    out = await _call_openai(msg, model=settings.OPENAI_MODEL_CLASSIFY)
     try:
         data = json.loads(out)
         subj = data.get("subject") or "국어"
@@ -72,12 +100,30 @@ def _classify_subject_and_difficulty(text: str) -> Tuple[str, str, str]:
             diff = "medium"
         if tier not in ("mini", "full"):
             tier = "mini"
+        # only model verdicts are cached; heuristic fallbacks are recomputed
+        await chat_cache.put(key, "route", [subj, diff, tier])
         return subj, diff, tier
     except Exception:
         return _heuristic_subject_and_difficulty(text)
 
 
-def handle_chat(user_id: str, text: str, subject: Optional[str] = None, difficulty: Optional[str] = None) -> str:
+def _save_question_log(user_id: str, subject: Optional[str], text: str, difficulty: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        record_question_log(db, user_id, subject, text, difficulty)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def route_question(
+    text: str,
+    subject: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    *,
+    allow_remote: bool = True,
+) -> Tuple[str, str, str]:
+    """Fill in missing subject/difficulty and pick the answer tier -> (subject, difficulty, tier)."""
     # Determine subject/difficulty if missing
     subj = subject
     diff = difficulty
@@ -85,7 +131,9 @@ def handle_chat(user_id: str, text: str, subject: Optional[str] = None, difficul
     missing_subject = subj is None
     missing_diff = diff is None
     if missing_subject or missing_diff:
-        subj_c, diff_c, tier_c = _classify_subject_and_difficulty(text)
+        subj_c, diff_c, tier_c = await _classify_subject_and_difficulty(
+            text, need_subject=missing_subject, need_difficulty=missing_diff, allow_remote=allow_remote
+        )
         if missing_subject:
             subj = subj_c
         if missing_diff:
@@ -93,21 +141,101 @@ def handle_chat(user_id: str, text: str, subject: Optional[str] = None, difficul
             tier = tier_c
     if tier is None:
         tier = "full" if (diff == "hard") else "mini"
+    return subj, diff, tier
 
-    # Persist question log
-    db = SessionLocal()
-    try:
-        row = QuestionLog(user_id=user_id, subject=subj, text=text, difficulty=diff)
-        db.add(row)
-        db.commit()
-    finally:
-        db.close()
 
-    model_to_use = settings.OPENAI_MODEL_FULL if tier == "full" else settings.OPENAI_MODEL_MINI
+def _cacheable(answer: str) -> bool:
+    # demo/busy/error placeholders must not be replayed to later students
+    return bool(answer.strip()) and not answer.startswith(("[DEMO]", "[BUSY]", "[ERROR]"))
 
+
+def _answer_request(subj: str, tier: str, text: str) -> Tuple[str, list[dict]]:
+    model_to_use = settings.OPENAI_MODEL_FULL if tier == "full" else settings.OPENAI_MODEL_MINI
     user_msg = shorten(text, width=6000, placeholder="…")
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
         {"role": "user", "content": f"[과목: {subj}]\n{user_msg}"},
     ]
-    return _call_openai(messages, model=model_to_use)
+    return model_to_use, messages
+
+
+async def handle_chat(user_id: str, text: str, subject: Optional[str] = None, difficulty: Optional[str] = None) -> str:
+    subj, diff, tier = await route_question(text, subject, difficulty)
+
+    # Queued for the background writer; written inline only when the queue is full or the writer is off
+    if not question_log_writer.submit(user_id, subj, text, diff):
+        await run_in_threadpool(_save_question_log, user_id, subj, text, diff)
+
+    # The cache only skips the model call; the question above is always logged
+    key = cache_key("answer", text, subj, tier)
+    cached = await chat_cache.get(key)
+    if cached is not None:
+        return cached
+    model_to_use, messages = _answer_request(subj, tier, text)
+    answer = await _call_openai(messages, model=model_to_use)
+    if _cacheable(answer):
+        await chat_cache.put(key, "answer", answer)
+    return answer
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def chat_events(
+    text: str,
+    subject: Optional[str],
+    difficulty: Optional[str],
+    route: Dict[str, Any],
+) -> AsyncIterator[str]:
+    """Server-Sent Events for a streamed answer: meta, then one frame per text delta, then done.
+
+    The resolved subject/difficulty are written into `route` so the caller can
+    log the question after the response. When the subject is given, the
+    difficulty comes from the local classifier (or heuristic) instead of a
+    remote classifier call so answer tokens start after a single model round trip.
+    """
+    # opening comment: the client sees bytes before any model call
+    yield ": stream open\n\n"
+    subj, diff, tier = await route_question(text, subject, difficulty, allow_remote=subject is None)
+    route.update(subject=subj, difficulty=diff)
+    model_to_use, messages = _answer_request(subj, tier, text)
+    key = cache_key("answer", text, subj, tier)
+    cached = await chat_cache.get(key)
+    yield _sse(
+        {"subject": subj, "difficulty": diff, "model": model_to_use, "cached": cached is not None},
+        event="meta",
+    )
+
+    if cached is not None:
+        yield _sse({"delta": cached})
+    elif not settings.OPENAI_API_KEY:
+        yield _sse({"delta": "[DEMO] OpenAI API 키가 설정되지 않았습니다. .env의 OPENAI_API_KEY를 설정하세요."})
+    else:
+        parts: list[str] = []
+        try:
+            async for delta in stream_chat_completion(
+                model=model_to_use,
+                messages=messages,
+                temperature=0.3,
+                timeout=settings.OPENAI_TIMEOUT,
+            ):
+                parts.append(delta)
+                yield _sse({"delta": delta})
+            answer = "".join(parts)
+            if _cacheable(answer):
+                await chat_cache.put(key, "answer", answer)
+        except PoolBusy:
+            yield _sse({"message": "[BUSY] 요청이 많아 잠시 후 다시 시도해 주세요."}, event="error")
+        except (CircuitOpen, BudgetExceeded):
+            yield _sse({"message": UPSTREAM_SLOW_MESSAGE}, event="error")
+        except Exception as e:
+            yield _sse({"message": f"[ERROR] AI 호출 실패: {e}"}, event="error")
+    yield _sse({}, event="done")
+
+
+def log_routed_question(user_id: str, text: str, route: Dict[str, Any]) -> None:
+    """Question-log write for a streamed chat; runs after the stream as a background task."""
+    if route and not question_log_writer.submit(user_id, route.get("subject"), text, route.get("difficulty")):
+        _save_question_log(user_id, route.get("subject"), text, route.get("difficulty"))
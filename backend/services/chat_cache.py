@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.db_models import ChatCacheEntry
+
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?!.,~…]+$")
+
+
+def normalize_question(text: str) -> str:
+    """Fold width/case/whitespace and trailing punctuation so near-identical questions share a key."""
+    folded = unicodedata.normalize("NFKC", text or "").lower()
+    return _TRAILING.sub("", _SPACES.sub(" ", folded).strip())
+
+
+def cache_key(kind: str, text: str, subject: Optional[str] = None, tier: Optional[str] = None) -> str:
+    raw = "\x1f".join([kind, subject or "", tier or "", normalize_question(text)])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ChatCache:
+    """LRU + TTL cache for chat routing and answers, with an optional SQLite tier.
+
+    Memory is checked first; with `persist` on, misses fall through to the
+    chat_cache table and hits are promoted back into memory, so answers
+    survive restarts. Counters are process-local.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: int,
+        persist: bool,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.persist = persist
+        self._session_factory = session_factory
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._counters = {"hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _memory_get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return False, None
+            expires, value = item
+            if expires <= time.time():
+                del self._entries[key]
+                self._counters["expired"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def _memory_put(self, key: str, value: Any, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _persistent_get(self, key: str) -> Tuple[bool, Any, float]:
+        db = self._session_factory()
+        try:
+            row = db.get(ChatCacheEntry, key)
+            if row is None:
+                return False, None, 0.0
+            if row.expires_at <= datetime.utcnow():
+                db.delete(row)
+                db.commit()
+                return False, None, 0.0
+            remaining = (row.expires_at - datetime.utcnow()).total_seconds()
+            return True, json.loads(row.value_json), time.time() + remaining
+        finally:
+            db.close()
+
+    def _persistent_put(self, key: str, kind: str, value: Any) -> None:
+        now = datetime.utcnow()
+        values = {
+            "key": key,
+            "kind": kind,
+            "value_json": json.dumps(value, ensure_ascii=False),
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        }
+        stmt = sqlite_insert(ChatCacheEntry).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=[ChatCacheEntry.key], set_=values)
+        db = self._session_factory()
+        try:
+            db.execute(stmt)
+            db.commit()
+        finally:
+            db.close()
+
+    async def get(self, key: str) -> Optional[Any]:
+        if self.ttl_seconds <= 0:
+            return None
+        found, value = self._memory_get(key)
+        if found:
+            self._count("hits")
+            return value
+        if self.persist:
+            found, value, expires = await run_in_threadpool(self._persistent_get, key)
+            if found:
+                self._memory_put(key, value, expires)
+                self._count("persistent_hits")
+                return value
+        self._count("misses")
+        return None
+
+    async def put(self, key: str, kind: str, value: Any) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._memory_put(key, value, time.time() + self.ttl_seconds)
+        self._count("stores")
+        if self.persist:
+            await run_in_threadpool(self._persistent_put, key, kind, value)
+
+    def purge(self, *, expired_only: bool = False) -> Dict[str, int]:
+        """Drop cached entries (all, or only expired ones) from memory and the SQLite tier."""
+        now = time.time()
+        with self._lock:
+            if expired_only:
+                stale = [key for key, (expires, _value) in self._entries.items() if expires <= now]
+                for key in stale:
+                    del self._entries[key]
+                memory_removed = len(stale)
+            else:
+                memory_removed = len(self._entries)
+                self._entries = OrderedDict()
+        persistent_removed = 0
+        db = self._session_factory()
+        try:
+            query = db.query(ChatCacheEntry)
+            if expired_only:
+                query = query.filter(ChatCacheEntry.expires_at <= datetime.utcnow())
+            persistent_removed = query.delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+        return {"memory": memory_removed, "persistent": persistent_removed}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters["hits"] + counters["persistent_hits"] + counters["misses"]
+        return {
+            **counters,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "persist": self.persist,
+            "hit_rate": round((counters["hits"] + counters["persistent_hits"]) / lookups, 4) if lookups else 0.0,
+        }
+
+
+chat_cache = ChatCache(
+    max_entries=settings.CHAT_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CHAT_CACHE_TTL_SECONDS if settings.CHAT_CACHE_ENABLED else 0,
+    persist=settings.CHAT_CACHE_ENABLED and settings.CHAT_CACHE_PERSIST,
+)
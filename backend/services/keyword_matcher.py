@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over lowercased keywords.
+
+    Built once; `find` walks a text a single time and returns every keyword
+    it contains, however many keywords there are.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        self.keywords: List[str] = sorted({kw.lower() for kw in keywords if kw})
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[int]] = [set()]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(set())
+                state = nxt
+            self._out[state].add(index)
+        self._link()
+
+    def _link(self) -> None:
+        # breadth-first so each state's fail target is complete before it is copied;
+        # missing transitions are filled in from the fail state, giving a DFA with no fail loop at match time
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fallback = self._goto[self._fail[state]]
+            for char, nxt in list(self._goto[state].items()):
+                queue.append(nxt)
+                self._fail[nxt] = fallback.get(char, 0)
+                self._out[nxt] |= self._out[self._fail[nxt]]
+            for char, target in fallback.items():
+                self._goto[state].setdefault(char, target)
+
+    def find(self, text: str) -> Set[str]:
+        """Distinct keywords occurring in text (case-insensitive substring match)."""
+        found: Set[int] = set()
+        state = 0
+        goto, out = self._goto, self._out
+        for char in (text or "").lower():
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return {self.keywords[index] for index in found}
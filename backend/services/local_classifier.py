@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..constants import SUBJECTS
+from ..models.db_models import QuestionLog
+
+
+DIFFICULTIES = ("easy", "medium", "hard")
+NGRAM_SIZES = (1, 2, 3)
+# rare n-grams only bloat the model file
+MIN_FEATURE_COUNT = 2
+# Naive Bayes treats overlapping n-grams as independent evidence and ends up
+# ~100% sure of everything; likelihoods are rescaled to at most this many
+# features' worth of evidence, further shrunk by the share of unseen n-grams.
+EVIDENCE_CAP = 10
+
+
+def extract_features(text: str) -> Counter:
+    """Character 1-3 grams of the normalized text plus a coarse length bucket."""
+    folded = " ".join(unicodedata.normalize("NFKC", text or "").lower().split())
+    padded = f" {folded} "
+    features: Counter = Counter()
+    for n in NGRAM_SIZES:
+        for i in range(len(padded) - n + 1):
+            features[padded[i : i + n]] += 1
+    # long questions skew hard; let the model learn that instead of a fixed cutoff
+    features[f"__len{min(len(folded) // 50, 6)}"] += 1
+    return features
+
+
+class NaiveBayesModel:
+    """Multinomial naive Bayes (a linear model in log space) over sparse count features."""
+
+    def __init__(self, labels: Sequence[str], alpha: float = 0.5) -> None:
+        self.labels = list(labels)
+        self.alpha = alpha
+        self.priors: Dict[str, float] = {}
+        self.weights: Dict[str, Dict[str, float]] = {}
+        self.unseen: Dict[str, float] = {}
+        self.vocab: set[str] = set()
+
+    def fit(self, samples: Iterable[Tuple[Counter, str]]) -> int:
+        doc_counts: Counter = Counter()
+        feature_counts: Dict[str, Counter] = {label: Counter() for label in self.labels}
+        for features, label in samples:
+            if label not in feature_counts:
+                continue
+            doc_counts[label] += 1
+            feature_counts[label].update(features)
+        totals_by_feature: Counter = Counter()
+        for counts in feature_counts.values():
+            totals_by_feature.update(counts)
+        vocab = {feature for feature, count in totals_by_feature.items() if count >= MIN_FEATURE_COUNT}
+        docs = sum(doc_counts.values())
+        self.priors, self.weights, self.unseen = {}, {}, {}
+        for label in self.labels:
+            if not doc_counts[label]:
+                continue
+            counts = feature_counts[label]
+            denom = sum(counts[f] for f in vocab) + self.alpha * max(1, len(vocab))
+            self.priors[label] = math.log(doc_counts[label] / docs)
+            self.unseen[label] = math.log(self.alpha / denom)
+            self.weights[label] = {f: math.log((counts[f] + self.alpha) / denom) for f in vocab if counts[f]}
+        self.vocab = vocab
+        return docs
+
+    def predict(self, features: Counter) -> Tuple[Optional[str], float]:
+        """Best label and its posterior probability (0.0 when the model is empty)."""
+        if not self.priors:
+            return None, 0.0
+        # features outside the vocabulary carry no class signal
+        known = [(feature, count) for feature, count in features.items() if feature in self.vocab]
+        known_total = sum(count for _feature, count in known)
+        coverage = known_total / max(1, sum(features.values()))
+        scale = min(1.0, EVIDENCE_CAP / max(1, known_total)) * coverage
+        scores: Dict[str, float] = {}
+        for label, prior in self.priors.items():
+            weights = self.weights[label]
+            unseen = self.unseen[label]
+            scores[label] = prior + scale * sum(count * weights.get(feature, unseen) for feature, count in known)
+        best = max(scores, key=scores.get)
+        top = scores[best]
+        norm = sum(math.exp(score - top) for score in scores.values())
+        return best, 1.0 / norm
+
+    def to_dict(self) -> Dict:
+        return {
+            "labels": self.labels,
+            "alpha": self.alpha,
+            "priors": self.priors,
+            "weights": self.weights,
+            "unseen": self.unseen,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "NaiveBayesModel":
+        model = cls(data["labels"], data.get("alpha", 0.5))
+        model.priors = data["priors"]
+        model.weights = data["weights"]
+        model.unseen = data["unseen"]
+        model.vocab = {feature for weights in model.weights.values() for feature in weights}
+        return model
+
+
+@dataclass
+class LocalPrediction:
+    subject: Optional[str]
+    subject_confidence: float
+    difficulty: Optional[str]
+    difficulty_confidence: float
+
+    @property
+    def tier(self) -> str:
+        return "full" if self.difficulty == "hard" else "mini"
+
+    def confident(self, threshold: float, *, need_subject: bool = True, need_difficulty: bool = True) -> bool:
+        if need_subject and (self.subject is None or self.subject_confidence < threshold):
+            return False
+        if need_difficulty and (self.difficulty is None or self.difficulty_confidence < threshold):
+            return False
+        return True
+
+
+def training_rows(db: Session) -> List[Tuple[str, str, str]]:
+    """(text, subject, difficulty) from question_logs with usable labels."""
+    rows = (
+        db.query(QuestionLog.text, QuestionLog.subject, QuestionLog.difficulty)
+        .filter(QuestionLog.subject.in_(SUBJECTS), QuestionLog.difficulty.in_(DIFFICULTIES))
+        .all()
+    )
+    return [(text or "", subject, difficulty) for text, subject, difficulty in rows]
+
+
+def train_models(rows: Sequence[Tuple[str, str, str]]) -> Dict:
+    featurized = [(extract_features(text), subject, difficulty) for text, subject, difficulty in rows]
+    subject_model = NaiveBayesModel(SUBJECTS)
+    difficulty_model = NaiveBayesModel(DIFFICULTIES)
+    subject_model.fit((features, subject) for features, subject, _ in featurized)
+    difficulty_model.fit((features, difficulty) for features, _, difficulty in featurized)
+    return {
+        "version": 1,
+        "trained_at": datetime.utcnow().isoformat(),
+        "samples": len(featurized),
+        "subject": subject_model.to_dict(),
+        "difficulty": difficulty_model.to_dict(),
+    }
+
+
+class LocalClassifier:
+    """Process-wide holder of the trained models; swapped atomically on reload."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._models: Optional[Tuple[NaiveBayesModel, NaiveBayesModel]] = None
+        self._meta: Dict = {}
+
+    def _install(self, data: Optional[Dict]) -> None:
+        models = None
+        meta: Dict = {}
+        if data:
+            meta = {"trained_at": data.get("trained_at"), "samples": data.get("samples", 0)}
+            # too few examples gives confident nonsense; stay on the remote classifier
+            if meta["samples"] >= settings.LOCAL_CLASSIFIER_MIN_SAMPLES:
+                models = (NaiveBayesModel.from_dict(data["subject"]), NaiveBayesModel.from_dict(data["difficulty"]))
+        with self._lock:
+            self._models = models
+            self._meta = meta
+            self._loaded = True
+
+    def load(self) -> bool:
+        """(Re)load the model file; returns whether a usable model is active."""
+        data = None
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                data = None
+        self._install(data)
+        return self._models is not None
+
+    def train(self, db: Session) -> Dict:
+        """Retrain from question_logs, write the model file and activate it."""
+        data = train_models(training_rows(db))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(self.path)
+        self._install(data)
+        return self.status()
+
+    def predict(self, text: str) -> Optional[LocalPrediction]:
+        if not settings.LOCAL_CLASSIFIER_ENABLED:
+            return None
+        if not self._loaded:
+            self.load()
+        models = self._models
+        if models is None:
+            return None
+        features = extract_features(text)
+        subject, subject_conf = models[0].predict(features)
+        difficulty, difficulty_conf = models[1].predict(features)
+        return LocalPrediction(subject, subject_conf, difficulty, difficulty_conf)
+
+    def status(self) -> Dict:
+        with self._lock:
+            return {
+                "enabled": settings.LOCAL_CLASSIFIER_ENABLED,
+                "active": self._models is not None,
+                "path": str(self.path),
+                "min_confidence": settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+                "min_samples": settings.LOCAL_CLASSIFIER_MIN_SAMPLES,
+                **self._meta,
+            }
+
+
+local_classifier = LocalClassifier(Path(settings.LOCAL_CLASSIFIER_PATH))
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from ..config import settings
+from .resilience import check_circuit, guarded_call
+
+
+class PoolBusy(Exception):
+    """Raised when a model's wait queue is full; callers fall back instead of piling up."""
+
+
+def parse_model_limits(raw: str) -> Dict[str, int]:
+    """Parse "gpt-5=2,gpt-5-mini=8" into {"gpt-5": 2, "gpt-5-mini": 8}; malformed entries are ignored."""
+    limits: Dict[str, int] = {}
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+
+@dataclass
+class _ModelGate:
+    semaphore: asyncio.Semaphore
+    limit: int
+    in_flight: int = 0
+    waiting: int = 0
+
+
+@dataclass
+class _Pool:
+    loop: asyncio.AbstractEventLoop
+    client: Any
+    gates: Dict[str, _ModelGate] = field(default_factory=dict)
+
+
+_pool: Optional[_Pool] = None
+_model_limits = parse_model_limits(settings.OPENAI_MODEL_CONCURRENCY)
+
+
+def _build_client() -> Any:
+    # Lazy import to avoid dependency issues if not installed
+    import httpx
+    from openai import AsyncOpenAI  # type: ignore
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=5.0),
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL or None,
+        http_client=http_client,
+        # retries hold a concurrency slot; the caller's fallback is cheaper
+        max_retries=0,
+    )
+
+
+def _current_pool() -> _Pool:
+    global _pool
+    loop = asyncio.get_running_loop()
+    # the http pool and semaphores belong to one event loop (a new loop means a new app instance)
+    if _pool is None or _pool.loop is not loop:
+        _pool = _Pool(loop=loop, client=_build_client())
+    return _pool
+
+
+def _gate(pool: _Pool, model: str) -> _ModelGate:
+    gate = pool.gates.get(model)
+    if gate is None:
+        limit = _model_limits.get(model, settings.OPENAI_DEFAULT_CONCURRENCY)
+        gate = _ModelGate(semaphore=asyncio.Semaphore(limit), limit=limit)
+        pool.gates[model] = gate
+    return gate
+
+
+@asynccontextmanager
+async def _model_slot(model: str) -> AsyncIterator[_Pool]:
+    """Hold one of the model's concurrency slots.
+
+    At most the model's concurrency limit run at once; up to OPENAI_MAX_QUEUE
+    more wait for a slot. Anything beyond that raises PoolBusy immediately.
+    """
+    pool = _current_pool()
+    gate = _gate(pool, model)
+    if gate.in_flight >= gate.limit and gate.waiting >= settings.OPENAI_MAX_QUEUE:
+        raise PoolBusy(model)
+    gate.waiting += 1
+    try:
+        await gate.semaphore.acquire()
+    finally:
+        gate.waiting -= 1
+    gate.in_flight += 1
+    try:
+        yield pool
+    finally:
+        gate.in_flight -= 1
+        gate.semaphore.release()
+
+
+async def create_chat_completion(*, model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> Any:
+    """chat.completions.create on the shared client, limited per model and guarded by its breaker/budget."""
+    check_circuit(model)
+    async with _model_slot(model) as pool:
+        return await guarded_call(
+            model, lambda: pool.client.chat.completions.create(model=model, messages=messages, **kwargs)
+        )
+
+
+async def _open_stream(pool: _Pool, model: str, messages: List[Dict[str, Any]], kwargs: Dict[str, Any]) -> tuple:
+    """Open the stream and wait for the first text delta (the part the latency budget covers)."""
+    stream = await pool.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+    chunks = stream.__aiter__()
+    try:
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return stream, chunks, chunk.choices[0].delta.content
+        return stream, chunks, None
+    except BaseException:
+        await stream.close()
+        raise
+
+
+async def stream_chat_completion(*, model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> AsyncIterator[str]:
+    """Yield answer text deltas as they arrive; the model slot is held until the stream ends or is closed.
+
+    The latency budget and breaker apply to the time to the first token.
+    """
+    check_circuit(model)
+    async with _model_slot(model) as pool:
+        stream, chunks, first = await guarded_call(model, lambda: _open_stream(pool, model, messages, kwargs))
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        finally:
+            await stream.close()
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    if _pool is None:
+        return {}
+    return {
+        model: {"limit": gate.limit, "in_flight": gate.in_flight, "waiting": gate.waiting}
+        for model, gate in _pool.gates.items()
+    }
+
+
+async def close_pool() -> None:
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None and pool.loop is asyncio.get_running_loop():
+        await pool.client.close()
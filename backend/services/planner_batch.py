@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..constants import SUBJECTS
+from ..database import SessionLocal
+from ..models.db_models import (
+    DailySubjectMinutes,
+    PlannerCache,
+    Quest,
+    QuestionLog,
+    QuestResultLog,
+    QuestTag,
+    User,
+)
+from ..services.planner_cache import is_fresh, payload_fingerprint, revalidate, store_planner_result
+from ..services.planner_service import (
+    _baseline_suggestions,
+    _call_planner_ai,
+    _collect_tag_catalog,
+    assemble_planner_context,
+    finish_planner,
+    planner_payload_for_ai,
+    question_digest,
+    result_entry,
+)
+from ..services.rollup_service import window_days
+from ..services.tagging_service import ACTIVE_STATUSES, keyword_counts_by_user
+
+
+logger = logging.getLogger(__name__)
+
+RESULTS_PER_USER = 5
+
+
+def _bulk_minutes(db: Session, user_ids: List[str], days: int) -> Dict[str, Dict[str, int]]:
+    first_day = window_days(days)[0].isoformat()
+    seconds: Dict[str, Dict[str, int]] = {uid: {subj: 0 for subj in SUBJECTS} for uid in user_ids}
+    rows = (
+        db.query(DailySubjectMinutes.user_id, DailySubjectMinutes.subject, DailySubjectMinutes.seconds)
+        .filter(DailySubjectMinutes.user_id.in_(user_ids), DailySubjectMinutes.date >= first_day)
+        .all()
+    )
+    for user_id, subject, value in rows:
+        if subject in seconds[user_id]:
+            seconds[user_id][subject] += int(value or 0)
+    return {uid: {subj: int(value // 60) for subj, value in totals.items()} for uid, totals in seconds.items()}
+
+
+def _bulk_active(db: Session, user_ids: List[str]) -> Tuple[Dict[str, set], Dict[str, Dict[str, List[str]]]]:
+    subjects: Dict[str, set] = defaultdict(set)
+    tags: Dict[str, Dict[str, List[str]]] = defaultdict(dict)
+    quests = (
+        db.query(Quest.id, Quest.user_id, Quest.subject)
+        .filter(Quest.user_id.in_(user_ids), Quest.type == "time", Quest.status.in_(ACTIVE_STATUSES))
+        .all()
+    )
+    owner = {quest_id: (user_id, subject) for quest_id, user_id, subject in quests}
+    for user_id, subject in owner.values():
+        subjects[user_id].add(subject)
+    if owner:
+        rows = (
+            db.query(QuestTag.quest_id, QuestTag.tag)
+            .filter(QuestTag.quest_id.in_(list(owner)), QuestTag.lang == "ko")
+            .order_by(QuestTag.quest_id, QuestTag.position)
+            .all()
+        )
+        for quest_id, tag in rows:
+            user_id, subject = owner[quest_id]
+            tags[user_id].setdefault(subject, []).append(tag)
+    return subjects, tags
+
+
+def _bulk_questions(db: Session, user_ids: List[str], days: int) -> Dict[str, List[tuple]]:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    rows = (
+        db.query(QuestionLog.user_id, QuestionLog.subject, QuestionLog.text)
+        .filter(QuestionLog.user_id.in_(user_ids), QuestionLog.created_at >= cutoff)
+        .order_by(QuestionLog.user_id, QuestionLog.created_at.desc())
+        .all()
+    )
+    digest_rows: Dict[str, List[tuple]] = defaultdict(list)
+    for user_id, subject, text in rows:
+        digest_rows[user_id].append((subject, text))
+    return digest_rows
+
+
+def _bulk_results(db: Session, user_ids: List[str], days: int) -> Dict[str, List[Dict[str, Any]]]:
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    rows = (
+        db.query(QuestResultLog)
+        .filter(QuestResultLog.user_id.in_(user_ids), QuestResultLog.created_at >= cutoff)
+        .order_by(QuestResultLog.user_id, QuestResultLog.created_at.desc())
+        .all()
+    )
+    out: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        if len(out[row.user_id]) < RESULTS_PER_USER:
+            out[row.user_id].append(result_entry(row))
+    return out
+
+
+def _prepare_chunk(
+    session_factory: Callable[[], Session],
+    after_id: Optional[str],
+    chunk_size: int,
+    days: int,
+    force: bool,
+    tag_catalog: List[Dict[str, str]],
+) -> Tuple[List[Dict[str, Any]], Optional[str], Dict[str, int]]:
+    """Contexts, baselines and fingerprints for the next chunk of users, from a fixed number of queries."""
+    counts = {"users": 0, "skipped_fresh": 0, "revalidated": 0}
+    db = session_factory()
+    try:
+        query = db.query(User).order_by(User.id)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        users = query.limit(chunk_size).all()
+        if not users:
+            return [], None, counts
+        user_ids = [user.id for user in users]
+        counts["users"] = len(users)
+        cached = {row.user_id: row for row in db.query(PlannerCache).filter(PlannerCache.user_id.in_(user_ids))}
+        minutes = _bulk_minutes(db, user_ids, days)
+        active_subjects, active_tags = _bulk_active(db, user_ids)
+        digest_rows = _bulk_questions(db, user_ids, days)
+        tag_counts = keyword_counts_by_user(db, user_ids)
+        results = _bulk_results(db, user_ids, days)
+
+        pending: List[Dict[str, Any]] = []
+        for user in users:
+            row = cached.get(user.id)
+            if row is not None and not force and is_fresh(row):
+                counts["skipped_fresh"] += 1
+                continue
+            context = assemble_planner_context(
+                user,
+                days,
+                minutes_by_subject=minutes[user.id],
+                active_subjects=active_subjects.get(user.id, ()),
+                active_tags=active_tags.get(user.id, {}),
+                question_digest=question_digest(digest_rows.get(user.id, [])),
+                result_digest=results.get(user.id, []),
+                tag_catalog=tag_catalog,
+            )
+            baseline, notes = _baseline_suggestions(db, user.id, context, tag_counts[user.id])
+            payload = planner_payload_for_ai(context, baseline, notes)
+            fingerprint = payload_fingerprint(payload)
+            if row is not None and not force and row.fingerprint == fingerprint:
+                revalidate(db, user.id, row.version)
+                counts["revalidated"] += 1
+                continue
+            pending.append(
+                {
+                    "user_id": user.id,
+                    "fingerprint": fingerprint,
+                    # compare-and-set token for the store after the model call
+                    "version": row.version if row is not None else None,
+                    "prepared": {"context": context, "baseline": baseline, "baseline_notes": notes, "payload": payload},
+                }
+            )
+        db.commit()
+        return pending, user_ids[-1], counts
+    finally:
+        db.close()
+
+
+def _load_tag_catalog(session_factory: Callable[[], Session]) -> List[Dict[str, str]]:
+    db = session_factory()
+    try:
+        return _collect_tag_catalog(db)
+    finally:
+        db.close()
+
+
+def _store_chunk(
+    session_factory: Callable[[], Session], results: List[Tuple[str, str, List, List, str, Optional[int]]]
+) -> int:
+    """Store computed results; rows invalidated since their chunk was prepared are left stale."""
+    if not results:
+        return 0
+    db = session_factory()
+    try:
+        stored = sum(store_planner_result(db, *result) for result in results)
+        db.commit()
+        return stored
+    finally:
+        db.close()
+
+
+async def precompute_planner(
+    *,
+    days: int = 7,
+    use_model: Optional[bool] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 200,
+    force: bool = False,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> Dict[str, Any]:
+    """Fill planner_cache for every user so /ai/planner/suggest is served from stored rows.
+
+    Users are walked in chunks by id; each chunk costs a fixed handful of bulk
+    queries regardless of its size. Fresh rows are skipped unless `force`, and
+    rows whose fingerprint still matches are only revalidated. Model calls run
+    `workers` at a time. Without the model (no API key, or use_model=False) the
+    baseline is stored, as the on-demand path does; a model failure stores
+    nothing so the next request retries the model. A user invalidated while
+    their model call ran keeps the stale row (`invalidated_meanwhile`).
+    """
+    if use_model is None:
+        use_model = bool(settings.OPENAI_API_KEY)
+    use_model = use_model and bool(settings.OPENAI_API_KEY)
+    workers = max(1, workers or settings.PLANNER_PRECOMPUTE_WORKERS)
+    semaphore = asyncio.Semaphore(workers)
+    report = {
+        "users": 0,
+        "skipped_fresh": 0,
+        "revalidated": 0,
+        "stored": 0,
+        "model_calls": 0,
+        "model_failed": 0,
+        "invalidated_meanwhile": 0,
+    }
+
+    async def compute(item: Dict[str, Any]) -> Optional[Tuple[str, str, List, List, str, Optional[int]]]:
+        ai_raw = None
+        if use_model:
+            async with semaphore:
+                report["model_calls"] += 1
+                ai_raw = await _call_planner_ai(item["prepared"]["payload"])
+        quests, notes, source = finish_planner(item["prepared"], ai_raw)
+        if use_model and source != "model":
+            report["model_failed"] += 1
+            return None
+        return item["user_id"], item["fingerprint"], quests, notes, source, item["version"]
+
+    started = time.perf_counter()
+    tag_catalog = await run_in_threadpool(_load_tag_catalog, session_factory)
+    after_id: Optional[str] = None
+    while True:
+        pending, after_id, counts = await run_in_threadpool(
+            _prepare_chunk, session_factory, after_id, chunk_size, days, force, tag_catalog
+        )
+        for key, value in counts.items():
+            report[key] += value
+        if after_id is None:
+            break
+        computed = await asyncio.gather(*(compute(item) for item in pending))
+        results = [result for result in computed if result is not None]
+        stored = await run_in_threadpool(_store_chunk, session_factory, results)
+        report["stored"] += stored
+        report["invalidated_meanwhile"] += len(results) - stored
+
+    elapsed = time.perf_counter() - started
+    report["model"] = use_model
+    report["workers"] = workers
+    report["seconds"] = round(elapsed, 3)
+    report["users_per_second"] = round(report["users"] / elapsed, 1) if elapsed > 0 else None
+    return report
+
+
+async def scheduled_precompute() -> None:
+    report = await precompute_planner(days=settings.PLANNER_PRECOMPUTE_DAYS)
+    logger.info("planner precompute: %s", report)
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.db_models import PlannerCache
+
+
+def payload_fingerprint(payload: Dict[str, Any]) -> str:
+    # baseline quest ids embed a timestamp; leave them out or no two builds would ever match
+    stable = {**payload, "baseline": [{k: v for k, v in quest.items() if k != "id"} for quest in payload.get("baseline") or []]}
+    canonical = json.dumps(stable, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def invalidate_planner_cache(db: Session, user_ids: Iterable[str]) -> None:
+    """Mark cached suggestions stale and bump their version, in the caller's transaction.
+
+    Users without a row get a stale placeholder, so a result computed before
+    this write can never be stored over it (see store_planner_result).
+    """
+    ids = sorted({uid for uid in user_ids if uid})
+    if not ids:
+        return
+    now = datetime.utcnow()
+    stmt = sqlite_insert(PlannerCache).values(
+        [
+            {
+                "user_id": uid,
+                "fingerprint": "",
+                "quests_json": "[]",
+                "notes_json": "[]",
+                "source": "baseline",
+                "stale": 1,
+                "version": 1,
+                "computed_at": now,
+            }
+            for uid in ids
+        ]
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[PlannerCache.user_id],
+            set_={"stale": 1, "version": PlannerCache.version + 1},
+        )
+    )
+
+
+def is_fresh(row: PlannerCache, now: Optional[datetime] = None) -> bool:
+    """Servable without rebuilding the context: not invalidated and younger than the TTL."""
+    now = now or datetime.utcnow()
+    return not row.stale and row.computed_at >= now - timedelta(seconds=settings.PLANNER_CACHE_TTL_SECONDS)
+
+
+def cached_result(row: PlannerCache) -> tuple[List[Dict[str, Any]], List[str]]:
+    return json.loads(row.quests_json), json.loads(row.notes_json)
+
+
+def store_planner_result(
+    db: Session,
+    user_id: str,
+    fingerprint: str,
+    quests: List[Dict[str, Any]],
+    notes: List[str],
+    source: str,
+    expected_version: Optional[int],
+) -> bool:
+    """Store a result unless the row was invalidated after `expected_version` was read.
+
+    A lost compare-and-set leaves the row stale, so the next request rebuilds
+    from the newer context. Returns whether the result was stored.
+    """
+    values = {
+        "user_id": user_id,
+        "fingerprint": fingerprint,
+        "quests_json": json.dumps(quests, ensure_ascii=False),
+        "notes_json": json.dumps(notes, ensure_ascii=False),
+        "source": source,
+        "stale": 0,
+        "computed_at": datetime.utcnow(),
+    }
+    stmt = sqlite_insert(PlannerCache).values(**values)
+    if expected_version is None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[PlannerCache.user_id])
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[PlannerCache.user_id],
+            set_=values,
+            where=PlannerCache.version == expected_version,
+        )
+    return bool(db.execute(stmt).rowcount)
+
+
+def revalidate(db: Session, user_id: str, expected_version: int) -> bool:
+    """Same fingerprint after an invalidation: the stored result is still right, restart its clock.
+
+    Compare-and-set like store_planner_result.
+    """
+    result = db.execute(
+        update(PlannerCache)
+        .where(PlannerCache.user_id == user_id, PlannerCache.version == expected_version)
+        .values(stale=0, computed_at=datetime.utcnow())
+    )
+    return bool(result.rowcount)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config import settings
+from ..services.chat_cache import normalize_question
+from ..services.tagging_service import KEYWORDS
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Any:
+    # Lazy import: tiktoken is optional, the estimate below is used without it
+    try:
+        import tiktoken  # type: ignore
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Prompt tokens of text: exact with tiktoken, else ~4 ASCII chars or 1 Hangul/other char per token."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return math.ceil(ascii_chars / 4) + (len(text) - ascii_chars)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _result_summary(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    # the model only needs outcome counts per subject, not ids and timestamps
+    summary: Dict[str, Counter] = {}
+    for item in results:
+        summary.setdefault(item.get("subject") or "?", Counter())[item.get("result") or "?"] += 1
+    return {subject: dict(counts) for subject, counts in summary.items()}
+
+
+def _ranked_questions(payload: Dict[str, Any], candidates: List[str]) -> List[Tuple[str, str]]:
+    """(subject, clipped text) round-robin over the subjects the model may recommend, newest first, deduplicated."""
+    limit = settings.PLANNER_QUESTION_MAX_CHARS
+    queues: Dict[str, List[str]] = {}
+    for subject in candidates:
+        seen: set[str] = set()
+        texts: List[str] = []
+        for text in (payload.get("recent_questions") or {}).get(subject) or []:
+            key = normalize_question(text)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            text = " ".join(text.split())
+            texts.append(text if len(text) <= limit else text[: limit - 1] + "…")
+        queues[subject] = texts
+    ranked: List[Tuple[str, str]] = []
+    depth = max((len(texts) for texts in queues.values()), default=0)
+    for i in range(depth):
+        for subject in candidates:
+            if i < len(queues[subject]):
+                ranked.append((subject, queues[subject][i]))
+    return ranked
+
+
+def _ranked_catalog(payload: Dict[str, Any], candidates: List[str]) -> List[Dict[str, str]]:
+    """Catalog deduplicated by KO tag, tags relevant to the candidate subjects first."""
+    relevant = {tag for subject in candidates for tag in KEYWORDS.get(subject, {})}
+    relevant |= {(quest.get("tags_ko") or [None])[0] for quest in payload.get("baseline") or []}
+    unique: Dict[str, str] = {}
+    for item in payload.get("tag_catalog") or []:
+        ko = item.get("ko")
+        if ko and (ko not in unique or not unique[ko]):
+            unique[ko] = item.get("en") or ""
+    entries = [{"ko": ko, "en": en} for ko, en in unique.items()]
+    return sorted(entries, key=lambda item: item["ko"] not in relevant)
+
+
+def compact_planner_payload(payload: Dict[str, Any], budget: Optional[int] = None) -> Tuple[str, int]:
+    """Serialize planner_payload_for_ai() output into at most `budget` prompt tokens.
+
+    The decision inputs (goals, minutes, active subjects, baseline) always go
+    in; recent questions and then catalog tags are added by rank while they
+    fit. The result is always complete JSON. Returns (text, estimated tokens).
+    """
+    budget = budget or settings.PLANNER_PROMPT_TOKEN_BUDGET
+    active = set(payload.get("active_subjects") or [])
+    candidates = [subject for subject in payload.get("subjects") or [] if subject not in active]
+    compact: Dict[str, Any] = {
+        "user": {
+            "daily_goal": payload["user"]["daily_goal"],
+            "subject_ratio": {k: round(float(v), 3) for k, v in payload["user"]["subject_ratio"].items()},
+        },
+        "allowed_subjects": candidates,
+        "allowed_minutes": payload.get("allowed_minutes"),
+        "window_days": payload.get("window_days"),
+        "minutes_by_subject": payload.get("minutes_by_subject"),
+        "target_minutes": payload.get("target_minutes"),
+        "active_tags": {subject: tags for subject, tags in (payload.get("active_tags") or {}).items() if tags},
+        "baseline": [
+            {
+                "subject": quest["subject"],
+                "minutes": quest["goal_value"],
+                "tag_ko": (quest.get("tags_ko") or [None])[0],
+                "tag_en": (quest.get("tags") or [None])[0],
+            }
+            for quest in payload.get("baseline") or []
+        ],
+        "baseline_notes": payload.get("baseline_notes") or [],
+        "recent_results": _result_summary(payload.get("recent_results") or []),
+        "recent_questions": {},
+        "tag_catalog": [],
+    }
+    used = estimate_tokens(_dumps(compact))
+
+    # optional sections: each item is charged its own serialized size, so nothing is re-serialized per step
+    for subject, text in _ranked_questions(payload, candidates):
+        cost = estimate_tokens(_dumps(text)) + (0 if subject in compact["recent_questions"] else estimate_tokens(_dumps(subject)) + 2) + 1
+        if used + cost > budget:
+            break
+        compact["recent_questions"].setdefault(subject, []).append(text)
+        used += cost
+    for item in _ranked_catalog(payload, candidates):
+        cost = estimate_tokens(_dumps(item)) + 1
+        if used + cost > budget:
+            break
+        compact["tag_catalog"].append(item)
+        used += cost
+
+    text = _dumps(compact)
+    tokens = estimate_tokens(text)
+    # the per-item charges are estimates; drop from the back until the real total fits
+    while tokens > budget and (compact["tag_catalog"] or compact["recent_questions"]):
+        if compact["tag_catalog"]:
+            compact["tag_catalog"].pop()
+        else:
+            subject = next(reversed(compact["recent_questions"]))
+            compact["recent_questions"][subject].pop()
+            if not compact["recent_questions"][subject]:
+                del compact["recent_questions"][subject]
+        text = _dumps(compact)
+        tokens = estimate_tokens(text)
+    if tokens > budget:
+        logger.warning("planner payload core alone is %d tokens (budget %d)", tokens, budget)
+    return text, tokens
@@ -1,27 +1,46 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Sequence
+from typing import Any, Dict, Iterable, List, Optional, Sequence
 import json
+import logging
 import re
+import time
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import and_
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, aliased
 
 from ..config import settings
 from ..constants import SUBJECTS, STUDY_TAG, STUDY_TAG_KO
+from ..database import SessionLocal
 from ..models.db_models import (
     Quest,
     QuestionLog,
     QuestResultLog,
-    TimerLog,
+    PlannerCache,
+    QuestTag,
     User,
 )
-from ..services.tagging_service import decide_tag_for_subject
+from ..services.tagging_service import TagCounts, decide_tag_from_counts, keyword_counts
 from ..services.goal_policy import DEFAULT_ALLOWED_MINUTES, resolve_goal_minutes
+from ..services.rollup_service import daily_seconds, window_days
+from ..services.openai_pool import create_chat_completion
+from ..services.planner_payload import compact_planner_payload
+from ..services.singleflight import planner_flights
+from ..services.planner_cache import (
+    cached_result,
+    is_fresh,
+    payload_fingerprint,
+    revalidate,
+    store_planner_result,
+)
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_MINUTES: Sequence[int] = DEFAULT_ALLOWED_MINUTES
 EXCLUDED_TAGS = {"study"}
+
 PLANNER_SYSTEM_PROMPT = (
     "너는 학습 스케줄러 AI다. 입력 JSON을 바탕으로 과목별 추천 학습 퀘스트를 결정해라. "
     "출력은 반드시 JSON이며 형식은 {\"recommendations\": [...], \"notes\": [...]} 뿐이다. "
@@ -48,20 +67,12 @@ def _safe_ratio(user: User) -> Dict[str, float]:
 
 
 def _subject_minutes(db: Session, user_id: str, days: int) -> Dict[str, int]:
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    subject_expr = func.coalesce(TimerLog.subject, Quest.subject)
-    rows = (
-        db.query(subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
-        .outerjoin(Quest, Quest.id == TimerLog.quest_id)
-        .filter(TimerLog.user_id == user_id, TimerLog.created_at >= cutoff)
-        .group_by(subject_expr)
-        .all()
-    )
-    data = {subj: 0 for subj in SUBJECTS}
-    for subj, value in rows:
-        if subj in data:
-            data[subj] = int((value or 0) // 60)
-    return data
+    # served from the daily rollup: O(days) rows instead of every timer log in the window
+    totals = {subj: 0 for subj in SUBJECTS}
+    for (_day, subj), value in daily_seconds(db, user_id, window_days(days)[0]).items():
+        if subj in totals:
+            totals[subj] += value
+    return {subj: int(value // 60) for subj, value in totals.items()}
 
 
 def _active_time_quests(db: Session, user_id: str) -> List[Quest]:
@@ -77,50 +88,55 @@ def _active_time_quests(db: Session, user_id: str) -> List[Quest]:
 
 
 def _collect_tag_catalog(db: Session) -> List[Dict[str, str]]:
-    catalog: List[Dict[str, str]] = []
-    seen: set[tuple[str, str]] = set()
-    rows = db.query(Quest.tags_json, Quest.tags_ko_json).all()
-    for tags_json, tags_ko_json in rows:
-        tags = []
-        tags_ko = []
-        if tags_json:
-            try:
-                tags = json.loads(tags_json)
-            except Exception:
-                tags = []
-        if tags_ko_json:
-            try:
-                tags_ko = json.loads(tags_ko_json)
-            except Exception:
-                tags_ko = []
-        for ko_tag in tags_ko or []:
-            en_tag = tags[0] if tags else None
-            key = (ko_tag, en_tag or "")
-            if key in seen:
-                continue
-            seen.add(key)
-            catalog.append({"ko": ko_tag, "en": en_tag or ""})
+    # each KO tag paired with the first EN tag of its quest, distinct pairs only
+    en_tag = aliased(QuestTag)
+    rows = (
+        db.query(QuestTag.tag, en_tag.tag)
+        .outerjoin(
+            en_tag,
+            and_(en_tag.quest_id == QuestTag.quest_id, en_tag.lang == "en", en_tag.position == 0),
+        )
+        .filter(QuestTag.lang == "ko")
+        .distinct()
+        .order_by(QuestTag.tag, en_tag.tag)
+        .all()
+    )
+    catalog = [{"ko": ko_tag, "en": en or ""} for ko_tag, en in rows]
     if not any(item["ko"] == STUDY_TAG_KO for item in catalog):
         catalog.append({"ko": STUDY_TAG_KO, "en": STUDY_TAG})
     return catalog
 
 
+def question_digest(rows: Sequence[tuple], limit_per_subject: int = 5) -> Dict[str, List[str]]:
+    """Latest question texts per subject from (subject, text) rows ordered newest first."""
+    bucket: Dict[str, List[str]] = {subj: [] for subj in SUBJECTS}
+    for subject, text in rows:
+        subj = subject or SUBJECTS[0]
+        if subj not in bucket:
+            bucket[subj] = []
+        if len(bucket[subj]) < limit_per_subject:
+            bucket[subj].append(text)
+    return bucket
+
+
+def result_entry(row: QuestResultLog) -> Dict[str, Any]:
+    return {
+        "quest_id": row.quest_id,
+        "subject": row.subject,
+        "result": row.result,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+    }
+
+
 def _recent_questions(db: Session, user_id: str, days: int, limit_per_subject: int = 5) -> Dict[str, List[str]]:
     cutoff = datetime.utcnow() - timedelta(days=days)
     rows = (
-        db.query(QuestionLog)
+        db.query(QuestionLog.subject, QuestionLog.text)
         .filter(QuestionLog.user_id == user_id, QuestionLog.created_at >= cutoff)
         .order_by(QuestionLog.created_at.desc())
         .all()
     )
-    bucket: Dict[str, List[str]] = {subj: [] for subj in SUBJECTS}
-    for row in rows:
-        subj = row.subject or SUBJECTS[0]
-        if subj not in bucket:
-            bucket[subj] = []
-        if len(bucket[subj]) < limit_per_subject:
-            bucket[subj].append(row.text)
-    return bucket
+    return question_digest(rows, limit_per_subject)
 
 
 def _recent_results(db: Session, user_id: str, days: int, limit: int = 5) -> List[Dict[str, Any]]:
@@ -132,17 +148,7 @@ def _recent_results(db: Session, user_id: str, days: int, limit: int = 5) -> Lis
         .limit(limit)
         .all()
     )
-    out: List[Dict[str, Any]] = []
-    for row in rows:
-        out.append(
-            {
-                "quest_id": row.quest_id,
-                "subject": row.subject,
-                "result": row.result,
-                "created_at": row.created_at.isoformat() if row.created_at else None,
-            }
-        )
-    return out
+    return [result_entry(row) for row in rows]
 
 
 def _slugify_tag(tag: str) -> str:
@@ -176,27 +182,25 @@ def _make_quest_dict(subject: str, minutes: int, tag_en: str, tag_ko: str, title
     return quest
 
 
-def build_planner_context(db: Session, user: User, user_id: str, days: int = 7) -> Dict[str, Any]:
+def assemble_planner_context(
+    user: User,
+    days: int,
+    *,
+    minutes_by_subject: Dict[str, int],
+    active_subjects: Iterable[str],
+    active_tags: Dict[str, List[str]],
+    question_digest: Dict[str, List[str]],
+    result_digest: List[Dict[str, Any]],
+    tag_catalog: List[Dict[str, str]],
+) -> Dict[str, Any]:
+    """Planner context from pre-loaded data; shared by the per-request and batch paths."""
     ratio = _safe_ratio(user)
     daily_goal = int(user.daily_minutes_goal or 90)
-    minutes_by_subject = _subject_minutes(db, user_id, days)
     target_by_subject = {subj: max(1, int(daily_goal * ratio.get(subj, 0))) for subj in SUBJECTS}
-    active_quests = _active_time_quests(db, user_id)
-    active_subjects = {q.subject for q in active_quests}
-    active_tags: Dict[str, List[str]] = {subj: [] for subj in SUBJECTS}
-    for quest in active_quests:
-        if quest.tags_ko_json:
-            try:
-                tags_ko = json.loads(quest.tags_ko_json)
-            except Exception:
-                tags_ko = []
-        else:
-            tags_ko = []
-        active_tags.setdefault(quest.subject, [])
-        active_tags[quest.subject].extend(tags_ko)
-    question_digest = _recent_questions(db, user_id, days)
-    result_digest = _recent_results(db, user_id, days)
-    tag_catalog = _collect_tag_catalog(db)
+    active = set(active_subjects)
+    tags: Dict[str, List[str]] = {subj: [] for subj in SUBJECTS}
+    for subj, values in active_tags.items():
+        tags.setdefault(subj, []).extend(values)
     return {
         "user": {
             "id": user.id,
@@ -207,8 +211,9 @@ def build_planner_context(db: Session, user: User, user_id: str, days: int = 7)
         "allowed_minutes": list(ALLOWED_MINUTES),
         "minutes_by_subject": minutes_by_subject,
         "target_minutes": target_by_subject,
-        "active_subjects": list(active_subjects),
-        "active_tags": active_tags,
+        # stable order keeps the payload fingerprint stable across processes
+        "active_subjects": sorted(active),
+        "active_tags": tags,
         "question_digest": question_digest,
         "result_digest": result_digest,
         "tag_catalog": tag_catalog,
@@ -216,13 +221,46 @@ def build_planner_context(db: Session, user: User, user_id: str, days: int = 7)
     }
 
 
+def build_planner_context(db: Session, user: User, user_id: str, days: int = 7) -> Dict[str, Any]:
+    active_quests = _active_time_quests(db, user_id)
+    active_tags: Dict[str, List[str]] = {}
+    subject_by_quest = {q.id: q.subject for q in active_quests}
+    if subject_by_quest:
+        tag_rows = (
+            db.query(QuestTag.quest_id, QuestTag.tag)
+            .filter(QuestTag.quest_id.in_(list(subject_by_quest)), QuestTag.lang == "ko")
+            .order_by(QuestTag.quest_id, QuestTag.position)
+            .all()
+        )
+        for quest_id, tag in tag_rows:
+            active_tags.setdefault(subject_by_quest[quest_id], []).append(tag)
+    return assemble_planner_context(
+        user,
+        days,
+        minutes_by_subject=_subject_minutes(db, user_id, days),
+        active_subjects=subject_by_quest.values(),
+        active_tags=active_tags,
+        question_digest=_recent_questions(db, user_id, days),
+        result_digest=_recent_results(db, user_id, days),
+        tag_catalog=_collect_tag_catalog(db),
+    )
+
+
 def _is_study_like(tags: List[str] | None, tags_ko: List[str] | None) -> bool:
     tags = tags or []
     tags_ko = tags_ko or []
     return (STUDY_TAG in tags) or (STUDY_TAG_KO in tags_ko) or any(tag in EXCLUDED_TAGS for tag in tags)
 
 
-def _baseline_suggestions(db: Session, user_id: str, context: Dict[str, Any]) -> tuple[List[Dict[str, Any]], List[str]]:
+def _baseline_suggestions(
+    db: Session,
+    user_id: str,
+    context: Dict[str, Any],
+    tag_counts: Optional[Dict[str, TagCounts]] = None,
+) -> tuple[List[Dict[str, Any]], List[str]]:
+    # stored keyword counts for all subjects in one read; the batch path passes its bulk-loaded counts
+    if tag_counts is None:
+        tag_counts = keyword_counts(db, user_id)
     suggestions: List[Dict[str, Any]] = []
     notes: List[str] = []
     ratio = context["user"]["subject_ratio"]
@@ -241,7 +279,7 @@ def _baseline_suggestions(db: Session, user_id: str, context: Dict[str, Any]) ->
         )
         if mode == "ceil":
             notes.append(f"{subject}: 최근 {context['days_window']}일 {have}분 < 목표 {want}분(80%) → 상향 추천")
-        tags_en, tags_ko = decide_tag_for_subject(db, user_id, subject)
+        tags_en, tags_ko = decide_tag_from_counts(subject, tag_counts.get(subject, {}))
         # Avoid duplicate KO tags already active
         if tags_ko and tags_ko[0] in context["active_tags"].get(subject, []):
             continue
@@ -279,29 +317,33 @@ def planner_payload_for_ai(context: Dict[str, Any], baseline: List[Dict[str, Any
     }
 
 
-def _call_planner_ai(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+async def _call_planner_ai(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     if not settings.OPENAI_API_KEY:
         return None
+    content, estimated = compact_planner_payload(payload)
     try:
-        from openai import OpenAI  # type: ignore
-    except Exception:
-        return None
-    try:
-        client = OpenAI(api_key=settings.OPENAI_API_KEY)
-        response = client.chat.completions.create(
+        started = time.perf_counter()
+        response = await create_chat_completion(
             model=settings.OPENAI_MODEL_FULL,
             temperature=0.2,
             messages=[
                 {"role": "system", "content": PLANNER_SYSTEM_PROMPT},
-                {
-                    "role": "user",
-                    "content": json.dumps(payload, ensure_ascii=False, separators=(",", ":"))[:6000],
-                },
+                {"role": "user", "content": content},
             ],
         )
+        usage = getattr(response, "usage", None)
+        logger.info(
+            "planner call: payload ~%d tokens (budget %d), usage prompt=%s completion=%s, %.2fs",
+            estimated,
+            settings.PLANNER_PROMPT_TOKEN_BUDGET,
+            getattr(usage, "prompt_tokens", None),
+            getattr(usage, "completion_tokens", None),
+            time.perf_counter() - started,
+        )
         content = response.choices[0].message.content or ""
         return json.loads(content)
     except Exception:
+        # includes PoolBusy: the baseline is served instead
         return None
 
 
@@ -340,16 +382,90 @@ def _normalize_ai_response(
     return normalized
 
 
-def generate_planner_response(db: Session, user: User, days: int = 7) -> tuple[List[Dict[str, Any]], List[str]]:
+def prepare_planner(db: Session, user: User, days: int = 7) -> Dict[str, Any]:
+    """All DB work of a planner request: context, baseline and the AI payload."""
     context = build_planner_context(db, user, user.id, days=days)
     baseline, baseline_notes = _baseline_suggestions(db, user.id, context)
-    payload = planner_payload_for_ai(context, baseline, baseline_notes)
-    ai_raw = _call_planner_ai(payload)
+    return {
+        "context": context,
+        "baseline": baseline,
+        "baseline_notes": baseline_notes,
+        "payload": planner_payload_for_ai(context, baseline, baseline_notes),
+    }
+
+
+def finish_planner(
+    prepared: Dict[str, Any], ai_raw: Optional[Dict[str, Any]]
+) -> tuple[List[Dict[str, Any]], List[str], str]:
+    baseline, baseline_notes = prepared["baseline"], prepared["baseline_notes"]
     if ai_raw:
-        ai_recs = _normalize_ai_response(ai_raw, context)
+        ai_recs = _normalize_ai_response(ai_raw, prepared["context"])
         if ai_recs:
             notes = ai_raw.get("notes") or []
             if baseline_notes:
                 notes = baseline_notes + notes
-            return ai_recs, notes
-    return baseline, baseline_notes
+            return ai_recs, notes, "model"
+    return baseline, baseline_notes, "baseline"
+
+
+def _cached_planner(db: Session, user_id: str) -> Optional[PlannerCache]:
+    return db.get(PlannerCache, user_id)
+
+
+def _prepare_or_reuse(db: Session, user: User, days: int, cached: Optional[PlannerCache]) -> Dict[str, Any]:
+    prepared = prepare_planner(db, user, days)
+    prepared["fingerprint"] = payload_fingerprint(prepared["payload"])
+    # read before the context was built: an invalidation after this point makes the store a no-op
+    prepared["version"] = cached.version if cached is not None else None
+    if cached is not None and cached.fingerprint == prepared["fingerprint"]:
+        # invalidated or expired, but the context came out identical
+        revalidate(db, user.id, cached.version)
+        db.commit()
+        prepared["reuse"] = cached_result(cached)
+    return prepared
+
+
+def _store(db: Session, user_id: str, prepared: Dict[str, Any], quests: List[Dict[str, Any]], notes: List[str], source: str) -> None:
+    store_planner_result(db, user_id, prepared["fingerprint"], quests, notes, source, prepared["version"])
+    db.commit()
+
+
+async def generate_planner_response(
+    db: Session, user: User, days: int = 7
+) -> tuple[List[Dict[str, Any]], List[str], str]:
+    """Planner suggestions and where they came from: 'cache', 'baseline' or 'model'."""
+    cached = await run_in_threadpool(_cached_planner, db, user.id)
+    if cached is not None and is_fresh(cached):
+        quests, notes = cached_result(cached)
+        return quests, notes, "cache"
+
+    prepared = await run_in_threadpool(_prepare_or_reuse, db, user, days, cached)
+    if "reuse" in prepared:
+        quests, notes = prepared["reuse"]
+        return quests, notes, "cache"
+
+    ai_raw = await _call_planner_ai(prepared["payload"])
+    quests, notes, source = finish_planner(prepared, ai_raw)
+    # a baseline served because the model failed is not cached, so the next request retries the model
+    if source == "model" or not settings.OPENAI_API_KEY:
+        await run_in_threadpool(_store, db, user.id, prepared, quests, notes, source)
+    return quests, notes, source
+
+
+async def coalesced_planner_response(
+    user_id: str, days: int = 7
+) -> Optional[tuple[List[Dict[str, Any]], List[str], str]]:
+    """generate_planner_response shared by concurrent requests of one user; None if the user does not exist."""
+
+    async def run() -> Optional[tuple[List[Dict[str, Any]], List[str], str]]:
+        # own session: the call outlives any single request that joined it
+        db = SessionLocal()
+        try:
+            user = await run_in_threadpool(db.get, User, user_id)
+            if user is None:
+                return None
+            return await generate_planner_response(db, user, days)
+        finally:
+            db.close()
+
+    return await planner_flights.do((user_id, days), run)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, delete, insert, literal, or_, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..constants import FINISHED_QUEST_STATUSES
+from ..models.db_models import Quest, QuestArchive, QuestTag, QuestTombstone, TimerSession
+from .quest_sync import is_hidden
+
+
+logger = logging.getLogger(__name__)
+
+_reaper_stats: Dict[str, object] = {"runs": 0, "archived": 0, "last_run_at": None, "last_archived": 0, "last_ms": 0.0}
+
+
+def finished_clause():
+    """SQL form of quest_sync.is_hidden: a finished status, or a time quest at its goal."""
+    return or_(
+        Quest.status.in_(FINISHED_QUEST_STATUSES),
+        and_(Quest.type == "time", Quest.goal_value > 0, Quest.progress_minutes >= Quest.goal_value),
+    )
+
+
+def archive_quests(db: Session, quest_ids: List[str]) -> int:
+    """Copy quests to quest_archive, leave tombstones and delete them (and their tags/sessions). Does not commit."""
+    if not quest_ids:
+        return 0
+    # the copy below reads the table, so pending ORM changes (e.g. a status just set to completed) go first
+    db.flush()
+    now = datetime.utcnow()
+    columns = list(Quest.__table__.columns)
+    targets = ["quest_id" if column.name == "id" else column.name for column in columns]
+    chosen = Quest.id.in_(quest_ids)
+    db.execute(
+        insert(QuestArchive).from_select(targets + ["archived_at"], select(*columns, literal(now)).where(chosen))
+    )
+    # Core deletes skip the ORM before_flush hook, so the tombstones are written here
+    db.execute(
+        insert(QuestTombstone).from_select(
+            ["quest_id", "user_id", "deleted_at"], select(Quest.id, Quest.user_id, literal(now)).where(chosen)
+        )
+    )
+    db.execute(delete(QuestTag).where(QuestTag.quest_id.in_(quest_ids)))
+    db.execute(delete(TimerSession).where(TimerSession.quest_id.in_(quest_ids)))
+    return db.execute(delete(Quest).where(chosen)).rowcount or 0
+
+
+def release_quest_id(db: Session, quest_id: str) -> bool:
+    """Free an id still held by a finished quest the reaper has not archived yet.
+
+    Returns False when a live quest holds the id. Does not commit.
+    """
+    row = db.get(Quest, quest_id)
+    if row is None:
+        return True
+    if not is_hidden(row):
+        return False
+    archive_quests(db, [quest_id])
+    db.expunge(row)
+    return True
+
+
+def reap_finished_quests(
+    session_factory: Callable[[], Session],
+    *,
+    chunk_size: Optional[int] = None,
+    grace_seconds: Optional[int] = None,
+) -> int:
+    """Archive every finished quest older than the grace period, one short transaction per chunk.
+
+    Chunks keep each write lock brief so heartbeats are not held up behind a
+    large sweep. Returns the number of quests archived.
+    """
+    chunk_size = chunk_size or settings.QUEST_REAPER_CHUNK_SIZE
+    grace = settings.QUEST_REAPER_GRACE_SECONDS if grace_seconds is None else grace_seconds
+    started = datetime.utcnow()
+    cutoff = started - timedelta(seconds=grace)
+    total = 0
+    while True:
+        db = session_factory()
+        try:
+            ids = [
+                quest_id
+                for (quest_id,) in db.query(Quest.id)
+                .filter(finished_clause(), Quest.updated_at < cutoff)
+                .limit(chunk_size)
+            ]
+            archived = archive_quests(db, ids)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        total += archived
+        if len(ids) < chunk_size:
+            break
+    elapsed_ms = (datetime.utcnow() - started).total_seconds() * 1000
+    _reaper_stats.update(
+        runs=int(_reaper_stats["runs"]) + 1,
+        archived=int(_reaper_stats["archived"]) + total,
+        last_run_at=started.isoformat(timespec="seconds"),
+        last_archived=total,
+        last_ms=round(elapsed_ms, 2),
+    )
+    if total:
+        logger.info("archived %d finished quests in %.0f ms", total, elapsed_ms)
+    return total
+
+
+def reaper_stats() -> Dict[str, object]:
+    return dict(_reaper_stats)
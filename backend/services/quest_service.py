@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from ..constants import STUDY_TAG, STUDY_TAG_KO, SUBJECTS, SUBJECT_KO_KOREAN
+from ..models.db_models import Quest, User
+from ..models.schemas import PatchQuestRequest, Quest as QuestSchema
+from .planner_cache import invalidate_planner_cache
+from .quest_reaper import archive_quests
+from .quest_sync import is_hidden
+from .tagging_service import ACTIVE_STATUSES
+
+
+CREATED = "created"
+EXISTING = "existing"  # an active quest with the same subject and tag was reused
+CONFLICT = "conflict"
+UPDATED = "updated"
+
+
+@dataclass
+class BulkOutcome:
+    outcome: Optional[str] = None
+    row: Optional[Quest] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def quest_row(q: QuestSchema, now: datetime) -> Quest:
+    return Quest(
+        id=q.id,
+        user_id=q.user_id,
+        type=q.type,
+        title=q.title,
+        subject=q.subject or SUBJECT_KO_KOREAN,
+        goal_value=q.goal_value,
+        progress_minutes=q.progress_value or 0,
+        status=q.status,
+        source=q.source,
+        tags_json=json.dumps(q.tags or []),
+        tags_ko_json=json.dumps(q.tags_ko or []),
+        meta_json=json.dumps(q.meta or {}),
+        created_at=q.created_at or now,
+        updated_at=q.updated_at or now,
+    )
+
+
+def seed_schema(q: dict) -> QuestSchema:
+    """A seed_quests.json entry (as normalized by seed_loader) with the defaults seeding has always used."""
+    return QuestSchema(
+        id=q["id"],
+        user_id=q.get("user_id", "u1"),
+        type=q.get("type", "time"),
+        title=q.get("title", "Unnamed Quest"),
+        subject=q.get("subject", SUBJECT_KO_KOREAN),
+        goal_value=int(q.get("goal_value", 0)),
+        progress_value=int(q.get("progress_value", 0)),
+        status=q.get("status", "pending"),
+        source=q.get("source", "ai_generated"),
+        tags=q.get("tags") or [],
+        tags_ko=q.get("tags_ko") or [],
+        meta=q.get("meta") or {},
+    )
+
+
+def _dedupe_tags(q: QuestSchema) -> Optional[Tuple[Set[str], Set[str]]]:
+    """(en, ko) tags an active quest must share to stand in for q, or None when q is never deduplicated."""
+    if q.type != "time" or q.subject not in SUBJECTS:
+        return None
+    en_tags = set(q.tags or [])
+    ko_tags = set(q.tags_ko or [])
+    # a study quest matches any study quest of the subject, other quests any shared tag
+    if STUDY_TAG in en_tags or STUDY_TAG_KO in ko_tags:
+        return {STUDY_TAG}, {STUDY_TAG_KO}
+    return en_tags, ko_tags
+
+
+def _row_tags(row: Quest) -> Tuple[Set[str], Set[str]]:
+    return set(json.loads(row.tags_json or "[]")), set(json.loads(row.tags_ko_json or "[]"))
+
+
+def _matches(row: Quest, user_id: str, subject: str, wanted: Tuple[Set[str], Set[str]]) -> bool:
+    if row.user_id != user_id or row.subject != subject or row.type != "time" or row.status not in ACTIVE_STATUSES:
+        return False
+    en_tags, ko_tags = _row_tags(row)
+    return bool(en_tags & wanted[0] or ko_tags & wanted[1])
+
+
+def bulk_create_quests(db: Session, quests: Sequence[QuestSchema]) -> List[BulkOutcome]:
+    """Create many quests with the single-create rules; one outcome per input, in order. Does not commit.
+
+    A time quest of a known subject reuses the oldest active quest sharing its
+    tag (outcome "existing"), including one created earlier in the batch. An
+    id that belongs to a live quest (or repeats within the batch) is a
+    conflict; a finished quest still holding the id is archived first.
+    Candidates and taken ids are loaded with one query for the whole batch.
+    """
+    outcomes: List[BulkOutcome] = [BulkOutcome() for _ in quests]
+    user_ids = {q.user_id for q in quests}
+    known_users = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_(user_ids))} if user_ids else set()
+    ids = {q.id for q in quests}
+    dedupe_pairs = {(q.user_id, q.subject) for q in quests if _dedupe_tags(q) is not None}
+    conditions = []
+    if ids:
+        conditions.append(Quest.id.in_(ids))
+    if dedupe_pairs:
+        conditions.append(
+            and_(
+                Quest.user_id.in_({user_id for user_id, _ in dedupe_pairs}),
+                Quest.type == "time",
+                Quest.status.in_(ACTIVE_STATUSES),
+                Quest.subject.in_({subject for _, subject in dedupe_pairs}),
+            )
+        )
+    loaded = db.query(Quest).filter(or_(*conditions)).order_by(Quest.created_at.asc()).all() if conditions else []
+    by_id: Dict[str, Quest] = {row.id: row for row in loaded}
+    candidates: List[Quest] = [row for row in loaded if not is_hidden(row)]
+
+    now = datetime.utcnow()
+    leftovers: List[str] = []
+    created: List[Quest] = []
+    taken: Set[str] = set()
+    for index, q in enumerate(quests):
+        if q.user_id not in known_users:
+            outcomes[index] = BulkOutcome(error="User not found", status_code=404)
+            continue
+        wanted = _dedupe_tags(q)
+        if wanted is not None:
+            match = next((row for row in candidates if _matches(row, q.user_id, q.subject, wanted)), None)
+            if match is not None:
+                outcomes[index] = BulkOutcome(outcome=EXISTING, row=match)
+                continue
+        existing = by_id.get(q.id)
+        if q.id in taken or (existing is not None and not is_hidden(existing)):
+            outcomes[index] = BulkOutcome(outcome=CONFLICT, error="Quest already exists", status_code=409)
+            continue
+        if existing is not None:
+            leftovers.append(q.id)
+        row = quest_row(q, now)
+        taken.add(q.id)
+        created.append(row)
+        candidates.append(row)
+        outcomes[index] = BulkOutcome(outcome=CREATED, row=row)
+
+    if leftovers:
+        archive_quests(db, leftovers)
+        for quest_id in leftovers:
+            db.expunge(by_id[quest_id])
+    db.add_all(created)
+    if created:
+        # active quests feed the planner context
+        invalidate_planner_cache(db, sorted({row.user_id for row in created}))
+    db.flush()
+    return outcomes
+
+
+def bulk_patch_quests(db: Session, entries: Sequence[Tuple[str, PatchQuestRequest]]) -> List[BulkOutcome]:
+    """Apply PATCH /quests/{id} to many quests loaded with one query. Does not commit."""
+    ids = {quest_id for quest_id, _ in entries}
+    rows = {row.id: row for row in db.query(Quest).filter(Quest.id.in_(ids))} if ids else {}
+    now = datetime.utcnow()
+    outcomes: List[BulkOutcome] = []
+    touched: Set[str] = set()
+    for quest_id, payload in entries:
+        row = rows.get(quest_id)
+        if row is None:
+            outcomes.append(BulkOutcome(error="Quest not found", status_code=404))
+            continue
+        if payload.status is not None:
+            row.status = payload.status
+        if payload.progress_value is not None:
+            row.progress_minutes = max(0, int(payload.progress_value))
+        row.updated_at = now
+        touched.add(row.user_id)
+        outcomes.append(BulkOutcome(outcome=UPDATED, row=row))
+    if touched:
+        invalidate_planner_cache(db, sorted(touched))
+    db.flush()
+    return outcomes
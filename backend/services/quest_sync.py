@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..constants import FINISHED_QUEST_STATUSES
+from ..models.db_models import Quest, QuestTombstone
+from .timer_accumulator import timer_accumulator
+
+
+FULL_SYNC = "0"
+
+
+def is_hidden(row: Quest, status: Optional[str] = None) -> bool:
+    """Finished quests are not shown; GET /quests drops them like deleted ones until the reaper archives them."""
+    status = status or row.status
+    if status in FINISHED_QUEST_STATUSES:
+        return True
+    return row.type == "time" and bool(row.goal_value) and row.goal_value > 0 and (row.progress_minutes or 0) >= row.goal_value
+
+
+def parse_cursor(since: str) -> Optional[datetime]:
+    """None for a full sync ("0" or empty); ValueError for anything that is not a cursor we issued."""
+    if not since or since == FULL_SYNC:
+        return None
+    return datetime.fromisoformat(since)
+
+
+def format_cursor(at: datetime) -> str:
+    return at.isoformat(timespec="microseconds")
+
+
+def sync_etag(db: Session, user_id: str) -> str:
+    """Version of the user's quest list; any insert, update, delete or buffered heartbeat changes it."""
+    count, latest, stamp_total = (
+        db.query(func.count(Quest.id), func.max(Quest.updated_at), func.total(func.julianday(Quest.updated_at)))
+        .filter(Quest.user_id == user_id)
+        .one()
+    )
+    tombstones, last_tombstone = (
+        db.query(func.count(QuestTombstone.id), func.max(QuestTombstone.id)).filter(QuestTombstone.user_id == user_id).one()
+    )
+    pending = sorted(timer_accumulator.pending_for_user(user_id).items()) if settings.TIMER_WRITE_BEHIND else []
+    raw = f"{user_id}|{count}|{latest}|{stamp_total!r}|{tombstones}|{last_tombstone}|{pending}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20] + '"'
+
+
+def quest_delta(db: Session, user_id: str, since: Optional[datetime]) -> Tuple[List[Quest], List[str], str, bool]:
+    """Rows changed since the cursor, ids deleted (or finished) since it, the next cursor and whether this is a full sync.
+
+    The window reaches QUEST_SYNC_OVERLAP_SECONDS before the cursor, so a
+    transaction stamped before the previous read but committed after it is
+    still picked up; clients apply upserts idempotently. A cursor older than
+    the tombstone retention can no longer be answered with a delta and gets
+    a full sync instead.
+    """
+    now = datetime.utcnow()
+    horizon = now - timedelta(days=settings.QUEST_TOMBSTONE_RETENTION_DAYS)
+    full = since is None or since < horizon
+    query = db.query(Quest).filter(Quest.user_id == user_id)
+    deleted: List[str] = []
+    if not full:
+        window = since - timedelta(seconds=settings.QUEST_SYNC_OVERLAP_SECONDS)
+        pending_ids = list(timer_accumulator.pending_for_user(user_id)) if settings.TIMER_WRITE_BEHIND else []
+        changed = Quest.updated_at > window
+        query = query.filter(changed | Quest.id.in_(pending_ids) if pending_ids else changed)
+        deleted = [
+            quest_id
+            for (quest_id,) in db.query(QuestTombstone.quest_id)
+            .filter(QuestTombstone.user_id == user_id, QuestTombstone.deleted_at > window)
+            .distinct()
+        ]
+    rows = query.all()
+    # an id deleted and then created again (e.g. re-seeded) is a change, not a delete
+    present = {row.id for row in rows}
+    deleted = [quest_id for quest_id in deleted if quest_id not in present]
+    return rows, deleted, format_cursor(now), full
+
+
+def prune_tombstones(session_factory: Callable[[], Session]) -> int:
+    """Drop tombstones past the retention; clients that old get a full sync anyway."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.QUEST_TOMBSTONE_RETENTION_DAYS)
+    db = session_factory()
+    try:
+        removed = db.execute(delete(QuestTombstone).where(QuestTombstone.deleted_at < cutoff)).rowcount
+        db.commit()
+        return removed or 0
+    finally:
+        db.close()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from ..models.db_models import QuestionLog
+from .planner_cache import invalidate_planner_cache
+from .tagging_service import add_keyword_counts
+
+
+def record_question_logs(db: Session, logs: Sequence[Dict[str, Any]]) -> List[QuestionLog]:
+    """Single write path for question_logs; the caller commits.
+
+    Each log is a dict with user_id, subject, text, difficulty and optionally
+    created_at (queued writes keep their submit time). Everything derived from
+    the logs (keyword counts, planner cache) is updated here in the same
+    transaction.
+    """
+    rows = [
+        QuestionLog(
+            user_id=log["user_id"],
+            subject=log.get("subject"),
+            text=log["text"],
+            difficulty=log.get("difficulty"),
+            **({"created_at": log["created_at"]} if log.get("created_at") else {}),
+        )
+        for log in logs
+    ]
+    if not rows:
+        return rows
+    db.add_all(rows)
+    add_keyword_counts(db, logs)
+    invalidate_planner_cache(db, {log["user_id"] for log in logs})
+    return rows
+
+
+def record_question_log(
+    db: Session,
+    user_id: str,
+    subject: Optional[str],
+    text: str,
+    difficulty: Optional[str] = None,
+) -> QuestionLog:
+    return record_question_logs(
+        db, [{"user_id": user_id, "subject": subject, "text": text, "difficulty": difficulty}]
+    )[0]
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from .question_log_service import record_question_logs
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def _is_locked(exc: Exception) -> bool:
+    return isinstance(exc, OperationalError) and "locked" in str(exc)
+
+
+class QuestionLogWriter:
+    """Bounded write-behind queue for chat question logs.
+
+    submit() never touches the database: it enqueues and returns. One daemon
+    thread drains the queue in batches (up to `batch_size` rows, waiting at
+    most `linger_seconds` to fill one) through record_question_logs. When the
+    queue is full, or the writer is not running, submit() returns False and
+    the caller writes synchronously, so logs are never dropped for load. A
+    batch that keeps failing is retried row by row; only rows that fail on
+    their own are dropped (and logged). A lock that outlasts the batch retries
+    ends that pass: the remaining rows are re-queued, or dropped and counted
+    when the queue is full.
+    stop() drains everything still queued before returning.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_size: int,
+        batch_size: int,
+        linger_seconds: float,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ) -> None:
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.linger_seconds = max(0.0, linger_seconds)
+        self._session_factory = session_factory
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_size)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._lock = threading.Lock()
+        self._counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "rejected": 0,
+            "failed": 0,
+            "requeued": 0,
+            "max_depth": 0,
+        }
+        self._last_batch_ms = 0.0
+        self._max_lag_seconds = 0.0
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="question-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id: str, subject: Optional[str], text: str, difficulty: Optional[str]) -> bool:
+        """Queue one log; False means the caller must write it itself (full queue or writer stopped)."""
+        if not self._running:
+            return False
+        entry = {
+            "user_id": user_id,
+            "subject": subject,
+            "text": text,
+            "difficulty": difficulty,
+            "created_at": datetime.utcnow(),
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._count("rejected")
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters["enqueued"] += 1
+            self._counters["max_depth"] = max(self._counters["max_depth"], depth)
+        return True
+
+    def _next_batch(self, first: Any) -> tuple[List[Dict[str, Any]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.linger_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stopping = self._next_batch(item)
+            self._write(batch)
+            if stopping:
+                return
+
+    def _commit(self, rows: List[Dict[str, Any]], attempts: int = 3) -> Optional[Exception]:
+        """Write rows in one transaction; returns the error if it failed."""
+        error: Optional[Exception] = None
+        for attempt in range(attempts):
+            if attempt:
+                # a locked database; give the other writer a moment
+                time.sleep(0.1 * attempt)
+            db = self._session_factory()
+            try:
+                record_question_logs(db, rows)
+                db.commit()
+                return None
+            except Exception as exc:
+                db.rollback()
+                error = exc
+                if not _is_locked(exc):
+                    # a bad row fails the same way again
+                    return exc
+            finally:
+                db.close()
+        return error
+
+    def _requeue(self, rows: List[Dict[str, Any]]) -> int:
+        """Put rows back for a later batch; returns how many fit (the rest are dropped)."""
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                logger.error("question log queue full: dropped %d rows", len(rows) - index)
+                return index
+        return len(rows)
+
+    def _write(self, batch: List[Dict[str, Any]]) -> int:
+        """Write one batch; returns the rows that were not written (dropped or re-queued)."""
+        started = time.perf_counter()
+        failed = requeued = 0
+        error = self._commit(batch)
+        rows = batch if error is not None else []
+        if len(rows) > 1:
+            # one bad row must not take the rest of the batch with it
+            logger.warning("question log batch of %d rows failed; writing row by row", len(rows))
+        for index, row in enumerate(rows):
+            if len(rows) > 1:
+                error = self._commit([row], attempts=1)
+                if error is None:
+                    continue
+            if _is_locked(error):
+                # the lock outlasted the batch retries: every further row would only wait on it again
+                requeued = self._requeue(rows[index:])
+                failed += len(rows) - index - requeued
+                logger.warning("question log table locked; re-queued %d rows", requeued)
+                break
+            failed += 1
+            logger.error("question log dropped: user=%s subject=%s", row.get("user_id"), row.get("subject"))
+        lag = (datetime.utcnow() - batch[0]["created_at"]).total_seconds()
+        with self._lock:
+            self._counters["written"] += len(batch) - failed - requeued
+            self._counters["failed"] += failed
+            self._counters["requeued"] += requeued
+            self._counters["batches"] += 1
+            self._last_batch_ms = (time.perf_counter() - started) * 1000
+            self._max_lag_seconds = max(self._max_lag_seconds, lag)
+        return failed + requeued
+
+    def stop(self, timeout: float = 10.0) -> int:
+        """Stop accepting logs and write everything queued; returns rows that failed or are still unwritten (0 on success)."""
+        if not self._running:
+            return 0
+        self._running = False
+        with self._lock:
+            failed_before = self._counters["failed"]
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        # whatever the thread did not get to (or raced the stop) is written here
+        leftover: List[Dict[str, Any]] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        for i in range(0, len(leftover), self.batch_size):
+            self._write(leftover[i : i + self.batch_size])
+        self._thread = None
+        with self._lock:
+            failed = self._counters["failed"] - failed_before
+        return failed + self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            last_batch_ms = self._last_batch_ms
+            max_lag = self._max_lag_seconds
+        return {
+            **counters,
+            "running": self._running,
+            "depth": self._queue.qsize(),
+            "capacity": self.max_size,
+            "batch_size": self.batch_size,
+            "linger_seconds": self.linger_seconds,
+            "avg_batch": round(counters["written"] / counters["batches"], 1) if counters["batches"] else 0.0,
+            "last_batch_ms": round(last_batch_ms, 2),
+            "max_lag_seconds": round(max_lag, 3),
+        }
+
+
+question_log_writer = QuestionLogWriter(
+    max_size=settings.QUESTION_LOG_QUEUE_SIZE,
+    batch_size=settings.QUESTION_LOG_BATCH_SIZE,
+    linger_seconds=settings.QUESTION_LOG_LINGER_SECONDS,
+)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from ..config import settings
+from ..metrics import observe_ai_call
+
+
+T = TypeVar("T")
+
+
+class CircuitOpen(Exception):
+    """The model's breaker is open: fail fast and let the caller use its fallback."""
+
+
+class BudgetExceeded(Exception):
+    """The upstream call ran past the model's latency budget and was abandoned."""
+
+
+def parse_model_budgets(raw: str) -> Dict[str, float]:
+    """Parse "gpt-5-nano=4,gpt-5=20" into seconds per model; malformed entries are ignored."""
+    budgets: Dict[str, float] = {}
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if not sep:
+            continue
+        try:
+            budgets[name.strip()] = max(0.1, float(value))
+        except ValueError:
+            continue
+    return budgets
+
+
+_budgets = parse_model_budgets(settings.OPENAI_LATENCY_BUDGETS)
+
+
+def latency_budget(model: str) -> float:
+    return _budgets.get(model, settings.OPENAI_DEFAULT_LATENCY_BUDGET)
+
+
+class CircuitBreaker:
+    """Per-model breaker: closed -> open after N consecutive failed or slow calls -> half-open probe.
+
+    A slow call is one that succeeded but took longer than BREAKER_SLOW_RATIO
+    of the budget. While open every call fails instantly; after
+    BREAKER_OPEN_SECONDS a single probe is let through and its outcome
+    closes or re-opens the breaker. Only upstream outcomes count; local
+    queueing (PoolBusy) does not.
+    """
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.counters = {"calls": 0, "failures": 0, "timeouts": 0, "slow": 0, "rejected": 0, "opened": 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def budget(self) -> float:
+        return latency_budget(self.model)
+
+    def _probe_due(self) -> bool:
+        return time.monotonic() - self.opened_at >= settings.BREAKER_OPEN_SECONDS
+
+    def check(self) -> None:
+        """Raise CircuitOpen if a call would be refused right now (does not reserve the probe)."""
+        if self.state == "open" and not self._probe_due():
+            self.counters["rejected"] += 1
+            raise CircuitOpen(self.model)
+        if self.state == "half_open" and self.probing:
+            self.counters["rejected"] += 1
+            raise CircuitOpen(self.model)
+
+    def acquire(self) -> None:
+        self.check()
+        if self.state == "open":
+            self.state = "half_open"
+        if self.state == "half_open":
+            self.probing = True
+        self.counters["calls"] += 1
+
+    def release(self) -> None:
+        # the caller went away before an outcome; let the next call probe
+        self.probing = False
+
+    def record_success(self, latency: float) -> None:
+        self.probing = False
+        if latency > self.budget * settings.BREAKER_SLOW_RATIO:
+            self.counters["slow"] += 1
+            self._failed(f"slow call {latency:.1f}s")
+            return
+        self.consecutive = 0
+        self.state = "closed"
+
+    def record_failure(self, error: str, *, timeout: bool = False) -> None:
+        self.probing = False
+        self.counters["timeouts" if timeout else "failures"] += 1
+        self._failed(error)
+
+    def _failed(self, error: str) -> None:
+        self.last_error = error
+        self.consecutive += 1
+        if self.state == "half_open" or self.consecutive >= settings.BREAKER_FAILURE_THRESHOLD:
+            if self.state != "open":
+                self.counters["opened"] += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def reset(self) -> None:
+        self.state = "closed"
+        self.consecutive = 0
+        self.probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        if state == "open" and self._probe_due():
+            state = "half_open"
+        retry_in = max(0.0, settings.BREAKER_OPEN_SECONDS - (time.monotonic() - self.opened_at))
+        return {
+            "state": state,
+            "budget_seconds": self.budget,
+            "consecutive_failures": self.consecutive,
+            "retry_in_seconds": round(retry_in, 1) if state == "open" else 0.0,
+            "last_error": self.last_error,
+            **self.counters,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    breaker = _breakers.get(model)
+    if breaker is None:
+        breaker = _breakers[model] = CircuitBreaker(model)
+    return breaker
+
+
+def check_circuit(model: str) -> None:
+    """Fail fast before queueing for a model slot."""
+    if settings.BREAKER_ENABLED:
+        breaker_for(model).check()
+
+
+async def guarded_call(model: str, call: Callable[[], Awaitable[T]]) -> T:
+    """Run one upstream call under the model's latency budget and breaker."""
+    breaker = breaker_for(model)
+    enabled = settings.BREAKER_ENABLED
+    if enabled:
+        breaker.acquire()
+    started = time.monotonic()
+    try:
+        result = await asyncio.wait_for(call(), breaker.budget)
+    except asyncio.TimeoutError:
+        observe_ai_call(model, time.monotonic() - started, "timeout")
+        if enabled:
+            breaker.record_failure(f"over {breaker.budget:g}s budget", timeout=True)
+        raise BudgetExceeded(f"{model} exceeded {breaker.budget:g}s") from None
+    except asyncio.CancelledError:
+        breaker.release()
+        raise
+    except Exception as exc:
+        observe_ai_call(model, time.monotonic() - started, "error")
+        if enabled:
+            breaker.record_failure(f"{type(exc).__name__}: {exc}"[:200])
+        raise
+    latency = time.monotonic() - started
+    observe_ai_call(model, latency, "ok")
+    if enabled:
+        breaker.record_success(latency)
+    return result
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {model: breaker.snapshot() for model, breaker in sorted(_breakers.items())}
+
+
+def reset_breakers(model: Optional[str] = None) -> None:
+    for name, breaker in _breakers.items():
+        if model is None or name == model:
+            breaker.reset()
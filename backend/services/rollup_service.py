@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Tuple, Union
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..constants import DAY_RESET_TIMEZONE
+from ..models.db_models import DailySubjectMinutes, Quest, TimerLog
+
+
+ROLLUP_ZONE = ZoneInfo(DAY_RESET_TIMEZONE)
+
+
+def local_today() -> date:
+    return datetime.now(timezone.utc).astimezone(ROLLUP_ZONE).date()
+
+
+def _offset_minutes() -> int:
+    offset = datetime.now(timezone.utc).astimezone(ROLLUP_ZONE).utcoffset() or timedelta(0)
+    return int(offset.total_seconds() // 60)
+
+
+def add_to_rollup(db: Session, logs: Iterable[Dict[str, Any]]) -> None:
+    """Upsert the rollup for timer_logs rows being written now, in the caller's transaction."""
+    day = local_today().isoformat()
+    merged: Dict[Tuple[str, str], int] = defaultdict(int)
+    for log in logs:
+        if log.get("subject") and int(log.get("delta_seconds") or 0) > 0:
+            merged[(log["user_id"], log["subject"])] += int(log["delta_seconds"])
+    if not merged:
+        return
+    stmt = sqlite_insert(DailySubjectMinutes).values(
+        [
+            {"user_id": user_id, "date": day, "subject": subject, "seconds": seconds}
+            for (user_id, subject), seconds in merged.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "date", "subject"],
+        set_={"seconds": DailySubjectMinutes.seconds + stmt.excluded.seconds},
+    )
+    db.execute(stmt)
+
+
+def daily_seconds(db: Session, user_id: str, first_day: date) -> Dict[Tuple[str, str], int]:
+    """Seconds per (date ISO string, subject) from first_day on; O(days) rows."""
+    rows = (
+        db.query(DailySubjectMinutes.date, DailySubjectMinutes.subject, DailySubjectMinutes.seconds)
+        .filter(DailySubjectMinutes.user_id == user_id, DailySubjectMinutes.date >= first_day.isoformat())
+        .all()
+    )
+    return {(day, subject): int(seconds or 0) for day, subject, seconds in rows}
+
+
+def rebuild_rollup(conn: Union[Session, Connection]) -> None:
+    """Recompute the rollup from raw timer_logs inside the caller's transaction."""
+    subject_expr = func.coalesce(TimerLog.subject, Quest.subject)
+    day_expr = func.date(TimerLog.created_at, f"{_offset_minutes():+d} minutes")
+    source = (
+        select(TimerLog.user_id, day_expr, subject_expr, func.sum(TimerLog.delta_seconds))
+        .select_from(TimerLog)
+        .outerjoin(Quest, Quest.id == TimerLog.quest_id)
+        .where(subject_expr.is_not(None))
+        .group_by(TimerLog.user_id, day_expr, subject_expr)
+    )
+    conn.execute(delete(DailySubjectMinutes))
+    conn.execute(
+        sqlite_insert(DailySubjectMinutes).from_select(
+            ["user_id", "date", "subject", "seconds"],
+            source,
+        )
+    )
+
+
+def backfill_rollup(db: Session) -> int:
+    """Rebuild the rollup for an existing database. Returns the number of rollup rows."""
+    rebuild_rollup(db)
+    db.commit()
+    return int(db.execute(select(func.count()).select_from(DailySubjectMinutes)).scalar() or 0)
+
+
+def window_days(days: int) -> List[date]:
+    today = local_today()
+    return [today - timedelta(days=(days - 1 - i)) for i in range(days)]
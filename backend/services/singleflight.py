@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesce identical in-flight async calls.
+
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it runs await the same task instead of starting another.
+    The task is shielded, so a caller that disconnects does not cancel the
+    call for the others. Nothing is cached once the call finishes.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._counters = {"calls": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        # a task left by another event loop (e.g. a previous app instance) cannot be awaited here
+        if task is not None and task.get_loop() is loop and not task.done():
+            self._counters["coalesced"] += 1
+            return await asyncio.shield(task)
+        task = loop.create_task(fn())
+        self._inflight[key] = task
+        self._counters["calls"] += 1
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            self._counters["errors"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        counters = dict(self._counters)
+        requests = counters["calls"] + counters["coalesced"]
+        return {
+            **counters,
+            "in_flight": len(self._inflight),
+            # share of requests that did not start their own upstream call
+            "saved_ratio": round(counters["coalesced"] / requests, 4) if requests else 0.0,
+        }
+
+
+problem_flights = SingleFlight("ai_problem")
+planner_flights = SingleFlight("planner")
+
+
+def flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {flight.name: flight.stats() for flight in (problem_flights, planner_flights)}
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
-import json
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
 
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 
-from ..models.db_models import QuestionLog, Quest
+from ..constants import SUBJECTS
+from ..models.db_models import QuestionKeywordCount, QuestionLog, Quest, QuestTag
+from .keyword_matcher import KeywordMatcher
 
 
 TAG_MAP: Dict[str, str] = {
@@ -35,36 +40,52 @@ KEYWORDS: Dict[str, Dict[str, List[str]]] = {
 }
 
 
-def _count_keywords(texts: List[str], keywords: List[str]) -> int:
-    lowered = [t.lower() for t in texts]
-    count = 0
-    for kw in keywords:
-        needle = kw.lower()
-        count += sum(1 for text in lowered if needle in text)
-    return count
-
-
-def decide_tag_for_subject(db: Session, user_id: str, subject: str, days: int = 7) -> Tuple[List[str], List[str]]:
-    cutoff = datetime.utcnow() - timedelta(days=days)
-    logs = (
-        db.query(QuestionLog)
-        .filter(QuestionLog.user_id == user_id, QuestionLog.created_at >= cutoff)
-        .all()
-    )
-    subject_logs = [log for log in logs if (log.subject or subject) == subject]
-    texts = [log.text or "" for log in subject_logs]
-
+TAG_WINDOW_DAYS = 7
+# per (user, day, subject): hits = logs counted for the subject, hard_hits = of which hard
+TOTAL_TAG = "*"
+
+# (subject, text, difficulty) of one question_logs row
+LogRow = Tuple[str | None, str | None, str | None]
+# tag -> (hits, hard_hits) for one subject
+TagCounts = Dict[str, Tuple[int, int]]
+
+# keyword -> every (subject, tag) list it appears in; one automaton serves them all
+_KEYWORD_OWNERS: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+for _subject, _tags in KEYWORDS.items():
+    for _tag, _keywords in _tags.items():
+        for _keyword in _keywords:
+            _KEYWORD_OWNERS[_keyword.lower()].append((_subject, _tag))
+KEYWORD_MATCHER = KeywordMatcher(_KEYWORD_OWNERS)
+
+
+def score_question(subject: str | None, text: str | None, difficulty: str | None) -> List[Tuple[str, str, int, int]]:
+    """(scoring subject, tag, hits, hard_hits) contributed by one question log.
+
+    A tag's hits count its keywords found in the text, each at most once per
+    text. Logs without a subject count towards every subject.
+    """
+    hard = int((difficulty or "").lower() == "hard")
+    subjects = [subject] if subject else list(SUBJECTS)
+    hits: Dict[Tuple[str, str], int] = defaultdict(int)
+    for keyword in KEYWORD_MATCHER.find(text or ""):
+        for owner in _KEYWORD_OWNERS[keyword]:
+            if owner[0] in subjects:
+                hits[owner] += 1
+    rows = [(subj, TOTAL_TAG, 1, hard) for subj in subjects]
+    rows += [(subj, tag, count, count * hard) for (subj, tag), count in hits.items()]
+    return rows
+
+
+def decide_tag_from_counts(subject: str, counts: TagCounts) -> Tuple[List[str], List[str]]:
+    """Pick the suggestion tag for a subject from its aggregated keyword counts."""
     keyword_map = KEYWORDS.get(subject, {})
-    scores: Dict[str, int] = {}
-    for tag, keywords in keyword_map.items():
-        scores[tag] = _count_keywords(texts, keywords)
+    scores: Dict[str, int] = {tag: counts.get(tag, (0, 0))[0] for tag in keyword_map}
 
-    hard_logs = [log for log in subject_logs if (log.difficulty or "").lower() == "hard"]
+    hard_logs = counts.get(TOTAL_TAG, (0, 0))[1]
     if subject == "수학" and hard_logs:
         scores["문제풀이"] = scores.get("문제풀이", 0) + 1
     if subject == "영어" and hard_logs:
-        listening_keywords = keyword_map.get("듣기(영어)", [])
-        if _count_keywords([log.text or "" for log in hard_logs], listening_keywords):
+        if counts.get("듣기(영어)", (0, 0))[1]:
             scores["듣기(영어)"] = scores.get("듣기(영어)", 0) + 1
         else:
             scores["복습"] = scores.get("복습", 0) + 1
@@ -76,29 +97,146 @@ def decide_tag_for_subject(db: Session, user_id: str, subject: str, days: int =
         if value >= 2:
             return [TAG_MAP.get(tag, "study")], [tag]
 
-    if subject == "영어" and _count_keywords(texts, keyword_map.get("독해(영어)", [])) >= 1:
+    if subject == "영어" and counts.get("독해(영어)", (0, 0))[0] >= 1:
         return [TAG_MAP["독해(영어)"]], ["독해(영어)"]
 
     return [TAG_MAP["학습"]], ["학습"]
 
 
-def has_active_subject_tag(db: Session, user_id: str, subject: str, ko_tag: str) -> Quest | None:
-    """Return the first quest that already uses the requested Korean tag, or None."""
+def decide_tag_from_logs(subject: str, logs: Iterable[LogRow]) -> Tuple[List[str], List[str]]:
+    """Same decision from raw question rows (no DB access)."""
+    counts: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for log in logs:
+        for subj, tag, hits, hard_hits in score_question(*log):
+            if subj == subject:
+                counts[tag][0] += hits
+                counts[tag][1] += hard_hits
+    return decide_tag_from_counts(subject, {tag: (h, hh) for tag, (h, hh) in counts.items()})
+
+
+def keyword_count_rows(user_id: str, day: str, logs: Iterable[LogRow]) -> List[Dict[str, object]]:
+    merged: Dict[Tuple[str, str], List[int]] = defaultdict(lambda: [0, 0])
+    for log in logs:
+        for subj, tag, hits, hard_hits in score_question(*log):
+            merged[(subj, tag)][0] += hits
+            merged[(subj, tag)][1] += hard_hits
+    return [
+        {"user_id": user_id, "day": day, "subject": subj, "tag": tag, "hits": hits, "hard_hits": hard_hits}
+        for (subj, tag), (hits, hard_hits) in merged.items()
+    ]
+
+
+def add_keyword_counts(db: Session, logs: Iterable[Dict[str, Any]]) -> None:
+    """Upsert the counts for question_logs rows being written now, in the caller's transaction.
+
+    Each log is a dict with user_id, subject, text, difficulty and optionally created_at.
+    """
+    grouped: Dict[Tuple[str, str], List[LogRow]] = defaultdict(list)
+    for log in logs:
+        day = (log.get("created_at") or datetime.utcnow()).date().isoformat()
+        grouped[(log["user_id"], day)].append((log.get("subject"), log.get("text"), log.get("difficulty")))
+    rows = [row for (user_id, day), items in grouped.items() for row in keyword_count_rows(user_id, day, items)]
+    if not rows:
+        return
+    stmt = sqlite_insert(QuestionKeywordCount).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day", "subject", "tag"],
+        set_={
+            "hits": QuestionKeywordCount.hits + stmt.excluded.hits,
+            "hard_hits": QuestionKeywordCount.hard_hits + stmt.excluded.hard_hits,
+        },
+    )
+    db.execute(stmt)
+
+
+def rebuild_keyword_counts(conn: Union[Session, Connection]) -> int:
+    """Recompute question_keyword_counts from question_logs (after a KEYWORDS change or for an old DB)."""
+    logs: Dict[Tuple[str, str], List[LogRow]] = defaultdict(list)
+    for user_id, subject, text, difficulty, created_at in conn.execute(
+        select(QuestionLog.user_id, QuestionLog.subject, QuestionLog.text, QuestionLog.difficulty, QuestionLog.created_at)
+    ):
+        day = (created_at or datetime.utcnow()).date().isoformat()
+        logs[(user_id, day)].append((subject, text, difficulty))
+    rows = [row for (user_id, day), items in logs.items() for row in keyword_count_rows(user_id, day, items)]
+    conn.execute(delete(QuestionKeywordCount))
+    if rows:
+        conn.execute(insert(QuestionKeywordCount), rows)
+    return len(rows)
+
+
+def _window_start(days: int) -> str:
+    # day buckets: the window covers whole UTC days from (now - days) on
+    return (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+
+
+def keyword_counts_by_user(
+    db: Session, user_ids: Sequence[str], days: int = TAG_WINDOW_DAYS
+) -> Dict[str, Dict[str, TagCounts]]:
+    """user -> subject -> tag -> (hits, hard_hits) summed over the window; one grouped query."""
+    out: Dict[str, Dict[str, TagCounts]] = {uid: {} for uid in user_ids}
+    if not user_ids:
+        return out
     rows = (
+        db.query(
+            QuestionKeywordCount.user_id,
+            QuestionKeywordCount.subject,
+            QuestionKeywordCount.tag,
+            func.sum(QuestionKeywordCount.hits),
+            func.sum(QuestionKeywordCount.hard_hits),
+        )
+        .filter(QuestionKeywordCount.user_id.in_(list(user_ids)), QuestionKeywordCount.day >= _window_start(days))
+        .group_by(QuestionKeywordCount.user_id, QuestionKeywordCount.subject, QuestionKeywordCount.tag)
+        .all()
+    )
+    for user_id, subject, tag, hits, hard_hits in rows:
+        out[user_id].setdefault(subject, {})[tag] = (int(hits or 0), int(hard_hits or 0))
+    return out
+
+
+def keyword_counts(db: Session, user_id: str, days: int = TAG_WINDOW_DAYS) -> Dict[str, TagCounts]:
+    return keyword_counts_by_user(db, [user_id], days)[user_id]
+
+
+def decide_tag_for_subject(db: Session, user_id: str, subject: str, days: int = TAG_WINDOW_DAYS) -> Tuple[List[str], List[str]]:
+    return decide_tag_from_counts(subject, keyword_counts(db, user_id, days).get(subject, {}))
+
+
+ACTIVE_STATUSES = ["pending", "in_progress", "paused"]
+
+
+def find_active_tagged_quest(
+    db: Session,
+    user_id: str,
+    subject: str,
+    *,
+    en_tags: Iterable[str] = (),
+    ko_tags: Iterable[str] = (),
+) -> Quest | None:
+    """Oldest active time quest of the subject carrying any of the given tags (one indexed join on quest_tags)."""
+    en_tags = [tag for tag in en_tags if tag]
+    ko_tags = [tag for tag in ko_tags if tag]
+    conditions = []
+    if en_tags:
+        conditions.append(and_(QuestTag.lang == "en", QuestTag.tag.in_(en_tags)))
+    if ko_tags:
+        conditions.append(and_(QuestTag.lang == "ko", QuestTag.tag.in_(ko_tags)))
+    if not conditions:
+        return None
+    return (
         db.query(Quest)
+        .join(QuestTag, QuestTag.quest_id == Quest.id)
         .filter(
             Quest.user_id == user_id,
             Quest.subject == subject,
             Quest.type == "time",
-            Quest.status.in_(["pending", "in_progress", "paused"]),
+            Quest.status.in_(ACTIVE_STATUSES),
+            or_(*conditions),
         )
-        .all()
+        .order_by(Quest.created_at.asc())
+        .first()
     )
-    for row in rows:
-        try:
-            tags_ko = json.loads(row.tags_ko_json) if row.tags_ko_json else []
-            if ko_tag in tags_ko:
-                return row
-        except Exception:
-            continue
-    return None
+
+
+def has_active_subject_tag(db: Session, user_id: str, subject: str, ko_tag: str) -> Quest | None:
+    """Return the first quest that already uses the requested Korean tag, or None."""
+    return find_active_tagged_quest(db, user_id, subject, ko_tags=[ko_tag])
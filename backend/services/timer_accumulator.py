@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models.db_models import Quest
+from .timer_service import apply_delta, project_progress, write_timer_logs
+
+
+@dataclass
+class _Pending:
+    user_id: str
+    quest_id: str
+    subject: Optional[str]
+    seconds: int = 0
+
+
+class TimerAccumulator:
+    """Write-behind buffer for timer heartbeats.
+
+    Deltas are summed in memory per (user, quest) and written as one merged
+    timer_logs row + one progress update per quest on each flush.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, str], _Pending] = {}
+
+    def add(self, row: Quest, delta_seconds: int) -> int:
+        """Buffer a delta for row and return the total seconds still pending for it."""
+        delta_seconds = max(0, int(delta_seconds))
+        key = (row.user_id, row.id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                entry = _Pending(user_id=row.user_id, quest_id=row.id, subject=row.subject)
+                self._pending[key] = entry
+            entry.seconds += delta_seconds
+            return entry.seconds
+
+    def pending_seconds(self, user_id: str, quest_id: str) -> int:
+        with self._lock:
+            entry = self._pending.get((user_id, quest_id))
+            return entry.seconds if entry else 0
+
+    def pending_for_user(self, user_id: str) -> Dict[str, int]:
+        """quest_id -> buffered seconds for one user's quests."""
+        with self._lock:
+            return {item.quest_id: item.seconds for item in self._pending.values() if item.user_id == user_id and item.seconds > 0}
+
+    def project(self, row: Quest) -> Tuple[int, int, str]:
+        """Progress of row as the client should see it (persisted + buffered)."""
+        pending = self.pending_seconds(row.user_id, row.id)
+        if pending <= 0:
+            return int(row.progress_minutes or 0), int(row.progress_seconds_remainder or 0), row.status
+        return project_progress(row, pending)
+
+    def take(self, user_id: str, quest_id: str) -> int:
+        """Remove and return the buffered seconds for one quest (used for immediate flushes)."""
+        with self._lock:
+            entry = self._pending.pop((user_id, quest_id), None)
+            return entry.seconds if entry else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending = {}
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _restore(self, entries: List[_Pending]) -> None:
+        with self._lock:
+            for item in entries:
+                key = (item.user_id, item.quest_id)
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = item
+                else:
+                    current.seconds += item.seconds
+
+    def flush(self, session_factory: Callable[[], Session]) -> int:
+        """Persist every buffered delta in one transaction. Returns the number of quests written."""
+        with self._lock:
+            entries = [item for item in self._pending.values() if item.seconds > 0]
+            self._pending = {}
+        if not entries:
+            return 0
+
+        db = session_factory()
+        try:
+            logs = []
+            for item in entries:
+                row = db.get(Quest, item.quest_id)
+                if row is not None and row.status != "completed":
+                    apply_delta(db, row, item.seconds)
+                logs.append(
+                    {
+                        "user_id": item.user_id,
+                        "quest_id": item.quest_id,
+                        "subject": row.subject if row is not None else item.subject,
+                        "delta_seconds": item.seconds,
+                    }
+                )
+            write_timer_logs(db, logs)
+            db.commit()
+        except Exception:
+            db.rollback()
+            # keep the time; the next flush (or shutdown) retries it
+            self._restore(entries)
+            raise
+        finally:
+            db.close()
+        return len(entries)
+
+
+timer_accumulator = TimerAccumulator()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from ..models.db_models import Quest, TimerLog
+from .planner_cache import invalidate_planner_cache
+from .rollup_service import add_to_rollup
+
+
+_PROGRESS_ATTRS = ("progress_minutes", "progress_seconds_remainder", "status", "updated_at")
+
+
+def project_progress(row: Quest, delta_seconds: int) -> Tuple[int, int, str]:
+    """Return (progress_minutes, seconds_remainder, status) after adding delta_seconds, without mutating row."""
+    total_seconds = (row.progress_seconds_remainder or 0) + max(0, int(delta_seconds))
+    minutes = int(row.progress_minutes or 0) + int(total_seconds // 60)
+    status = "completed" if minutes >= int(row.goal_value or 0) else "in_progress"
+    return minutes, int(total_seconds % 60), status
+
+
+def apply_delta(db: Session, row: Quest, delta_seconds: int) -> int:
+    """Add seconds to the quest progress and return the applied delta (0 if it was already completed).
+
+    One UPDATE computes the new progress from the stored values, so writers
+    holding an older copy of row (the write-behind flush, a session checkpoint)
+    cannot overwrite each other's time. row is updated to the stored result.
+    """
+    delta_seconds = max(0, int(delta_seconds))
+    total = func.coalesce(Quest.progress_seconds_remainder, 0) + delta_seconds
+    minutes = func.coalesce(Quest.progress_minutes, 0) + total // 60
+    stored = db.execute(
+        update(Quest)
+        .where(Quest.id == row.id, Quest.status != "completed")
+        .values(
+            progress_minutes=minutes,
+            progress_seconds_remainder=total % 60,
+            status=case((minutes >= Quest.goal_value, "completed"), else_="in_progress"),
+            updated_at=datetime.utcnow(),
+        )
+        .returning(Quest.progress_minutes, Quest.progress_seconds_remainder, Quest.status, Quest.updated_at)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if stored is None:
+        # completed (or archived) by another writer since row was read
+        db.expire(row, _PROGRESS_ATTRS)
+        return 0
+    for name, value in zip(_PROGRESS_ATTRS, stored):
+        set_committed_value(row, name, value)
+    return delta_seconds
+
+
+def write_timer_logs(db: Session, logs: List[Dict[str, Any]]) -> None:
+    """Bulk insert timer_logs rows ({user_id, quest_id, subject, delta_seconds}), upsert the
+    daily rollup and invalidate the planner cache, all in the caller's transaction."""
+    logs = [log for log in logs if int(log.get("delta_seconds") or 0) > 0]
+    if not logs:
+        return
+    db.execute(insert(TimerLog), logs)
+    add_to_rollup(db, logs)
+    invalidate_planner_cache(db, (log["user_id"] for log in logs))
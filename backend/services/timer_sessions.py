@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.db_models import Quest, TimerSession
+from .timer_service import apply_delta, project_progress, write_timer_logs
+
+
+ACTIVE_STATUSES = ("pending", "in_progress", "paused")
+
+
+def _seconds_to_goal(row: Quest) -> int:
+    done = int(row.progress_minutes or 0) * 60 + int(row.progress_seconds_remainder or 0)
+    return max(0, int(row.goal_value or 0) * 60 - done)
+
+
+def credit_limit(session: TimerSession) -> datetime:
+    """Latest instant the session can be credited up to: the client must keep polling to keep earning time."""
+    seen = session.last_seen_at or session.checkpoint_at
+    return seen + timedelta(seconds=settings.TIMER_SESSION_LIVENESS_SECONDS)
+
+
+def is_stale(session: TimerSession, now: datetime) -> bool:
+    # the page went away (closed tab, sleeping laptop) without stopping the timer
+    return now > credit_limit(session)
+
+
+def _uncredited_seconds(session: TimerSession, now: datetime) -> int:
+    until = min(now, credit_limit(session))
+    return max(0, int((until - session.checkpoint_at).total_seconds()))
+
+
+def live_progress(row: Quest, session: TimerSession, now: datetime) -> Tuple[int, int, str]:
+    """Progress including the running session, without writing anything."""
+    if row.status == "completed":
+        return int(row.progress_minutes or 0), int(row.progress_seconds_remainder or 0), row.status
+    seconds = min(_uncredited_seconds(session, now), _seconds_to_goal(row))
+    return project_progress(row, seconds)
+
+
+def is_due_for_completion(row: Quest, session: TimerSession, now: datetime) -> bool:
+    return row.status != "completed" and _uncredited_seconds(session, now) >= _seconds_to_goal(row)
+
+
+def checkpoint_session(
+    db: Session,
+    session: TimerSession,
+    until: datetime,
+    logs: List[Dict[str, Any]],
+) -> Optional[Quest]:
+    """Credit the session's uncredited time (up to `until`) to its quest.
+
+    Credit stops at the quest goal and at credit_limit(session). A completed quest ends the session and is
+    left for the reaper like on the heartbeat path. Returns the quest row, or
+    None when the quest no longer exists.
+    """
+    row = db.get(Quest, session.quest_id)
+    if row is None:
+        db.delete(session)
+        return None
+    elapsed = _uncredited_seconds(session, until)
+    if elapsed > 0 and row.status != "completed":
+        applied = apply_delta(db, row, min(elapsed, _seconds_to_goal(row)))
+        if applied > 0:
+            logs.append(
+                {
+                    "user_id": session.user_id,
+                    "quest_id": row.id,
+                    "subject": row.subject,
+                    "delta_seconds": applied,
+                }
+            )
+    if elapsed > 0:
+        session.checkpoint_at = session.checkpoint_at + timedelta(seconds=elapsed)
+    if row.status == "completed":
+        # the quest itself is archived later by the reaper
+        db.delete(session)
+    return row
+
+
+def end_session(db: Session, session: TimerSession, until: datetime, logs: List[Dict[str, Any]]) -> Optional[Quest]:
+    """Checkpoint, then close the session and pause its quest."""
+    row = checkpoint_session(db, session, until, logs)
+    if row is not None and row.status != "completed":
+        row.status = "paused"
+        db.delete(session)
+    return row
+
+
+def start_session(db: Session, row: Quest, kind: str, now: datetime) -> TimerSession:
+    """Open (or keep) the user's `kind` session on row; any other session of that kind is ended."""
+    logs: List[Dict[str, Any]] = []
+    current: Optional[TimerSession] = None
+    sessions = db.query(TimerSession).filter(TimerSession.user_id == row.user_id).all()
+    for session in sessions:
+        if session.quest_id == row.id and not is_stale(session, now):
+            # one clock per quest, whichever timer started it
+            current = session
+        elif session.kind == kind or session.quest_id == row.id:
+            # a stale session on this quest is closed (credited up to its limit) and started afresh
+            end_session(db, session, now, logs)
+    if current is None:
+        current = TimerSession(
+            user_id=row.user_id,
+            kind=kind,
+            quest_id=row.id,
+            subject=row.subject,
+            started_at=now,
+            checkpoint_at=now,
+            last_seen_at=now,
+        )
+        db.add(current)
+    current.last_seen_at = now
+    if row.status in ACTIVE_STATUSES and row.status != "in_progress":
+        row.status = "in_progress"
+        row.updated_at = now
+    write_timer_logs(db, logs)
+    db.flush()
+    return current
+
+
+def sweep_sessions(session_factory: Callable[[], Session]) -> int:
+    """Periodic checkpoint of every open session in one transaction; stale sessions are closed."""
+    db = session_factory()
+    try:
+        now = datetime.utcnow()
+        logs: List[Dict[str, Any]] = []
+        sessions = db.query(TimerSession).all()
+        for session in sessions:
+            if is_stale(session, now):
+                end_session(db, session, now, logs)
+            else:
+                checkpoint_session(db, session, now, logs)
+        write_timer_logs(db, logs)
+        db.commit()
+        return len(sessions)
+    finally:
+        db.close()
+
+
+def reconcile_sessions(db: Session, *, checkpoint_interval: int, resume_grace: int) -> None:
+    """Startup reconciliation of sessions left open by the previous process.
+
+    Sessions checkpointed within `resume_grace` seconds survive a quick restart
+    (e.g. --reload) and keep running. Older ones are closed, crediting at most
+    one checkpoint interval past their last checkpoint since the downtime
+    cannot be vouched for. Time quests still marked in_progress without a
+    session are paused.
+    """
+    now = datetime.utcnow()
+    logs: List[Dict[str, Any]] = []
+    live_quests = set()
+    for session in db.query(TimerSession).all():
+        if (now - session.checkpoint_at).total_seconds() <= resume_grace:
+            live_quests.add(session.quest_id)
+            continue
+        until = min(now, session.checkpoint_at + timedelta(seconds=checkpoint_interval))
+        end_session(db, session, until, logs)
+    write_timer_logs(db, logs)
+    query = db.query(Quest).filter(Quest.type == "time", Quest.status == "in_progress")
+    if live_quests:
+        query = query.filter(Quest.id.notin_(live_quests))
+    query.update({"status": "paused"}, synchronize_session=False)
+    db.commit()
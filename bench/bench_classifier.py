@@ -0,0 +1,145 @@
+"""Accuracy and latency of the local subject/difficulty classifier.
+
+    python -m bench.bench_classifier [--db backend/app.db | --samples 3000] [--threshold 0.85] [--json out.json]
+
+Trains on 80% of the labelled question_logs (from --db) or of a synthetic
+class-room style corpus, then reports on the held-out 20%: accuracy of the
+local model vs the keyword heuristic, how many questions clear the confidence
+threshold (i.e. skip the remote classifier) and how accurate those are, and
+per-question prediction latency. The synthetic corpus is templated, so its
+numbers are an upper bound; run with --db on real logs for a fair figure.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.services.ai_service import _heuristic_subject_and_difficulty
+from backend.services.local_classifier import (
+    NaiveBayesModel,
+    extract_features,
+    train_models,
+    training_rows,
+)
+
+Row = Tuple[str, str, str]
+
+_TOPICS = {
+    "수학": ["미분", "적분", "이차방정식", "삼각함수", "수열의 합", "확률", "로그", "극한", "벡터", "함수의 그래프"],
+    "영어": ["관계대명사", "가정법", "to부정사", "분사구문", "수동태", "빈칸 추론", "vocabulary", "reading passage", "listening", "영작"],
+    "국어": ["비문학 지문", "현대시 화자", "고전소설", "맞춤법", "음운 변동", "문장 성분", "수필 주제", "설명문 구조", "논증 방식", "어휘 의미"],
+}
+_EXTRA = {
+    "수학": ["x^2 - 3x + 2 = 0 풀이", "f(x)=ln x 의 도함수", "lim x→0 sin x / x", "등비수열 공비 구하기"],
+    "영어": ["What does 'serene' mean?", "Which is correct: 'has gone' or 'had gone'?", "이 문장 해석해줘: I wish I had studied harder.", "The passage implies that..."],
+    "국어": ["'되'와 '돼' 구분", "이 시에서 반어법이 쓰인 부분", "윗글의 중심 내용 요약", "인물의 심리 변화"],
+}
+_BY_DIFFICULTY = {
+    "easy": ["{t} 뜻이 뭐야?", "{t} 기초 개념 알려줘", "{t} 쉽게 설명해줘", "{t} 간단한 예시"],
+    "medium": ["{t} 문제 어떻게 풀어?", "{t} 관련 문제 풀이 과정 설명해줘", "{t} 헷갈리는데 정리해줘", "{t}: {e}"],
+    "hard": [
+        "{t} 증명 과정이 복잡해서 이해가 안 돼요. {e} 단계마다 왜 그렇게 되는지 자세히 설명해 주세요.",
+        "킬러 문항 {t}: {e} 여러 조건을 동시에 써야 하는데 어디서부터 접근해야 할지 모르겠어요.",
+        "{t} 심화 응용 문제인데 {e} 풀이가 너무 어려움. 다른 풀이 방법도 알려주세요.",
+    ],
+}
+
+
+def synthetic_rows(samples: int, seed: int) -> List[Row]:
+    rng = random.Random(seed)
+    rows: List[Row] = []
+    for _ in range(samples):
+        subject = rng.choice(list(_TOPICS))
+        difficulty = rng.choices(["easy", "medium", "hard"], weights=[3, 5, 2])[0]
+        template = rng.choice(_BY_DIFFICULTY[difficulty])
+        rows.append((template.format(t=rng.choice(_TOPICS[subject]), e=rng.choice(_EXTRA[subject])), subject, difficulty))
+    return rows
+
+
+def db_rows(path: str) -> List[Row]:
+    engine = create_engine(f"sqlite:///{path}")
+    db = sessionmaker(bind=engine)()
+    try:
+        return training_rows(db)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def evaluate(rows: List[Row], threshold: float, seed: int) -> Dict:
+    rows = list(rows)
+    random.Random(seed).shuffle(rows)
+    cut = max(1, int(len(rows) * 0.8))
+    train, test = rows[:cut], rows[cut:]
+
+    started = time.perf_counter()
+    data = train_models(train)
+    train_seconds = time.perf_counter() - started
+    subject_model = NaiveBayesModel.from_dict(data["subject"])
+    difficulty_model = NaiveBayesModel.from_dict(data["difficulty"])
+
+    latencies: List[float] = []
+    local_subject = local_difficulty = heur_subject = heur_difficulty = 0
+    confident = confident_correct = 0
+    for text, subject, difficulty in test:
+        t0 = time.perf_counter()
+        features = extract_features(text)
+        pred_subject, subject_conf = subject_model.predict(features)
+        pred_difficulty, difficulty_conf = difficulty_model.predict(features)
+        latencies.append(time.perf_counter() - t0)
+        local_subject += pred_subject == subject
+        local_difficulty += pred_difficulty == difficulty
+        h_subject, h_difficulty, _tier = _heuristic_subject_and_difficulty(text)
+        heur_subject += h_subject == subject
+        heur_difficulty += h_difficulty == difficulty
+        if subject_conf >= threshold and difficulty_conf >= threshold:
+            confident += 1
+            confident_correct += pred_subject == subject and pred_difficulty == difficulty
+
+    n = max(1, len(test))
+    latencies.sort()
+    return {
+        "train_samples": len(train),
+        "test_samples": len(test),
+        "train_seconds": round(train_seconds, 3),
+        "model_bytes": len(json.dumps(data, ensure_ascii=False).encode("utf-8")),
+        "subject_accuracy": round(local_subject / n, 4),
+        "difficulty_accuracy": round(local_difficulty / n, 4),
+        "heuristic_subject_accuracy": round(heur_subject / n, 4),
+        "heuristic_difficulty_accuracy": round(heur_difficulty / n, 4),
+        "threshold": threshold,
+        "remote_calls_skipped": round(confident / n, 4),
+        "accuracy_when_skipped": round(confident_correct / confident, 4) if confident else None,
+        "predict_us_p50": round(statistics.median(latencies) * 1e6, 1) if latencies else None,
+        "predict_us_p99": round(latencies[int(len(latencies) * 0.99) - 1] * 1e6, 1) if latencies else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="SQLite file whose question_logs are the corpus (default: synthetic)")
+    parser.add_argument("--samples", type=int, default=3000, help="synthetic corpus size")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the result to this file")
+    args = parser.parse_args()
+
+    rows = db_rows(args.db) if args.db else synthetic_rows(args.samples, args.seed)
+    if len(rows) < 10:
+        raise SystemExit(f"only {len(rows)} labelled questions; need at least 10")
+    result = {"corpus": args.db or f"synthetic:{args.samples}", **evaluate(rows, args.threshold, args.seed)}
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
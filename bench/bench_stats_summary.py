@@ -0,0 +1,152 @@
+"""Latency of /stats/summary against timer_logs of increasing size.
+
+    python -m bench.bench_stats_summary [--rows 10000 100000 1000000] [--days 30] [--json out.json]
+
+Builds a throwaway SQLite file per size, fills timer_logs for one heavy user
+(plus background users), and times the rollup-backed summary (default tz),
+the single-pass raw-log aggregation (any other tz) and the previous per-day
+loop implementation.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import db_models  # noqa: F401 register tables
+from backend.models.db_models import Quest, TimerLog, User
+from backend.routes.stats_routes import summary
+from backend.constants import DAY_RESET_TIMEZONE, SUBJECTS
+from backend.services.rollup_service import backfill_rollup
+
+USER_ID = "bench_user"
+
+
+def _legacy_summary(db, user_id: str, days: int) -> dict:
+    """The pre-rewrite implementation: one grouped query for totals plus one per day."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    subject_expr = func.coalesce(TimerLog.subject, Quest.subject)
+    rows = (
+        db.query(subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
+        .outerjoin(Quest, Quest.id == TimerLog.quest_id)
+        .filter(TimerLog.user_id == user_id, TimerLog.created_at >= cutoff)
+        .group_by(subject_expr)
+        .all()
+    )
+    totals = {subj: int((sec or 0) // 60) for subj, sec in rows}
+    daily = []
+    for i in range(days):
+        d = (datetime.utcnow() - timedelta(days=(days - 1 - i))).date()
+        day_start = datetime.combine(d, datetime.min.time())
+        day_rows = (
+            db.query(subject_expr.label("subject"), func.sum(TimerLog.delta_seconds))
+            .outerjoin(Quest, Quest.id == TimerLog.quest_id)
+            .filter(
+                TimerLog.user_id == user_id,
+                TimerLog.created_at >= day_start,
+                TimerLog.created_at < day_start + timedelta(days=1),
+            )
+            .group_by(subject_expr)
+            .all()
+        )
+        daily.append({subj: int((sec or 0) // 60) for subj, sec in day_rows})
+    return {"totals": totals, "daily": daily}
+
+
+def _populate(session_factory, rows: int, users: int = 50, history_days: int = 120) -> None:
+    rng = random.Random(rows)
+    db = session_factory()
+    try:
+        user_ids = [USER_ID] + [f"bg_{i}" for i in range(users - 1)]
+        db.execute(insert(User), [{"id": uid, "display_name": uid} for uid in user_ids])
+        quests = []
+        for uid in user_ids:
+            for subj in SUBJECTS:
+                quests.append(
+                    {"id": f"{uid}_{subj}", "user_id": uid, "title": subj, "subject": subj, "goal_value": 50}
+                )
+        db.execute(insert(Quest), quests)
+        now = datetime.utcnow()
+        chunk = []
+        for i in range(rows):
+            # the measured user owns ~20% of all rows
+            uid = USER_ID if rng.random() < 0.2 else rng.choice(user_ids)
+            subj = rng.choice(SUBJECTS)
+            chunk.append(
+                {
+                    "user_id": uid,
+                    "quest_id": f"{uid}_{subj}",
+                    "subject": subj,
+                    "delta_seconds": 5,
+                    "created_at": now - timedelta(seconds=rng.randint(0, history_days * 86400)),
+                }
+            )
+            if len(chunk) >= 50000:
+                db.execute(insert(TimerLog), chunk)
+                chunk = []
+        if chunk:
+            db.execute(insert(TimerLog), chunk)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2)}
+
+
+def run(row_counts, days: int, repeat: int) -> list[dict]:
+    results = []
+    for rows in row_counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp, 'bench.db').as_posix()}")
+            Base.metadata.create_all(bind=engine)
+            factory = sessionmaker(bind=engine, autoflush=False)
+            _populate(factory, rows)
+            db = factory()
+            try:
+                backfill_rollup(db)
+                rollup = _time(lambda: summary(user_id=USER_ID, days=days, tz=DAY_RESET_TIMEZONE, db=db), repeat)
+                # a zone other than the rollup's forces the raw timer_logs aggregation
+                single = _time(lambda: summary(user_id=USER_ID, days=days, tz="UTC", db=db), repeat)
+                legacy = _time(lambda: _legacy_summary(db, USER_ID, days), repeat)
+            finally:
+                db.close()
+                engine.dispose()
+        result = {"rows": rows, "days": days, "rollup": rollup, "single_pass": single, "per_day_loop": legacy}
+        results.append(result)
+        print(
+            f"{rows:>9} rows  rollup {rollup['median_ms']:>8.2f} ms  single-pass {single['median_ms']:>9.2f} ms  "
+            f"per-day loop {legacy['median_ms']:>9.2f} ms"
+        )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", type=Path, default=None, help="write results as JSON")
+    args = parser.parse_args()
+    results = run(args.rows, args.days, args.repeat)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
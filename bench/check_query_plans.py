@@ -0,0 +1,200 @@
+"""Assert that the hot read paths use indexes instead of full table scans.
+
+    python -m bench.check_query_plans [-v]
+
+Runs the real timer/quest/stats/planner code against a throwaway SQLite
+database built by create_all + the migration runner, captures every SELECT
+through SQLAlchemy engine events and checks its EXPLAIN QUERY PLAN. Exits
+non-zero when a hot table is scanned without an index.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.migrations import run_migrations
+from backend.models.db_models import Quest, QuestionLog, QuestResultLog, QuestTag, TimerLog, User
+from backend.models.schemas import (
+    Quest as QuestSchema,
+    QuestBulkCreateRequest,
+    QuestBulkPatchEntry,
+    QuestBulkPatchRequest,
+    TimerStartRequest,
+    TimerUpdateRequest,
+)
+from backend.constants import DEFAULT_SUBJECT_RATIO_JSON, SUBJECTS
+from backend.routes import quest_routes, stats_routes, timer_routes
+from backend.services import planner_service
+
+HOT_TABLES = {"quests", "timer_logs", "question_logs", "quest_result_logs", "timer_sessions", "daily_subject_minutes", "quest_tags", "question_keyword_counts", "quest_tombstones"}
+
+# Scans that are deliberate, keyed by the whitespace-normalized statement
+ALLOWED_SCANS: dict[str, str] = {}
+
+
+def _seed(factory) -> None:
+    rng = random.Random(7)
+    db = factory()
+    now = datetime.utcnow()
+    users = [f"user{i}" for i in range(40)]
+    db.execute(
+        insert(User),
+        [{"id": uid, "display_name": uid, "subject_ratio_json": DEFAULT_SUBJECT_RATIO_JSON} for uid in users],
+    )
+    quests, tags, logs, questions, results = [], [], [], [], []
+    for uid in users:
+        for subj in SUBJECTS:
+            qid = f"{uid}_{subj}"
+            quests.append(
+                {
+                    "id": qid,
+                    "user_id": uid,
+                    "type": "time",
+                    "title": f"{subj} 학습 50분",
+                    "subject": subj,
+                    "goal_value": 50,
+                    "status": rng.choice(["pending", "paused", "completed"]),
+                    "tags_json": '["study"]',
+                    "tags_ko_json": '["학습"]',
+                }
+            )
+            tags.append({"quest_id": qid, "lang": "en", "tag": "study", "position": 0})
+            tags.append({"quest_id": qid, "lang": "ko", "tag": "학습", "position": 0})
+            for _ in range(30):
+                created = now - timedelta(minutes=rng.randint(0, 60 * 24 * 40))
+                logs.append({"user_id": uid, "quest_id": qid, "subject": subj, "delta_seconds": 5, "created_at": created})
+                questions.append({"user_id": uid, "subject": subj, "text": "미분 문제 질문", "created_at": created})
+            results.append({"user_id": uid, "quest_id": qid, "subject": subj, "result": "success"})
+    db.execute(insert(Quest), quests)
+    db.execute(insert(QuestTag), tags)
+    db.execute(insert(TimerLog), logs)
+    db.execute(insert(QuestionLog), questions)
+    db.execute(insert(QuestResultLog), results)
+    db.commit()
+    db.close()
+
+
+def _exercise(factory) -> None:
+    db = factory()
+    try:
+        user = db.get(User, "user1")
+        timer_routes.timer_update(TimerUpdateRequest(user_id="user1", subject=SUBJECTS[0], delta_seconds=5), db)
+        timer_routes.timer_start(TimerStartRequest(user_id="user1", subject=SUBJECTS[1]), db)
+        timer_routes.timer_state(user_id="user1", db=db)
+        quest_routes.list_quests(user_id="user1", since=None, if_none_match=None, db=db)
+        delta = quest_routes.list_quests(user_id="user1", since="0", if_none_match=None, db=db)
+        cursor = json.loads(delta.body)["cursor"]
+        quest_routes.list_quests(user_id="user1", since=cursor, if_none_match=None, db=db)
+        quest_routes.create_quest(
+            QuestSchema(
+                id="plan_check_new",
+                user_id="user1",
+                title="수학 복습 25분",
+                subject=SUBJECTS[1],
+                goal_value=25,
+                tags=["review"],
+                tags_ko=["복습"],
+            ),
+            db,
+        )
+        quest_routes.create_quests_bulk(
+            QuestBulkCreateRequest(
+                entries=[
+                    QuestSchema(
+                        id="plan_check_bulk_1", user_id="user1", title="영어 듣기 20분", subject=SUBJECTS[2], goal_value=20
+                    ),
+                    QuestSchema(
+                        id="plan_check_bulk_2",
+                        user_id="user1",
+                        title="국어 학습 30분",
+                        subject=SUBJECTS[0],
+                        goal_value=30,
+                        tags=["study"],
+                    ),
+                ]
+            ),
+            db,
+        )
+        quest_routes.patch_quests_bulk(
+            QuestBulkPatchRequest(entries=[QuestBulkPatchEntry(id="plan_check_bulk_1", status="in_progress")]), db
+        )
+        stats_routes.summary(user_id="user1", days=30, tz=stats_routes.DAY_RESET_TIMEZONE, db=db)
+        stats_routes.summary(user_id="user1", days=30, tz="UTC", db=db)
+        context = planner_service.build_planner_context(db, user, user.id)
+        planner_service._baseline_suggestions(db, user.id, context)
+    finally:
+        db.close()
+
+
+def _violations(plan: List[Tuple], statement: str) -> List[str]:
+    bad = []
+    for row in plan:
+        detail = str(row[-1])
+        if not detail.startswith("SCAN "):
+            continue
+        table = detail.split()[1]
+        if table not in HOT_TABLES or "USING INDEX" in detail or "USING COVERING INDEX" in detail:
+            continue
+        if " ".join(statement.split()) in ALLOWED_SCANS:
+            continue
+        bad.append(detail)
+    return bad
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-v", "--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp, 'plans.db').as_posix()}")
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        factory = sessionmaker(bind=engine, autoflush=False)
+        _seed(factory)
+
+        captured: List[Tuple[str, tuple]] = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT") and not executemany:
+                captured.append((statement, tuple(parameters or ())))
+
+        _exercise(factory)
+        event.remove(engine, "before_cursor_execute", _capture)
+
+        failures = 0
+        seen = set()
+        raw = engine.raw_connection()
+        try:
+            for statement, params in captured:
+                if statement in seen:
+                    continue
+                seen.add(statement)
+                plan = raw.cursor().execute(f"EXPLAIN QUERY PLAN {statement}", params).fetchall()
+                bad = _violations(plan, statement)
+                if bad or args.verbose:
+                    print(("FULL SCAN " if bad else "ok        ") + " ".join(statement.split())[:160])
+                    for row in plan:
+                        print(f"    {row[-1]}")
+                failures += bool(bad)
+        finally:
+            raw.close()
+            engine.dispose()
+
+    print(f"{len(seen)} distinct SELECT statements checked, {failures} with full scans of hot tables")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+"""Regression checks for quest id reuse and completion paths.
+
+    python -m bench.check_quest_lifecycle
+
+Runs the real app through TestClient against a throwaway SQLite database
+(DATABASE_URL) with the built-in fallback problems (no OpenAI key). Each
+check replays a request sequence that once failed; exits non-zero when any
+of them does.
+"""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable, List, Optional
+
+USER_ID = "u1"
+
+
+def _answer_then_new_problem(client) -> Optional[str]:
+    # the answered quest stays until the reaper runs, so the next id (same second) must not collide
+    problem = client.post(f"/ai/quests/ai_problem?user_id={USER_ID}&subject=수학").json()
+    answer = problem["meta"]["correct_answers"][0]
+    client.post(f"/quests/{problem['id']}/answer", json={"user_id": USER_ID, "answer": answer})
+    again = client.post(f"/ai/quests/ai_problem?user_id={USER_ID}&subject=수학")
+    if again.status_code != 200:
+        return f"new problem after a correct answer -> {again.status_code}"
+    return None
+
+
+def _completing_heartbeats(client) -> Optional[str]:
+    # each update completes the auto study quest; the next one (same second) creates a fresh one
+    for attempt in range(2):
+        response = client.post("/timer/update", json={"user_id": USER_ID, "subject": "국어", "delta_seconds": 4000})
+        if response.status_code != 200:
+            return f"completing heartbeat #{attempt + 1} -> {response.status_code}"
+    return None
+
+
+def _batch_completing_heartbeats(client) -> Optional[str]:
+    # a batch must credit like the same entries sent one by one: the second entry goes to a new auto quest
+    entry = {"user_id": USER_ID, "subject": "영어", "delta_seconds": 4000}
+    response = client.post("/timer/update_batch", json={"entries": [entry, entry]})
+    if response.status_code != 200:
+        return f"batch -> {response.status_code}"
+    results = response.json()["results"]
+    if not all(result["ok"] for result in results):
+        return f"batch entries failed: {results}"
+    credited = client.get(f"/stats/summary?user_id={USER_ID}").json()["totals_by_subject"]["영어"]
+    if credited < 2 * 4000 // 60:
+        return f"batch of 2 x 4000 s credited only {credited} min"
+    return None
+
+
+CHECKS: List[Callable] = [_answer_then_new_problem, _completing_heartbeats, _batch_completing_heartbeats]
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        # must be set before the first backend import: the engine and settings are built at import time
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp, 'lifecycle.db').as_posix()}"
+        os.environ["OPENAI_API_KEY"] = ""
+        os.environ["AI_PROBLEM_POOL_WATERMARK"] = "0"
+
+        from fastapi.testclient import TestClient
+
+        from backend.app import app
+
+        failures = 0
+        with TestClient(app, raise_server_exceptions=False) as client:
+            for check in CHECKS:
+                client.post("/admin/reset_all")
+                problem = check(client)
+                print(("FAIL " if problem else "ok   ") + check.__name__.lstrip("_") + (f": {problem}" if problem else ""))
+                failures += bool(problem)
+    print(f"{len(CHECKS)} checks, {failures} failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""Classroom load test: N simulated students against the real app, in-process.
+
+    python -m bench.classroom [--students 30] [--duration 60] [--speed 1] [--timer-mode heartbeat|session]
+                              [--ai-latency 0.8] [--json out.json] [--compare previous.json]
+
+Starts the FastAPI app under uvicorn on a background thread, backed by a
+throwaway SQLite file (DATABASE_URL) and the local fake OpenAI server, then
+runs every student as a set of periodic loops modelled on the frontend:
+
+    timer      heartbeat: POST /timer/update every 5 s (delta 5 s)
+               session:   POST /timer/start once, GET /timer/state every 30 s (timer.js), POST /timer/stop at the end
+    quests     GET /quests on load and every 30 s (quest-refresh)
+    stats      GET /stats/summary every 60 s
+    chat       POST /ai/chat/stream every 120 s (aiButton.js)
+    planner    GET /ai/planner/suggest every 180 s
+    problem    POST /ai/quests/ai_problem every 180 s, answered 20 s later (quest.js)
+
+`--speed 10` runs the same schedule ten times faster. Loops start at a
+random phase so the class does not fire in lockstep. Reports throughput and
+p50/p95/p99 per route; `--json` writes the same report for comparing commits
+and `--compare` prints the p95 change against an earlier report.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+SUBJECTS = ["국어", "수학", "영어"]
+QUESTIONS = {
+    "국어": ["비문학 요약 방법", "고전시가 화자의 정서", "문법 음운 변동 정리"],
+    "수학": ["미분 계산 연습", "함수 그래프 개념", "적분 문제풀이 방법"],
+    "영어": ["grammar tense 정리", "독해 빈칸 추론", "듣기 listening 연습"],
+}
+# seconds between actions in real classroom time (divided by --speed)
+INTERVALS = {
+    "heartbeat": 5.0,
+    "timer_state": 30.0,
+    "quests": 30.0,
+    "stats": 60.0,
+    "chat": 120.0,
+    "planner": 180.0,
+    "problem": 180.0,
+}
+ANSWER_THINK_SECONDS = 20.0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    # nearest rank on an already sorted list
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs: Any) -> Optional[httpx.Response]:
+        """Time one request under its route template; transport errors count as status 0."""
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            # streaming answers are timed to the last byte, like the chat panel sees them
+            await response.aread()
+            status = response.status_code
+        except httpx.HTTPError:
+            response, status = None, 0
+        self.samples[route].append((time.perf_counter() - started) * 1000)
+        self.statuses[route][status] += 1
+        if status == 0 or status >= 400:
+            self.errors[route] += 1
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        routes: Dict[str, Any] = {}
+        for route in sorted(self.samples):
+            ordered = sorted(self.samples[route])
+            routes[route] = {
+                "count": len(ordered),
+                "errors": self.errors[route],
+                "statuses": {str(code): n for code, n in sorted(self.statuses[route].items())},
+                "rps": round(len(ordered) / elapsed, 2),
+                "mean_ms": round(sum(ordered) / len(ordered), 2),
+                "p50_ms": round(_percentile(ordered, 50), 2),
+                "p95_ms": round(_percentile(ordered, 95), 2),
+                "p99_ms": round(_percentile(ordered, 99), 2),
+                "max_ms": round(ordered[-1], 2),
+            }
+        total = sum(item["count"] for item in routes.values())
+        return {
+            "requests": total,
+            "errors": sum(item["errors"] for item in routes.values()),
+            "throughput_rps": round(total / elapsed, 2),
+            "routes": routes,
+        }
+
+
+class Student:
+    def __init__(self, user_id: str, client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace, rng: random.Random) -> None:
+        self.user_id = user_id
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.rng = rng
+        self.subject = rng.choice(SUBJECTS)
+
+    async def _every(self, interval: float, deadline: float, action) -> None:
+        interval /= self.args.speed
+        next_at = time.monotonic() + self.rng.uniform(0, interval)
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            await action()
+            next_at += interval
+
+    async def heartbeat(self) -> None:
+        body = {"user_id": self.user_id, "subject": self.subject, "delta_seconds": int(INTERVALS["heartbeat"])}
+        await self.recorder.call(self.client, "POST /timer/update", "POST", "/timer/update", json=body)
+
+    async def timer_state(self) -> None:
+        await self.recorder.call(self.client, "GET /timer/state", "GET", "/timer/state", params={"user_id": self.user_id})
+
+    async def quests(self) -> None:
+        await self.recorder.call(self.client, "GET /quests", "GET", "/quests", params={"user_id": self.user_id})
+
+    async def stats(self) -> None:
+        await self.recorder.call(self.client, "GET /stats/summary", "GET", "/stats/summary", params={"user_id": self.user_id, "days": 7})
+
+    async def chat(self) -> None:
+        subject = self.rng.choice(SUBJECTS)
+        body = {"user_id": self.user_id, "text": self.rng.choice(QUESTIONS[subject]), "subject": subject}
+        await self.recorder.call(self.client, "POST /ai/chat/stream", "POST", "/ai/chat/stream", json=body)
+
+    async def planner(self) -> None:
+        await self.recorder.call(self.client, "GET /ai/planner/suggest", "GET", "/ai/planner/suggest", params={"user_id": self.user_id})
+
+    async def problem(self) -> None:
+        params = {"user_id": self.user_id, "subject": self.rng.choice(SUBJECTS)}
+        response = await self.recorder.call(self.client, "POST /ai/quests/ai_problem", "POST", "/ai/quests/ai_problem", params=params)
+        if response is None or response.status_code != 200:
+            return
+        quest = response.json()
+        answers = (quest.get("meta") or {}).get("correct_answers") or ["?"]
+        await asyncio.sleep(ANSWER_THINK_SECONDS / self.args.speed)
+        # roughly a third of the class gets it wrong first
+        answer = answers[0] if self.rng.random() > 0.3 else "모르겠음"
+        body = {"user_id": self.user_id, "answer": str(answer)}
+        await self.recorder.call(self.client, "POST /quests/{id}/answer", "POST", f"/quests/{quest['id']}/answer", json=body)
+
+    async def run(self, deadline: float) -> None:
+        await self.quests()
+        loops = [
+            self._every(INTERVALS["quests"], deadline, self.quests),
+            self._every(INTERVALS["stats"], deadline, self.stats),
+            self._every(INTERVALS["chat"], deadline, self.chat),
+            self._every(INTERVALS["planner"], deadline, self.planner),
+            self._every(INTERVALS["problem"], deadline, self.problem),
+        ]
+        if self.args.timer_mode == "session":
+            body = {"user_id": self.user_id, "subject": self.subject}
+            await self.recorder.call(self.client, "POST /timer/start", "POST", "/timer/start", json=body)
+            loops.append(self._every(INTERVALS["timer_state"], deadline, self.timer_state))
+        else:
+            loops.append(self._every(INTERVALS["heartbeat"], deadline, self.heartbeat))
+        await asyncio.gather(*loops)
+        if self.args.timer_mode == "session":
+            body = {"user_id": self.user_id, "kind": "global"}
+            await self.recorder.call(self.client, "POST /timer/stop", "POST", "/timer/stop", json=body)
+
+
+def _create_students(count: int) -> List[str]:
+    from backend.constants import DEFAULT_SUBJECT_RATIO_JSON
+    from backend.database import SessionLocal
+    from backend.models.db_models import User
+
+    user_ids = [f"student_{i:03d}" for i in range(count)]
+    db = SessionLocal()
+    try:
+        for user_id in user_ids:
+            if db.get(User, user_id) is None:
+                db.add(User(id=user_id, display_name=user_id, daily_minutes_goal=90, subject_ratio_json=DEFAULT_SUBJECT_RATIO_JSON))
+        db.commit()
+    finally:
+        db.close()
+    return user_ids
+
+
+async def _drive(base_url: str, user_ids: List[str], args: argparse.Namespace) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=max(10, len(user_ids) * 2), max_keepalive_connections=max(10, len(user_ids) * 2))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        students = [Student(user_id, client, recorder, args, random.Random(rng.random())) for user_id in user_ids]
+        started = time.monotonic()
+        await asyncio.gather(*(student.run(started + args.duration) for student in students))
+        elapsed = time.monotonic() - started
+    return recorder, elapsed
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        # must be set before the first backend import: the engine and settings are built at import time
+        os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp, 'classroom.db').as_posix()}"
+        from bench.fake_openai import serve_in_thread
+
+        fake = serve_in_thread(latency=args.ai_latency, jitter=args.ai_latency / 4)
+        os.environ["OPENAI_API_KEY"] = "classroom-bench"
+        os.environ["OPENAI_BASE_URL"] = fake.base_url
+
+        import uvicorn
+
+        from backend.app import app
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, name="classroom-app", daemon=True)
+        thread.start()
+        while not server.started:
+            if not thread.is_alive():
+                raise SystemExit("app failed to start")
+            time.sleep(0.05)
+        try:
+            user_ids = _create_students(args.students)
+            recorder, elapsed = asyncio.run(_drive(f"http://127.0.0.1:{port}", user_ids, args))
+        finally:
+            server.should_exit = True
+            thread.join(30)
+            fake.shutdown()
+            fake.server_close()
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": {
+            "students": args.students,
+            "duration_seconds": args.duration,
+            "speed": args.speed,
+            "timer_mode": args.timer_mode,
+            "ai_latency_seconds": args.ai_latency,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "fake_openai_requests": fake.requests,
+        **recorder.report(elapsed),
+    }
+
+
+def _print_report(report: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> None:
+    config = report["config"]
+    print(
+        f"{config['students']} students, {report['elapsed_seconds']} s, speed x{config['speed']}, timer {config['timer_mode']}: "
+        f"{report['requests']} requests, {report['throughput_rps']} req/s, {report['errors']} errors, "
+        f"{report['fake_openai_requests']} upstream AI calls"
+    )
+    header = f"{'route':<28} {'count':>6} {'err':>4} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    if previous:
+        header += f"  p95 vs {previous.get('commit') or 'previous'}"
+    print(header)
+    for route, item in report["routes"].items():
+        line = (
+            f"{route:<28} {item['count']:>6} {item['errors']:>4} {item['rps']:>7.2f} {item['p50_ms']:>8.1f} "
+            f"{item['p95_ms']:>8.1f} {item['p99_ms']:>8.1f} {item['max_ms']:>8.1f}"
+        )
+        before = (previous or {}).get("routes", {}).get(route)
+        if before and before["p95_ms"]:
+            line += f"  {(item['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=60.0, help="wall-clock seconds to run")
+    parser.add_argument("--speed", type=float, default=1.0, help="compress the classroom schedule by this factor")
+    parser.add_argument("--timer-mode", choices=["heartbeat", "session"], default="heartbeat")
+    parser.add_argument("--ai-latency", type=float, default=0.8, help="fake OpenAI seconds to first token")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", type=Path, default=None, help="write the report as JSON")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier --json report to compare p95 against")
+    args = parser.parse_args()
+    if args.speed <= 0 or args.students <= 0:
+        parser.error("--speed and --students must be positive")
+    previous = json.loads(args.compare.read_text(encoding="utf-8")) if args.compare else None
+    report = run(args)
+    _print_report(report, previous)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
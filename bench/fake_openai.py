@@ -0,0 +1,200 @@
+"""Local OpenAI-compatible server for load tests and manual checks.
+
+    python -m bench.fake_openai [--port 8999] [--latency 0.8] [--jitter 0.2] [--chunk-delay 0.02]
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8999/v1 and any
+non-empty OPENAI_API_KEY. POST /v1/chat/completions answers with a canned
+payload matching the caller's system prompt (classifier, planner, problem
+generator or tutor), so every AI path parses it. `latency` is the time to the
+first token and each further chunk costs `chunk-delay`; with "stream": true
+the chunks are sent as SSE like the real API.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple
+
+
+def _canned_content(messages: List[Dict[str, Any]]) -> str:
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    if '"problems"' in system:
+        # batch problem generation: N copies of the single-problem answer, numbered
+        user = next((m.get("content") or "" for m in messages if m.get("role") == "user"), "")
+        match = re.search(r"(\d+)개", user)
+        item = json.loads(_canned_content([{"role": "system", "content": system.split('"problems"')[0]}]))
+        problems = [{**item, "title_suffix": f"{item['title_suffix']} {i + 1}"} for i in range(int(match.group(1)) if match else 1)]
+        return json.dumps({"problems": problems}, ensure_ascii=False)
+    if "난이도(easy/medium/hard)" in system:
+        return json.dumps({"subject": "수학", "difficulty": "medium", "tier": "mini"}, ensure_ascii=False)
+    if "학습 스케줄러" in system:
+        return json.dumps(
+            {
+                "recommendations": [
+                    {"subject": "수학", "title": "수학 복습 25분", "minutes": 25, "primary_tag_ko": "복습", "primary_tag_en": "review"}
+                ],
+                "notes": ["fake planner"],
+            },
+            ensure_ascii=False,
+        )
+    if "단어 테스트" in system:
+        return json.dumps(
+            {
+                "title_suffix": "단어 테스트",
+                "difficulty": "medium",
+                "question": "단어 'brisk'의 뜻을 한국어로 입력하세요.",
+                "correct_answers": ["활발한", "상쾌한"],
+                "explanation": "brisk = 활발한, 상쾌한",
+            },
+            ensure_ascii=False,
+        )
+    if "수학 계산 문제" in system:
+        return json.dumps(
+            {
+                "title_suffix": "계산",
+                "difficulty": "medium",
+                "question": "12 × 13 의 값을 입력하세요.",
+                "correct_answers": ["156"],
+                "explanation": "12 × 13 = 156",
+            },
+            ensure_ascii=False,
+        )
+    return "1단계: 개념을 정리합니다.\n2단계: 예시를 풉니다.\n확인 질문: 핵심 개념을 한 문장으로 설명해 볼까요?"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeOpenAIServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt: str, *args: Any) -> None:  # keep load-test output clean
+        return
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        self.server.record_request()
+        content = _canned_content(request.get("messages") or [])
+        chunks = [content[i : i + 4] for i in range(0, len(content), 4)]
+        time.sleep(self.server.delay())
+        if request.get("stream"):
+            self._stream(request, chunks)
+            return
+        time.sleep(self.server.chunk_delay * len(chunks))
+        self._send_json(
+            200,
+            {
+                "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+                ],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            },
+        )
+
+    def _stream(self, request: Dict[str, Any], chunks: List[str]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {
+            "id": f"chatcmpl-fake-{random.getrandbits(32):08x}",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+        }
+        for index, piece in enumerate(chunks):
+            if index:
+                time.sleep(self.server.chunk_delay)
+            frame = {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(frame, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        frame = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self.wfile.write(f"data: {json.dumps(frame)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], *, latency: float, jitter: float, chunk_delay: float = 0.02) -> None:
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # clients abandoning slow calls (latency budgets) are expected here
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+def serve_in_thread(
+    port: int = 0, *, latency: float = 0.5, jitter: float = 0.0, chunk_delay: float = 0.02
+) -> FakeOpenAIServer:
+    """Start the fake server on a daemon thread; call .shutdown() when done."""
+    server = FakeOpenAIServer(("127.0.0.1", port), latency=latency, jitter=jitter, chunk_delay=chunk_delay)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.8, help="seconds to the first token")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- seconds of random latency")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="seconds between streamed chunks")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(
+        ("127.0.0.1", args.port), latency=args.latency, jitter=args.jitter, chunk_delay=args.chunk_delay
+    )
+    print(f"fake OpenAI listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
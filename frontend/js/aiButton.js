@@ -1,4 +1,4 @@
-import { api } from './api.js';
+import { api, API_BASE } from './api.js';
 import { getUserId } from './session.js';
 
 const btn = document.getElementById('ai-btn');
@@ -14,16 +14,75 @@ btn.addEventListener('click', () => {
 
 closeBtn.addEventListener('click', () => modal.classList.add('hidden'));
 
+// Parse one SSE frame ("event: x\ndata: {...}") into { event, data }
+function parseFrame(frame) {
+  let event = 'message';
+  const dataLines = [];
+  for (const line of frame.split('\n')) {
+    if (line.startsWith('event:')) event = line.slice(6).trim();
+    else if (line.startsWith('data:')) dataLines.push(line.slice(5).trimStart());
+  }
+  if (!dataLines.length) return null; // comment / keep-alive
+  try {
+    return { event, data: JSON.parse(dataLines.join('\n')) };
+  } catch (error) {
+    return null;
+  }
+}
+
+// Streams the answer into answerBox; state.received counts the frames shown so far
+async function streamChat(body, state) {
+  const res = await fetch(`${API_BASE}/ai/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body),
+  });
+  if (!res.ok || !res.body) throw new Error(`stream failed: ${res.status}`);
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let cut;
+    while ((cut = buffer.indexOf('\n\n')) >= 0) {
+      const parsed = parseFrame(buffer.slice(0, cut));
+      buffer = buffer.slice(cut + 2);
+      if (!parsed) continue;
+      if (parsed.event === 'message' && parsed.data.delta) {
+        if (state.received === 0) answerBox.textContent = '';
+        answerBox.textContent += parsed.data.delta;
+        state.received += 1;
+      } else if (parsed.event === 'error') {
+        answerBox.textContent = (state.received ? answerBox.textContent + '\n' : '') + parsed.data.message;
+        state.received += 1;
+      }
+    }
+  }
+}
+
 sendBtn.addEventListener('click', async () => {
   const text = document.getElementById('ai-question').value.trim();
   const subject = document.getElementById('ai-subject').value;
   if (!text) return;
+  const body = { user_id: getUserId(), subject, text };
+  answerBox.textContent = '생각 중...';
+  const state = { received: 0 };
   try {
-    answerBox.textContent = '생각 중...';
-    const response = await api.post('/ai/chat', { user_id: getUserId(), subject, text });
-    answerBox.textContent = response.answer || '(응답 없음)';
+    await streamChat(body, state);
+    if (!state.received) answerBox.textContent = '(응답 없음)';
   } catch (error) {
     console.error(error);
-    answerBox.textContent = '오류: 응답을 가져오지 못했습니다.';
+    if (state.received) return;
+    // Stream unavailable (old server / proxy): fall back to the one-shot endpoint
+    try {
+      const response = await api.post('/ai/chat', body);
+      answerBox.textContent = response.answer || '(응답 없음)';
+    } catch (fallbackError) {
+      console.error(fallbackError);
+      answerBox.textContent = '오류: 응답을 가져오지 못했습니다.';
+    }
   }
 });
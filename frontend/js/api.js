@@ -13,9 +13,29 @@ async function request(path, { method = "GET", body } = {}) {
   return res.json();
 }
 
+// GET with If-None-Match: resolves to { notModified: true } on 304, else { etag, data }
+async function getConditional(path, etag) {
+  const headers = etag ? { "If-None-Match": etag } : {};
+  const res = await fetch(`${API_BASE}${path}`, { method: "GET", headers });
+  if (res.status === 304) return { notModified: true, etag };
+  if (!res.ok) {
+    const text = await res.text();
+    throw new Error(`API GET ${path} failed: ${res.status} ${text}`);
+  }
+  return { notModified: false, etag: res.headers.get("ETag"), data: await res.json() };
+}
+
+// Survives page unload; a text/plain body keeps it a CORS simple request (the server parses the JSON)
+function beacon(path, body) {
+  if (!navigator.sendBeacon) return false;
+  return navigator.sendBeacon(`${API_BASE}${path}`, new Blob([JSON.stringify(body)], { type: 'text/plain' }));
+}
+
 export const api = {
   get: (path) => request(path, { method: "GET" }),
   post: (path, body) => request(path, { method: "POST", body }),
   patch: (path, body) => request(path, { method: "PATCH", body }),
+  getConditional,
+  beacon,
 };
 
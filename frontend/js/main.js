@@ -14,6 +14,10 @@ import { getUserId } from './session.js';
 const state = {
   userId: getUserId(),
   quests: [],
+  // delta sync (GET /quests?since=): local copy keyed by id, last cursor and ETag
+  questById: new Map(),
+  questCursor: null,
+  questEtag: null,
 };
 
 let realClockTimer = null;
@@ -57,8 +61,32 @@ const startRealClock = () => {
   realClockTimer = setInterval(updateRealClock, 1000);
 };
 
-export async function loadQuests() {
-  state.quests = await api.get(`/quests?user_id=${state.userId}`);
+function applyQuestDelta(delta) {
+  let changed = delta.full;
+  if (delta.full) state.questById.clear();
+  delta.deleted.forEach(id => {
+    if (state.questById.delete(id)) changed = true;
+  });
+  delta.quests.forEach(quest => {
+    const previous = state.questById.get(quest.id);
+    // the server re-sends a short overlap window; unchanged copies must not trigger a re-render
+    if (!previous || JSON.stringify(previous) !== JSON.stringify(quest)) changed = true;
+    state.questById.set(quest.id, quest);
+  });
+  state.questCursor = delta.cursor;
+  return changed;
+}
+
+export async function loadQuests({ full = false } = {}) {
+  const since = full || !state.questCursor ? '0' : state.questCursor;
+  const res = await api.getConditional(
+    `/quests?user_id=${encodeURIComponent(state.userId)}&since=${encodeURIComponent(since)}`,
+    since === '0' ? null : state.questEtag,
+  );
+  if (res.notModified) return;
+  state.questEtag = res.etag;
+  if (!applyQuestDelta(res.data)) return;
+  state.quests = [...state.questById.values()];
   renderQuestList(state.quests);
   updateSubjectProgressBars(state.quests);
 }
@@ -117,7 +145,7 @@ async function handleDevAction(action) {
   try {
     switch (action) {
       case 'quest-refresh':
-        await loadQuests();
+        await loadQuests({ full: true });
         showDevToast('퀘스트 데이터를 새로 고쳤습니다.');
         break;
       case 'add-time':
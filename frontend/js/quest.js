@@ -121,6 +121,18 @@ async function submitAnswer(id, value, inputEl) {
   }
 }
 
+// Accept planner suggestions (GET /ai/planner/suggest `quests`) with one POST /quests/bulk;
+// resolves to per-suggestion results: created | existing (an active quest already covers it) | conflict
+export async function acceptPlannerSuggestions(suggestions) {
+  const entries = (suggestions || []).map(q => ({ ...q, user_id: getUserId() }));
+  if (!entries.length) return [];
+  const { results } = await api.post('/quests/bulk', { entries });
+  if (results.some(r => r.outcome === 'created')) {
+    window.dispatchEvent(new CustomEvent('quest-sync'));
+  }
+  return results;
+}
+
 function startQuestTimer(q) {
   if (activeQuestTimer && activeQuestTimer.id !== q.id) {
     stopCurrentQuestTimer('switch');
@@ -130,62 +142,50 @@ function startQuestTimer(q) {
     return;
   }
 
-  api.patch(`/quests/${q.id}`, { status: 'in_progress' }).catch(() => {});
   setGlobalSubject(q.subject);
   if (!isGlobalRunning()) ensureGlobalFor(q.subject);
 
-  const state = { delta: 0, lastSent: Date.now() };
+  // the server clock measures the session; progress arrives through the timer-state poll
   activeQuestId = q.id;
   markActiveCard(q.id);
-  const interval = setInterval(async () => {
-    state.delta += 1;
-    if (Date.now() - state.lastSent >= 5000) {
-      const updated = await flushQuestDelta(q.id, state);
-      state.lastSent = Date.now();
-      if (updated && updated.status === 'completed') {
-        stopCurrentQuestTimer('completed');
-      }
-    }
-  }, 1000);
-
-  activeQuestTimer = { id: q.id, interval, state };
+  activeQuestTimer = { id: q.id };
   activeQuestSubject = q.subject;
-}
-
-async function flushQuestDelta(id, state) {
-  if (state.delta <= 0) return null;
-  try {
-    const updated = await api.post('/timer/update', {
-      user_id: getUserId(),
-      quest_id: id,
-      delta_seconds: state.delta,
+  api
+    .post('/timer/start', { user_id: getUserId(), quest_id: q.id })
+    .then(() => window.dispatchEvent(new CustomEvent('quest-sync')))
+    .catch(error => {
+      console.error(error);
+      if (activeQuestTimer && activeQuestTimer.id === q.id) stopCurrentQuestTimer('failed');
     });
-    state.delta = 0;
-    window.dispatchEvent(new CustomEvent('quest-sync'));
-    return updated;
-  } catch (error) {
-    console.error(error);
-    return null;
-  }
 }
 
 function stopCurrentQuestTimer(reason) {
   if (!activeQuestTimer) return;
-  const { id, interval, state } = activeQuestTimer;
-  clearInterval(interval);
+  const { id } = activeQuestTimer;
   activeQuestTimer = null;
   activeQuestSubject = null;
   activeQuestId = null;
   markActiveCard(null);
 
-  flushQuestDelta(id, state).finally(() => {
-    if (reason !== 'completed') {
-      api.patch(`/quests/${id}`, { status: 'paused' }).catch(() => {});
-    }
+  if (reason === 'completed' || reason === 'failed') {
     window.dispatchEvent(new CustomEvent('quest-sync'));
-  });
+    return;
+  }
+  api
+    .post('/timer/stop', { user_id: getUserId(), quest_id: id })
+    .catch(error => console.error(error))
+    .finally(() => window.dispatchEvent(new CustomEvent('quest-sync')));
 }
 
+window.addEventListener('timer-state', event => {
+  if (!activeQuestTimer) return;
+  const sessions = event.detail?.sessions || [];
+  const session = sessions.find(item => item.quest_id === activeQuestTimer.id);
+  if (!session || session.quest?.status === 'completed') {
+    stopCurrentQuestTimer('completed');
+  }
+});
+
 window.addEventListener('global-subject-changed', event => {
   const subject = event.detail?.subject;
   if (!activeQuestTimer) return;
@@ -196,7 +196,6 @@ window.addEventListener('global-subject-changed', event => {
 
 export function hardResetQuestTimer() {
   if (!activeQuestTimer) return;
-  clearInterval(activeQuestTimer.interval);
   activeQuestTimer = null;
   activeQuestSubject = null;
   activeQuestId = null;
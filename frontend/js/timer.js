@@ -1,8 +1,7 @@
 import { api } from './api.js';
 
 let ticking = null;
-let pendingDelta = 0;
-let lastSent = Date.now();
+let statePoller = null;
 let elapsedSeconds = 0;
 let userIdRef = null;
 let currentSubjectLabel = null;
@@ -32,6 +31,8 @@ const studyQuestIds = {};
 const blockedSubjects = new Set();
 const DEFAULT_QUEST_LABEL = '진행 중인 퀘스트가 없음';
 const STOPWATCH_EVENT = 'subject-stopwatch';
+// Elapsed time is measured by the server; the client only polls for progress/completion.
+const STATE_POLL_MS = 30000;
 const DAY_RESET_TIMEZONE = 'Asia/Seoul';
 const dayFormatter = new Intl.DateTimeFormat('en-CA', {
   timeZone: DAY_RESET_TIMEZONE,
@@ -60,13 +61,12 @@ const getCurrentDayKey = () => dayFormatter.format(new Date());
 async function maybeResetForNewDay() {
   const todayKey = getCurrentDayKey();
   if (todayKey === activeDayKey) return;
-  await flushCurrent();
-  pendingDelta = 0;
+  await stopGlobalSession();
   elapsedSeconds = 0;
   activeDayKey = todayKey;
-  lastSent = Date.now();
   updateElapsedDisplay();
   blockedSubjects.clear();
+  if (ticking && hasServerSubject()) await startGlobalSession(currentSubjectLabel);
   window.dispatchEvent(new CustomEvent('global-day-reset', { detail: { day: todayKey } }));
 }
 
@@ -80,15 +80,16 @@ export function initTimerControls({ userId }) {
     btn.addEventListener('click', () => selectSubject(btn.dataset.subject, btn));
   });
   updateElapsedDisplay();
+  // a closed tab must not keep earning time on the server clock
+  window.addEventListener('pagehide', () => {
+    if (userIdRef) api.beacon('/timer/stop', { user_id: userIdRef });
+  });
 }
 
 async function selectSubject(subjectKey, button = null) {
   if (!subjectKey) return;
   const label = SUBJECT_LABELS[subjectKey] || subjectKey;
   const isBlocked = blockedSubjects.has(label);
-  if (ticking && currentSubjectLabel && currentSubjectLabel !== label) {
-    await flushWithSubject(currentSubjectLabel);
-  }
   if (currentSubjectKey === subjectKey && ticking) {
     highlightSubjectButton(button);
     return;
@@ -99,20 +100,11 @@ async function selectSubject(subjectKey, button = null) {
   highlightSubjectButton(button);
   if (!ticking) start();
 
-  if (!isBlocked) {
-    try {
-      const quest = await api.post('/timer/update', {
-        user_id: userIdRef,
-        subject: currentSubjectLabel,
-        delta_seconds: 0,
-      });
-      trackStudyQuest(quest);
-      await updateStudyStatus(currentSubjectLabel, 'in_progress');
-      updateProgressUI(quest);
-      window.dispatchEvent(new CustomEvent('quest-sync'));
-    } catch (error) {
-      console.error(error);
-    }
+  if (isBlocked) {
+    // the previous subject's session (if any) must not keep running on the server
+    await stopGlobalSession();
+  } else {
+    await startGlobalSession(currentSubjectLabel);
   }
   window.dispatchEvent(
     new CustomEvent('global-subject-changed', { detail: { subject: currentSubjectLabel } }),
@@ -139,25 +131,19 @@ function start() {
     await maybeResetForNewDay();
     elapsedSeconds += 1;
     updateElapsedDisplay();
-    if (currentSubjectLabel && !blockedSubjects.has(currentSubjectLabel)) {
-      pendingDelta += 1;
-      if (Date.now() - lastSent >= 5000) {
-        await flushCurrent();
-        lastSent = Date.now();
-      }
-    }
   }, 1000);
+  clearInterval(statePoller);
+  statePoller = setInterval(pollTimerState, STATE_POLL_MS);
   dispatchStopwatchEvent(true);
 }
 
 async function pause() {
   if (!ticking) return;
   clearInterval(ticking);
+  clearInterval(statePoller);
   ticking = null;
-  lastSent = Date.now();
-  const subject = currentSubjectLabel;
-  await flushCurrent();
-  if (subject) await updateStudyStatus(subject, 'paused');
+  statePoller = null;
+  await stopGlobalSession();
   dispatchStopwatchEvent(false);
 }
 
@@ -174,50 +160,58 @@ async function stop() {
   if (bar) bar.style.width = '0%';
 }
 
-async function flushCurrent() {
-  if (pendingDelta <= 0 || !currentSubjectLabel || blockedSubjects.has(currentSubjectLabel)) {
-    pendingDelta = 0;
-    return;
-  }
-  const subject = currentSubjectLabel;
+function hasServerSubject() {
+  return !!currentSubjectLabel && currentSubjectKey !== DEFAULT_SUBJECT_KEY;
+}
+
+async function startGlobalSession(subject) {
+  if (!subject || subject === DEFAULT_SUBJECT_LABEL) return;
   try {
-    const quest = await api.post('/timer/update', {
-      user_id: userIdRef,
-      subject: currentSubjectLabel,
-      delta_seconds: pendingDelta,
-    });
-    pendingDelta = 0;
-    lastSent = Date.now();
-    trackStudyQuest(quest);
-    updateProgressUI(quest);
+    const session = await api.post('/timer/start', { user_id: userIdRef, subject });
+    trackStudyQuest(session.quest);
+    updateProgressUI(session.quest);
     window.dispatchEvent(new CustomEvent('quest-sync'));
-    if (quest.status === 'completed') {
-      onStudyGoalCompleted(subject, quest);
-    }
   } catch (error) {
     console.error(error);
   }
 }
 
-async function flushWithSubject(subject) {
-  if (!subject) return;
+async function stopGlobalSession() {
   try {
-    if (pendingDelta > 0) {
-      await api.post('/timer/update', {
-        user_id: userIdRef,
-        subject,
-        delta_seconds: pendingDelta,
-      });
-      pendingDelta = 0;
-      lastSent = Date.now();
-    }
-    await updateStudyStatus(subject, 'paused');
-    window.dispatchEvent(new CustomEvent('quest-sync'));
+    const state = await api.post('/timer/stop', { user_id: userIdRef, kind: 'global' });
+    if ((state.sessions || []).length) window.dispatchEvent(new CustomEvent('quest-sync'));
   } catch (error) {
     console.error(error);
   }
 }
 
+async function pollTimerState() {
+  let state;
+  try {
+    state = await api.get(`/timer/state?user_id=${encodeURIComponent(userIdRef)}`);
+  } catch (error) {
+    console.error(error);
+    return;
+  }
+  const sessions = state.sessions || [];
+  window.dispatchEvent(new CustomEvent('timer-state', { detail: { sessions } }));
+  const global = sessions.find(session => session.kind === 'global');
+  if (!global) {
+    // server restarted or swept the session away while we were still ticking
+    if (ticking && hasServerSubject() && !blockedSubjects.has(currentSubjectLabel)) {
+      await startGlobalSession(currentSubjectLabel);
+    }
+    return;
+  }
+  const quest = global.quest;
+  trackStudyQuest(quest);
+  updateProgressUI(quest);
+  window.dispatchEvent(new CustomEvent('quest-sync'));
+  if (quest && quest.status === 'completed') {
+    onStudyGoalCompleted(global.subject || quest.subject, quest);
+  }
+}
+
 export async function resetAll() {
   await stop();
 }
@@ -256,9 +250,9 @@ export function hardResetTimers() {
     clearInterval(ticking);
     ticking = null;
   }
-  pendingDelta = 0;
+  clearInterval(statePoller);
+  statePoller = null;
   elapsedSeconds = 0;
-  lastSent = Date.now();
   currentSubjectLabel = null;
   currentSubjectKey = null;
   activeDayKey = getCurrentDayKey();
@@ -287,10 +281,20 @@ export async function addDevTime(extraSeconds) {
   if (!Number.isFinite(seconds) || seconds <= 0) {
     throw new Error('extraSeconds must be a positive number.');
   }
-  pendingDelta += seconds;
   elapsedSeconds += seconds;
   updateElapsedDisplay();
-  await flushCurrent();
+  // dev shortcut: push the extra time directly instead of waiting on the server clock
+  const quest = await api.post('/timer/update', {
+    user_id: userIdRef,
+    subject: currentSubjectLabel,
+    delta_seconds: seconds,
+  });
+  trackStudyQuest(quest);
+  updateProgressUI(quest);
+  if (quest.status === 'completed') {
+    await stopGlobalSession();
+    onStudyGoalCompleted(currentSubjectLabel, quest);
+  }
 }
 
 function trackStudyQuest(quest) {
@@ -308,16 +312,6 @@ function clearStudyQuest(subject) {
   }
 }
 
-async function updateStudyStatus(subject, status) {
-  const questId = studyQuestIds[subject];
-  if (!questId) return;
-  try {
-    await api.patch(`/quests/${questId}`, { status });
-  } catch (error) {
-    console.error(error);
-  }
-}
-
 function highlightSubjectButton(button) {
   document.querySelectorAll('.subject-buttons .subject').forEach(btn => {
     if (button) {
@@ -336,7 +330,6 @@ export async function forceDayReset() {
 function onStudyGoalCompleted(subject, quest) {
   blockedSubjects.add(subject);
   clearStudyQuest(subject);
-  pendingDelta = 0;
   if (currentSubjectLabel === subject) {
     currentSubjectLabel = null;
     currentSubjectKey = null;